@@ -1,37 +1,90 @@
+import os
+import threading
 from contextlib import contextmanager
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 from common import utils
 
 
-# DunnoTheWay environment variables
-POSTGRES_DATABASE_USER = utils.get_env_variable('DUNNO_POSTGRES_DATABASE_USER')
-POSTGRES_DATABASE_PASSWORD = utils.get_env_variable('DUNNO_POSTGRES_DATABASE_PASSWORD')
-POSTGRES_DATABASE_HOST = utils.get_env_variable('DUNNO_POSTGRES_DATABASE_HOST')
-POSTGRES_DATABASE_PORT = utils.get_env_variable('DUNNO_POSTGRES_DATABASE_PORT')
-POSTGRES_DATABASE_NAME = utils.get_env_variable('DUNNO_POSTGRES_DATABASE_NAME')
-
 # database access
 def create_db_engine():
-    '''Return tracker database engine'''
+    '''Return tracker database engine from DunnoTheWay environment variables'''
     return utils.create_db_engine(
-        POSTGRES_DATABASE_USER, 
-        POSTGRES_DATABASE_PASSWORD, 
-        POSTGRES_DATABASE_HOST, 
-        POSTGRES_DATABASE_PORT, 
-        POSTGRES_DATABASE_NAME)
+        utils.get_env_variable('DUNNO_POSTGRES_DATABASE_USER'), 
+        utils.get_env_variable('DUNNO_POSTGRES_DATABASE_PASSWORD'), 
+        utils.get_env_variable('DUNNO_POSTGRES_DATABASE_HOST'), 
+        utils.get_env_variable('DUNNO_POSTGRES_DATABASE_PORT'), 
+        utils.get_env_variable('DUNNO_POSTGRES_DATABASE_NAME'),
+        # connection pool (optional environment variables)
+        pool_size=int(os.environ.get('DUNNO_POSTGRES_POOL_SIZE', 5)),
+        max_overflow=int(os.environ.get('DUNNO_POSTGRES_MAX_OVERFLOW', 10)),
+        pool_pre_ping=os.environ.get('DUNNO_POSTGRES_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        statement_timeout_in_ms=int(os.environ.get('DUNNO_POSTGRES_STATEMENT_TIMEOUT_IN_MS', 0))) # 0 disables timeout
+
+def get_engine():
+    '''Return database engine, created on first call (sessions are bound to it)'''
+    global engine
+
+    if engine is None:
+        with engine_lock: # threads racing on first call would create many pools
+            if engine is None:
+                engine = create_db_engine()
+                Session.configure(bind=engine)
+    return engine
 
 @contextmanager
 def open_database_session():
-    '''Context manager to handle session related to db'''
+    '''Context manager to handle session related to db.
+    Session is rolled back if an exception is raised and always closed.'''
+    get_engine()
     session = Session()
-    yield session
-    session.close()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+@contextmanager
+def open_scoped_session(expire_on_commit=True):
+    '''Context manager of session of current thread (`ScopedSession()` returns it within the block).
+    Session is rolled back if an exception is raised and always removed.
+    Without `expire_on_commit`, objects keep their attributes once session is committed.'''
+    get_engine()
+    session = ScopedSession(expire_on_commit=expire_on_commit)
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        ScopedSession.remove()
+
+@contextmanager
+def transaction(expire_on_commit=True):
+    '''Context manager of session as a unit of work: committed if no exception is raised,
+    rolled back otherwise. Each call has its own session, so it is safe in worker threads.
+    Without `expire_on_commit`, objects keep their attributes once session is closed.'''
+    get_engine()
+    session = Session(expire_on_commit=expire_on_commit)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
-engine = create_db_engine()
-Session = sessionmaker(bind=engine)
+# created on first use (see `get_engine`), so importing models does not connect to db
+engine = None
+engine_lock = threading.Lock()
+Session = sessionmaker()
+# session of current thread, bound once engine is created (see `open_scoped_session`)
+ScopedSession = scoped_session(Session)
 Base = declarative_base()
-    
\ No newline at end of file
+    
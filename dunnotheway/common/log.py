@@ -1,18 +1,79 @@
+import atexit
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
+from collections import Counter
 
-from common.settings import BASE_DIR
+from common.settings import (BASE_DIR, LOG_BACKUP_COUNT, LOG_LEVELS,
+                             LOG_MAX_SIZE_IN_MB, LOG_QUEUE_SIZE)
 
 
 # logging
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
+filepath = os.path.join(LOGS_DIR, 'dunnotheway.log')
+LOG_FORMAT = '%(levelname)s %(asctime)s %(name)s - %(message)s'
 
-filename = datetime.today().strftime(r'%d-%m-%Y') # day-month-year
-filepath = os.path.join(LOGS_DIR, filename)
-LOG_FORMAT = '%(levelname)s %(asctime)s - %(message)s'
+# global variables
+stats = Counter() # records logged per level and records dropped because queue was full
+listener = None # writes queued records to file, started by `setup_logging`
+listener_lock = threading.Lock()
 
-logging.basicConfig(filename=filepath, filemode='a', level=logging.DEBUG, format=LOG_FORMAT)
-logger = logging.getLogger('sqlalchemy.engine')
\ No newline at end of file
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    '''Queue handler counting records and dropping them when queue is full,
+    so that logging never blocks the calling thread (records are written by a `QueueListener`)'''
+
+    def enqueue(self, record):
+        stats[record.levelname] += 1
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            stats['DROPPED'] += 1
+
+
+def get_logger(name):
+    '''Return logger of module (e.g. `get_logger(__name__)`), whose level is set by `LOG_LEVELS`
+    once `setup_logging` is called'''
+    return logging.getLogger(name)
+
+def log_stats():
+    '''Return number of records logged per level (and dropped) since start'''
+    return dict(stats)
+
+
+def setup_logging():
+    '''Write records to rotating files from a background thread, with levels per logger.
+    Called by entry points (e.g. `manage.py`), so importing modules neither writes files nor starts threads.'''
+    global listener
+
+    with listener_lock:
+        if listener is None:
+            listener = _start_listener()
+
+def _start_listener():
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        filepath,
+        maxBytes=LOG_MAX_SIZE_IN_MB * 1024 * 1024,
+        backupCount=LOG_BACKUP_COUNT)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(
+        queue.Queue(LOG_QUEUE_SIZE), file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop) # flush records still in queue
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(BoundedQueueHandler(listener.queue))
+    for name, level in _parse_log_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    return listener
+
+def _parse_log_levels(value):
+    '''Return mapping from logger name to level from "LEVEL,name=LEVEL,..." (first level is of root logger)'''
+    levels = {}
+    for item in filter(None, (item.strip() for item in value.split(','))):
+        name, _, level = item.rpartition('=')
+        levels[name or None] = level.upper()
+    return levels
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from common.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class FixedRateScheduler:
+    '''Run iterations at a fixed rate
+
+    Iteration deadlines are set from the start of the first iteration,
+    so time spent working between waits does not make the period drift.
+    When an iteration overruns the period, missed deadlines are skipped.'''
+
+    def __init__(self, period):
+        self._period = period # in seconds
+        self._next_time = None # monotonic time of next iteration
+        self.count_overruns = 0
+
+    def __repr__(self):
+        return 'FixedRateScheduler({period} secs, {overruns} overruns)'.format(
+            period=self._period, overruns=self.count_overruns)
+
+    @property
+    def period(self):
+        return self._period
+
+    @period.setter
+    def period(self, period):
+        '''Change period from the next iteration on'''
+        if self._next_time is not None:
+            self._next_time += period - self._period
+        self._period = period
+
+    def wait(self):
+        '''Sleep until the next iteration is due'''
+        now = time.monotonic()
+        if self._next_time is None:
+            self._next_time = now + self._period
+        elif now > self._next_time:
+            count_missed = int((now - self._next_time) // self._period) + 1
+            self.count_overruns += count_missed
+            logger.warning('Iteration overran its period, skip %d iterations of %r',
+                count_missed, self)
+            self._next_time += count_missed * self._period
+        time.sleep(self._next_time - now)
+        self._next_time += self._period
+
+
+class TokenBucket:
+    '''Budget of tokens refilled at a constant rate up to a maximum capacity (thread-safe)'''
+
+    def __init__(self, rate, capacity):
+        self._rate = rate # tokens per second
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TokenBucket({0:.1f}/{1} tokens)'.format(self.tokens, self._capacity)
+
+    @property
+    def rate(self):
+        '''Return tokens refilled per second'''
+        return self._rate
+
+    @property
+    def tokens(self):
+        '''Return tokens currently available'''
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, tokens=1):
+        '''Take `tokens` from the bucket if they are available and return whether they were taken'''
+        with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
@@ -2,9 +2,11 @@ import os
 
 # DunnoTheWay environment variables
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-
-
-
-
-
+# create flight locations and convection cells tables partitioned by month (PostgreSQL 11+)
+# and keep their monthly partitions, set it in every process writing to them
+PARTITIONED_TABLES = os.environ.get('DUNNO_PARTITIONED_TABLES', '').lower() in ('1', 'true', 'yes')
+# logging levels per module, e.g. "INFO,flight.opensky.tracker=DEBUG" (first level applies to all modules)
+LOG_LEVELS = os.environ.get('DUNNO_LOG_LEVELS', 'INFO,sqlalchemy.engine=WARNING')
+LOG_MAX_SIZE_IN_MB = int(os.environ.get('DUNNO_LOG_MAX_SIZE_IN_MB', 50)) # rotate log file after it
+LOG_BACKUP_COUNT = int(os.environ.get('DUNNO_LOG_BACKUP_COUNT', 10)) # rotated log files kept
+LOG_QUEUE_SIZE = int(os.environ.get('DUNNO_LOG_QUEUE_SIZE', 10000)) # records waiting to be written
@@ -1,12 +1,13 @@
 import os
 import math
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import numpy as np
 from sqlalchemy import create_engine
 
 # global variable
 RADIUS_EARTH = 6371e3
+EPOCH = datetime(1970, 1, 1)
 
 
 def get_env_variable(var_name):
@@ -17,8 +18,11 @@ def get_env_variable(var_name):
         error_msg = 'Set the {} environment variable'.format(var_name)
         raise KeyError(error_msg)
 
-def create_db_engine(user, password, host, port, db):
-    '''Return database engine from user, password, db, host and port'''
+def create_db_engine(user, password, host, port, db, 
+    pool_size=5, max_overflow=10, pool_pre_ping=False, statement_timeout_in_ms=0):
+    '''Return database engine from user, password, db, host and port.
+    Connections are pooled (`pool_size` kept open, up to `max_overflow` more on demand),
+    checked before use if `pool_pre_ping` and statements are canceled after `statement_timeout_in_ms`.'''
     url_pattern = 'postgresql://{user}:{password}@{host}:{port}/{db}'
     url = url_pattern.format(
         user=user, 
@@ -26,7 +30,18 @@ def create_db_engine(user, password, host, port, db):
         host=host, 
         port=port, 
         db=db)
-    return create_engine(url, client_encoding='utf8')
+    connect_args = {}
+    if statement_timeout_in_ms:
+        connect_args['options'] = '-c statement_timeout={0}'.format(statement_timeout_in_ms)
+    # batch mode turns `executemany` into few round trips (psycopg2 execute_batch)
+    return create_engine(
+        url, 
+        client_encoding='utf8', 
+        use_batch_mode=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        connect_args=connect_args)
 
 
 def distance_two_dimensions_coordinates(this_coordinate, that_coordinate):
@@ -83,4 +98,20 @@ def from_datetime_to_timestamp(dt):
 
 def from_timestamp_to_datetime(ts):
     '''Convert timestamp in datetime object'''
-    return datetime.fromtimestamp(ts)
\ No newline at end of file
+    return datetime.fromtimestamp(ts)
+
+def from_datetime_to_epoch(dt):
+    '''Convert naive datetime object in seconds since epoch, as if it was UTC (no DST gaps)'''
+    return (dt - EPOCH).total_seconds()
+
+def from_epoch_to_datetime(epoch):
+    '''Convert seconds since epoch in naive datetime object (see `from_datetime_to_epoch`)'''
+    return EPOCH + timedelta(seconds=epoch)
+
+def time_window_from_dates(time_window):
+    '''Return time window as pair of datetime objects from datetime objects or dates as YYYY-MM-DD'''
+    if time_window is None:
+        return None
+    return tuple(
+        value if isinstance(value, datetime) else datetime.strptime(value, '%Y-%m-%d')
+        for value in time_window)
\ No newline at end of file
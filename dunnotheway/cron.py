@@ -1,9 +1,12 @@
-import flight.models.fixtures
+from common.log import setup_logging
+from flight.models.fixtures import init_db
 import flight.opensky.tracker as flight_tracker
 from engine.detector import search_intersections_convection_cells 
 
 
 if __name__ == '__main__':
+    setup_logging()
+    init_db()
     # flight_tracker.track_en_route_flights()
     airport_tracking_list = [
         ('SBBR', 'SBGL'),
@@ -1,15 +1,16 @@
 from collections import namedtuple
 
-from common.log import logger
+from common.log import get_logger
 from common.utils import distance_two_dimensions_coordinates
 
 from weather.stsc.api import STSC
-from flight.models.airport import Airport
-from flight.models.bounding_box import bounding_box_related_to_airports
 from engine.normalizer import normalized_flight_locations
+from engine.models.route import Route
 from engine.models.section import Section, FlightLocationRecord
 from analyses.models._obstacle import Obstacle
 
+logger = get_logger(__name__)
+
 
 Intersection = namedtuple(
     'Intersection', ['convection_cell', 'flight_ids'])
@@ -47,8 +48,8 @@ class ObstacleDetector:
         curr_flight_ids = self.flight_ids_in_the_same_airway_of_normalized_flight_location(
             normalized_flight_location, airports)
 
-        longitude_based = Airport.should_be_longitude_based(*airports)
-        follow_ascending_order = Airport.follow_ascending_order(*airports)
+        route = Route.from_airports(*airports)
+        longitude_based, follow_ascending_order = route.longitude_based, route.follow_ascending_order
         intersections = self.check_intersections_related_to_airports(*airports)
         
         intersection_index = 0
@@ -113,12 +114,10 @@ class ObstacleDetector:
         intersections = []
         
         sections = self._sections_from_airports(departure_airport, destination_airport)
-        longitude_based = Airport.should_be_longitude_based(
-            departure_airport, destination_airport)
-        follow_ascending_order = Airport.follow_ascending_order(
-            departure_airport, destination_airport)
+        route = Route.from_airports(departure_airport, destination_airport)
+        longitude_based, follow_ascending_order = route.longitude_based, route.follow_ascending_order
 
-        bbox = bounding_box_related_to_airports(departure_airport, destination_airport)
+        bbox = route.bbox
         sorting_key = (lambda x: reference_point(x, longitude_based))
         sorting_reverse = (not follow_ascending_order)
         cells = self._stsc.cells_within_bounding_box(
@@ -198,8 +197,7 @@ class ObstacleDetector:
         self, normalized_flight_location, departure_airport, destination_airport):
         sections = self._sections_from_airports(
             departure_airport, destination_airport)
-        longitude_based = Airport.should_be_longitude_based(
-            departure_airport, destination_airport)
+        longitude_based = Route.from_airports(departure_airport, destination_airport).longitude_based
 
         def is_normalized_flight_location_inside_section(normalize_flight_locations, section):
             return (float(section.section_point) == 
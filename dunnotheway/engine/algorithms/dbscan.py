@@ -70,6 +70,7 @@ class DBSCAN:
             min_samples,
             eps,
             metric.__name__,
+            kwargs.get('time_window'),
         )
         
         if key not in DBSCAN.cache:
@@ -79,9 +80,7 @@ class DBSCAN:
         return DBSCAN.cache[key]
 
     def run_classifier(self):
-        train_set = [
-            flight_location.coordinates
-            for flight_location in self.flight_locations]
+        train_set = Section.coordinates_from_flight_locations(self.flight_locations)
         self.classifier.fit(train_set)
         self._build_label_to_flight_locations()
 
@@ -109,9 +108,8 @@ class DBSCAN:
 
     def _find_cluster_from_light_locations(self, flight_locations):
         arr_xyz = np.array([
-            get_cartesian_coordinates(
-                flight_location.coordinates) 
-            for flight_location in flight_locations])
+            get_cartesian_coordinates(coordinate)
+            for coordinate in Section.coordinates_from_flight_locations(flight_locations)])
         length = arr_xyz.shape[0]
         sum_x, sum_y, sum_z = (
             np.sum(arr_xyz[:, 0]), 
@@ -64,6 +64,7 @@ class HDBSCAN:
             min_entries_per_section,
             min_number_samples,
             metric.__name__,
+            kwargs.get('time_window'),
         )
         
         if key not in HDBSCAN.cache:
@@ -73,9 +74,7 @@ class HDBSCAN:
         return HDBSCAN.cache[key]
 
     def run_classifier(self):
-        train_set = [
-            flight_location.coordinates
-            for flight_location in self.flight_locations]
+        train_set = Section.coordinates_from_flight_locations(self.flight_locations)
         if len(train_set) > 1: # have to have at least two samples
             self.classifier.fit(train_set)
         else:
@@ -106,9 +105,8 @@ class HDBSCAN:
 
     def _find_cluster_from_light_locations(self, flight_locations):
         arr_xyz = np.array([
-            get_cartesian_coordinates(
-                flight_location.coordinates) 
-            for flight_location in flight_locations])
+            get_cartesian_coordinates(coordinate)
+            for coordinate in Section.coordinates_from_flight_locations(flight_locations)])
         length = arr_xyz.shape[0]
         sum_x, sum_y, sum_z = (
             np.sum(arr_xyz[:, 0]), 
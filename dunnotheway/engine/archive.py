@@ -0,0 +1,167 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func
+
+from common.db import open_database_session
+from common.log import get_logger
+from common.utils import from_datetime_to_epoch, time_window_from_dates
+from engine import normalizer
+from engine.models.route import Route
+from engine.settings import ARCHIVE_DIR
+from flight.models.airport import Airport
+from flight.models.flight import Flight
+from flight.models.flight_plan import FlightPlan
+
+logger = get_logger(__name__)
+
+
+# normalized flight locations of a route, one `.npy` file per day sorted along route
+NORMALIZED_FLIGHT_LOCATION_DTYPE = np.dtype([
+    ('flight_id', np.int64),
+    ('epoch', np.float64),
+    ('latitude', np.float64),
+    ('longitude', np.float64),
+    ('altitude', np.float64),
+    ('speed', np.float64),
+])
+DAY_FILE_NAME_FORMAT = '%Y-%m-%d.npy'
+# latest flight id of route and time window (seconds since epoch, all days if null) when it was archived
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def archive_routes(airport_tracking_list=None, time_window=None):
+    '''Write normalized flight locations of routes (all pairs of airports, if not given) to archive.
+    With `time_window` (pair of datetime objects or dates as YYYY-MM-DD), only days within it are written.'''
+    time_window = time_window_from_dates(time_window)
+    with open_database_session() as session:
+        if airport_tracking_list is None:
+            airports = session.query(Airport).all()
+            routes = [(departure_airport, destination_airport)
+                for departure_airport in airports
+                    for destination_airport in airports
+                        if departure_airport != destination_airport]
+        else:
+            routes = [(Airport.airport_from_icao_code(session, departure_airport_code),
+                       Airport.airport_from_icao_code(session, destination_airport_code))
+                for departure_airport_code, destination_airport_code in airport_tracking_list]
+
+        return {
+            (departure_airport.icao_code, destination_airport.icao_code):
+                archive_route(session, departure_airport, destination_airport, time_window)
+            for departure_airport, destination_airport in routes}
+
+def archive_route(session, departure_airport, destination_airport, time_window=None):
+    '''Write normalized flight locations of route to archive, replacing days already archived
+    (and rebuilding the whole route if time window is not given).
+    Return number of normalized flight locations written.'''
+    # read before flight locations, so flights saved meanwhile make the archive out of date
+    max_flight_id = _max_flight_id(session, departure_airport, destination_airport)
+    flight_locations = normalizer.normalize_from_airports(
+        session, departure_airport, destination_airport, time_window)
+
+    day_to_rows = defaultdict(list)
+    for fl in flight_locations: # sorted along route
+        day_to_rows[fl.timestamp.date()].append((
+            fl.flight_id, fl.epoch,
+            fl.latitude, fl.longitude, fl.altitude, fl.speed))
+
+    path = _route_path(departure_airport, destination_airport)
+    os.makedirs(path, exist_ok=True)
+    for day, rows in day_to_rows.items():
+        _save(os.path.join(path, day.strftime(DAY_FILE_NAME_FORMAT)),
+              lambda f: np.save(f, np.array(rows, dtype=NORMALIZED_FLIGHT_LOCATION_DTYPE)))
+    if time_window is None: # drop days without flight locations anymore
+        file_names = {day.strftime(DAY_FILE_NAME_FORMAT) for day in day_to_rows}
+        for file_name, _ in _day_files(path):
+            if file_name not in file_names:
+                os.remove(os.path.join(path, file_name))
+    _save(os.path.join(path, MANIFEST_FILE_NAME), lambda f: f.write(json.dumps({
+        'max_flight_id': max_flight_id,
+        'time_window': time_window and [from_datetime_to_epoch(dt) for dt in time_window],
+    }).encode()))
+
+    logger.info('Archive %d normalized flight locations of %s-%s in %d days',
+        len(flight_locations), departure_airport.icao_code, destination_airport.icao_code,
+        len(day_to_rows))
+    return len(flight_locations)
+
+
+def has_route(departure_airport, destination_airport):
+    '''Check if route was archived'''
+    return os.path.isdir(_route_path(departure_airport, destination_airport))
+
+def is_route_up_to_date(session, departure_airport, destination_airport, time_window=None):
+    '''Check if archive of route covers time window (pair of datetime objects, all days if not given)
+    and no flight of route was saved since it was archived (otherwise rebuild it with `archive_routes`)'''
+    manifest_path = os.path.join(_route_path(departure_airport, destination_airport), MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    archived_time_window = manifest['time_window']
+    if archived_time_window is not None:
+        if time_window is None:
+            return False
+        start, end = (from_datetime_to_epoch(dt) for dt in time_window)
+        if not archived_time_window[0] <= start <= end <= archived_time_window[1]:
+            return False
+    return manifest['max_flight_id'] == _max_flight_id(session, departure_airport, destination_airport)
+
+def load_route(departure_airport, destination_airport, time_window=None):
+    '''Return SORTED normalized flight locations of route from archive (within time window,
+    pair of datetime objects, if given) as record array (`fl.latitude`, `fl.longitude`, ...).
+    Days are memory-mapped, so a single day is read with zero copy if time window is not given.'''
+    path = _route_path(departure_airport, destination_airport)
+    days = []
+    for file_name, day in _day_files(path):
+        if time_window is None or time_window[0].date() <= day <= time_window[1].date():
+            days.append(np.load(os.path.join(path, file_name), mmap_mode='r'))
+
+    if len(days) == 1 and time_window is None:
+        return days[0].view(np.recarray)
+
+    flight_locations = (np.concatenate(days) if days
+        else np.empty(0, dtype=NORMALIZED_FLIGHT_LOCATION_DTYPE))
+    if time_window is not None:
+        start, end = (from_datetime_to_epoch(dt) for dt in time_window)
+        epochs = flight_locations['epoch']
+        flight_locations = flight_locations[(epochs >= start) & (epochs < end)]
+
+    # merge days along route (stable, so order within each day is kept)
+    route = Route.from_airports(departure_airport, destination_airport)
+    order = route.argsort(flight_locations['latitude'], flight_locations['longitude'])
+    return flight_locations[order].view(np.recarray)
+
+
+def _route_path(departure_airport, destination_airport):
+    return os.path.join(ARCHIVE_DIR, '{0}-{1}'.format(
+        departure_airport.icao_code, destination_airport.icao_code))
+
+def _day_files(path):
+    '''Return SORTED pairs of file name and day of day files of route'''
+    day_files = []
+    for file_name in sorted(os.listdir(path)):
+        try:
+            day_files.append((file_name, datetime.strptime(file_name, DAY_FILE_NAME_FORMAT).date()))
+        except ValueError: # not a day file (e.g. manifest or file being written)
+            continue
+    return day_files
+
+def _max_flight_id(session, departure_airport, destination_airport):
+    return (session.query(func.max(Flight.id))
+        .join(FlightPlan, Flight.flight_plan_id == FlightPlan.id)
+        .filter(FlightPlan.departure_airport_id == departure_airport.id,
+                FlightPlan.destination_airport_id == destination_airport.id)
+        .scalar())
+
+def _save(path, write):
+    '''Write file with `write(f)` atomically, so readers never map a partial file'''
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        write(f)
+    os.replace(temp_path, path)
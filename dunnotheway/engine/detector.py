@@ -1,57 +1,53 @@
+import importlib
 from collections import defaultdict, namedtuple
 
-import matplotlib
-import matplotlib.pyplot as plt
-import pandas as pd
-
 # from engine.models._obstacle import Obstacle
-from common.db import open_database_session
-from common.utils import distance_two_dimensions_coordinates
-from engine.algorithms import dbscan, hdbscan 
+from common.db import ScopedSession, open_scoped_session
+from common.utils import distance_two_dimensions_coordinates, time_window_from_dates
 from flight.models.airport import Airport
 from flight.models.flight import Flight
 from flight.models.flight_location import FlightLocation
 from weather.models.convection_cell import ConvectionCell
 from engine.models.intersection import Intersection, IntersectionManager
+from engine.models.route import Route
+from flight.models.bounding_box import is_coordinate_inside_bounding_box
 
 
-matplotlib.use('Agg')
-
-session = None
-
+# algorithms as pairs of module and class names, imported on first use (sklearn and hdbscan are heavy)
 ALGORITHM_MAP = {
-    None: dbscan.DBSCAN,
-    'DBSCAN': dbscan.DBSCAN,
-    'HDBSCAN': hdbscan.HDBSCAN,
-    # 'OPTICS': optics.OPTICS,
+    None: ('engine.algorithms.dbscan', 'DBSCAN'),
+    'DBSCAN': ('engine.algorithms.dbscan', 'DBSCAN'),
+    'HDBSCAN': ('engine.algorithms.hdbscan', 'HDBSCAN'),
+    # 'OPTICS': ('engine.algorithms.optics', 'OPTICS'),
 }
 
 
-reference_point = (lambda x, longitude_based: 
-    x.longitude if longitude_based else x.latitude)
-
-
-
 def search_intersections_convection_cells(
-    airport_tracking_list=None, algorithm_name=None, **kwargs):
-    global session
-
+    airport_tracking_list=None, algorithm_name=None, time_window=None, **kwargs):
+    '''Search intersections of convection cells and airways. With `time_window` (pair of
+    datetime objects or dates as YYYY-MM-DD), flight locations and convection cells are
+    restricted to that period.'''
     manager = IntersectionManager()
-
-    with open_database_session() as session:
-        all_convection_cells = ConvectionCell.all_convection_cells(session)
+    time_window = time_window_from_dates(time_window)
+
+    with open_scoped_session() as session:
+        if time_window is None:
+            all_convection_cells = ConvectionCell.all_convection_cells(session)
+        else:
+            all_convection_cells = ConvectionCell.convection_cells_within_time_window(
+                session, time_window)
         
         for departure_airport, destination_airport in (
             _gen_departure_destination_airports(airport_tracking_list)):
             # filter convection cells withing departure and destination airports
+            bbox = Route.from_airports(departure_airport, destination_airport).bbox
             convection_cells = [
                 cell for cell in all_convection_cells 
-                    if cell.is_convection_cells_between_airports(
-                        departure_airport, destination_airport)]
+                    if is_coordinate_inside_bounding_box((cell.latitude, cell.longitude), bbox)]
             # find intersections
             intersections = _check_multiple_intersections(
                 departure_airport, destination_airport,  
-                convection_cells, algorithm_name, **kwargs)
+                convection_cells, algorithm_name, time_window=time_window, **kwargs)
             # workaround - set airports
             manager.set_default_airports(
                 departure_airport, destination_airport) 
@@ -61,10 +57,16 @@ def search_intersections_convection_cells(
 
     return manager
 
+def get_algorithm(algorithm_name=None):
+    '''Return section wrapper class of clustering algorithm (DBSCAN, if not given)'''
+    module_name, class_name = ALGORITHM_MAP[algorithm_name]
+    return getattr(importlib.import_module(module_name), class_name)
+
 def _gen_departure_destination_airports(airport_tracking_list):
     if airport_tracking_list is None:
         yield from _gen_default_airport_tracking_list()
     else:
+        session = ScopedSession()
         for departure_airport_code, destination_airport_code in airport_tracking_list:
             departure_airport = Airport.airport_from_icao_code(session, departure_airport_code)
             destination_airport = Airport.airport_from_icao_code(session, destination_airport_code)
@@ -72,7 +74,7 @@ def _gen_departure_destination_airports(airport_tracking_list):
 
 
 def _gen_default_airport_tracking_list():
-    all_airports = session.query(Airport).all()
+    all_airports = ScopedSession().query(Airport).all()
     for departure_airport in all_airports:
         for destination_airport in all_airports:
             if departure_airport != destination_airport:
@@ -83,21 +85,15 @@ def _check_multiple_intersections(
     departure_airport, destination_airport, convection_cells, algorithm_name=None, **kwargs):
     intersections = []
     
-    algorithm = ALGORITHM_MAP[algorithm_name]
+    algorithm = get_algorithm(algorithm_name)
     sections = algorithm.sections_from_airports(
         departure_airport, 
         destination_airport, 
         **kwargs,
     )
     
-    longitude_based = Airport.should_be_longitude_based(
-        departure_airport, destination_airport)
-    follow_ascending_order = Airport.follow_ascending_order(
-        departure_airport, destination_airport)
-
-    convection_cells.sort(
-        key=(lambda x: reference_point(x, longitude_based)), 
-        reverse=(not follow_ascending_order))
+    route = Route.from_airports(departure_airport, destination_airport)
+    route.sort(convection_cells)
     
     if not sections or not convection_cells:
         return intersections
@@ -106,10 +102,7 @@ def _check_multiple_intersections(
     section, cell = next(iter_sections), next(iter_cells)
 
     def should_move_section_iterator(section, cell):
-        return ((follow_ascending_order and 
-                section.section_point < reference_point(cell, longitude_based)) or
-            (not follow_ascending_order and 
-                section.section_point > reference_point(cell, longitude_based)))
+        return route.is_before(section.section_point, route.reference_point(cell))
 
     while True:
         try:
@@ -144,7 +137,7 @@ def distance_between_section_and_cell(section, cell):
 
 
 def distance_between_flight_location_and_cell(flight_location, cell):
-    flight_location_2d = (float(flight_location.latitude), float(flight_location.longitude))
+    flight_location_2d = (flight_location.latitude, flight_location.longitude)
     cell_2d = (cell.latitude, cell.longitude)
     return distance_two_dimensions_coordinates(flight_location_2d, cell_2d)
 
@@ -155,14 +148,15 @@ def measure_impact_convection_cell_on_section(section, cell):
             distance = distance_between_flight_location_and_cell(flight_location, cell)
             return distance < cell.radius
 
-        all_flight_locations = set()
-        intersected_flight_locations = set()
+        # normalized flight locations are not persisted (no ids), so count them
+        count_flight_locations = 0
+        count_intersected_flight_locations = 0
         for flight_location in section:
-            all_flight_locations.add(flight_location.id)
+            count_flight_locations += 1
             if has_intersection(flight_location, cell):
-                intersected_flight_locations.add(flight_location.id)
+                count_intersected_flight_locations += 1
         
         impact = None
-        if len(all_flight_locations) > 0 and len(intersected_flight_locations) > 0:
-            impact = len(intersected_flight_locations) / len(all_flight_locations)
+        if count_flight_locations > 0 and count_intersected_flight_locations > 0:
+            impact = count_intersected_flight_locations / count_flight_locations
         return impact
@@ -0,0 +1,52 @@
+from itertools import groupby
+
+from sqlalchemy import func, tuple_
+
+from flight.models.flight import Flight
+from flight.models.flight_location import FlightLocation
+from flight.models.flight_plan import FlightPlan
+from engine.settings import LOADER_BATCH_SIZE
+
+
+def flights_locations_from_airports(
+    session, departure_airport, destination_airport, time_window=None, batch_size=LOADER_BATCH_SIZE):
+    '''Yield pairs of flight id and its SORTED flight locations from departure airport to
+    destination airport (within time window, pair of datetime objects, if given)'''
+    for _, flight_id, flight_locations in flights_locations_from_routes(
+        session, [(departure_airport, destination_airport)], time_window, batch_size):
+        yield flight_id, flight_locations
+
+def flights_locations_from_routes(session, routes, time_window=None, batch_size=LOADER_BATCH_SIZE):
+    '''Yield triples of route (pair of departure and destination airport ids), flight id and
+    its SORTED flight locations of routes (pairs of airports) with a SINGLE query.
+
+    Flight locations are plain rows (`fl.timestamp`, `fl.longitude`, `fl.latitude`, `fl.altitude`,
+    `fl.speed`, `fl.flight_id` and `fl.epoch`, seconds since epoch of naive timestamp) streamed
+    from a server-side cursor in batches of `batch_size`, so no ORM objects are built and
+    large routes are not loaded in memory at once.'''
+    route_ids = [(departure_airport.id, destination_airport.id)
+        for departure_airport, destination_airport in routes]
+    if not route_ids:
+        return
+
+    query = (session.query(
+                FlightPlan.departure_airport_id, FlightPlan.destination_airport_id,
+                FlightLocation.flight_id, FlightLocation.timestamp,
+                FlightLocation.longitude, FlightLocation.latitude,
+                FlightLocation.altitude, FlightLocation.speed,
+                func.extract('epoch', FlightLocation.timestamp).label('epoch'))
+            .join(Flight, FlightLocation.flight_id == Flight.id)
+            .join(FlightPlan, Flight.flight_plan_id == FlightPlan.id)
+            .filter(tuple_(FlightPlan.departure_airport_id, FlightPlan.destination_airport_id)
+                .in_(route_ids)))
+    if time_window is not None:
+        start, end = time_window
+        query = query.filter(FlightLocation.timestamp >= start, FlightLocation.timestamp < end)
+    query = (query
+        .order_by(FlightPlan.departure_airport_id, FlightPlan.destination_airport_id,
+                  FlightLocation.flight_id, FlightLocation.timestamp)
+        .yield_per(batch_size))
+
+    for (departure_airport_id, destination_airport_id, flight_id), rows in groupby(
+        query, key=(lambda row: row[:3])):
+        yield (departure_airport_id, destination_airport_id), flight_id, list(rows)
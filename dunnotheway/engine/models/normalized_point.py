@@ -0,0 +1,44 @@
+from common.utils import from_epoch_to_datetime
+
+
+class NormalizedPoint:
+    '''
+    Normalized Point Class
+
+    Flight location interpolated at a section point of a route by the normalizer.
+    It is not a database entity, so it only refers to its flight by `flight_id`
+    and `epoch` is the (naive) timestamp in seconds.
+    '''
+
+    __slots__ = ('latitude', 'longitude', 'altitude', 'speed', 'epoch', 'flight_id')
+
+    def __init__(self, latitude, longitude, altitude, speed, epoch, flight_id):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.speed = speed
+        self.epoch = epoch
+        self.flight_id = flight_id
+
+    def __repr__(self):
+        return 'NormalizedPoint({timestamp}, {longitude}, {latitude}, {altitude}, {flight_id})'.format(
+            timestamp=self.timestamp,
+            longitude=self.longitude,
+            latitude=self.latitude,
+            altitude=self.altitude,
+            flight_id=self.flight_id)
+
+    def __iter__(self):
+        yield self.latitude
+        yield self.longitude
+        yield self.altitude
+
+    @property
+    def timestamp(self):
+        '''Return timestamp as datetime object'''
+        return from_epoch_to_datetime(self.epoch)
+
+    @property
+    def coordinates(self):
+        '''Transform normalized point into raw tuple (latitude, longitude, altitude)'''
+        return tuple(self)
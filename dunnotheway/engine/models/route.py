@@ -0,0 +1,73 @@
+import numpy as np
+
+from flight.models.airport import Airport
+from flight.models.bounding_box import bounding_box_related_to_airports
+from flight.opensky.settings import FLIGHT_PATH_PARTITION_INTERVAL_IN_DEGREES
+
+
+class Route:
+    '''
+    Route Descriptor Class
+
+    Geometry of the route from departure airport to destination airport shared by the engine.
+    `longitude_based` tells if the route is split by longitude (or latitude) and
+    `follow_ascending_order` if flights go along increasing values of it.
+    `section_points` (NumPy array) are sorted in route order.
+    '''
+
+    # cache routes based on
+    # (departure_airport, destination_airport, partition_interval)
+    cache = {}
+
+    def __init__(self, departure_airport, destination_airport, partition_interval):
+        self.departure_airport_code = departure_airport.icao_code
+        self.destination_airport_code = destination_airport.icao_code
+        self.longitude_based = Airport.should_be_longitude_based(
+            departure_airport, destination_airport)
+        self.follow_ascending_order = Airport.follow_ascending_order(
+            departure_airport, destination_airport)
+        self.bbox = bounding_box_related_to_airports(departure_airport, destination_airport)
+        self.section_points = np.array(Airport._section_points_from_airports(
+            departure_airport, destination_airport, partition_interval), dtype=float)
+
+    def __repr__(self):
+        return 'Route({dep}, {dest})'.format(
+            dep=self.departure_airport_code, dest=self.destination_airport_code)
+
+    @staticmethod
+    def from_airports(
+        departure_airport, destination_airport,
+        partition_interval=FLIGHT_PATH_PARTITION_INTERVAL_IN_DEGREES):
+        '''Return (memoized) route from departure airport to destination airport'''
+        key = (
+            departure_airport.icao_code,
+            destination_airport.icao_code,
+            partition_interval,
+        )
+
+        if key not in Route.cache:
+            Route.cache[key] = Route(departure_airport, destination_airport, partition_interval)
+        return Route.cache[key]
+
+    @property
+    def ascending_section_points(self):
+        '''Return section points in ascending order (view of `section_points`)'''
+        return self.section_points if self.follow_ascending_order else self.section_points[::-1]
+
+    def reference_point(self, location):
+        '''Return longitude or latitude of location (flight location, convection cell...) along route'''
+        return location.longitude if self.longitude_based else location.latitude
+
+    def sort(self, locations):
+        '''Sort locations in route order (in place)'''
+        locations.sort(key=self.reference_point, reverse=(not self.follow_ascending_order))
+
+    def argsort(self, latitudes, longitudes):
+        '''Return indices sorting arrays of locations in route order (stable)'''
+        points = longitudes if self.longitude_based else latitudes
+        return np.argsort(
+            points if self.follow_ascending_order else -points, kind='mergesort')
+
+    def is_before(self, this_point, that_point):
+        '''Check if reference point `this_point` comes before `that_point` in route order'''
+        return this_point < that_point if self.follow_ascending_order else this_point > that_point
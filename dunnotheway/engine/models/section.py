@@ -1,12 +1,16 @@
 from collections import defaultdict, namedtuple
 
-from engine import normalizer
-from common.log import logger
+import numpy as np
+
+from engine import archive, normalizer
+from common.log import get_logger
 from common.db import open_database_session
-from flight.models.airport import Airport
+from engine.models.route import Route
 
 from engine.settings import NUMBER_ENTRIES_PER_SECTION
 
+logger = get_logger(__name__)
+
 
 class Section:
     '''
@@ -40,21 +44,35 @@ class Section:
         '''Return sections from flight locations'''
         min_entries_per_section = kwargs.get(
             'min_entries_per_section', NUMBER_ENTRIES_PER_SECTION)
+        time_window = kwargs.get('time_window')
             
         key = (
             departure_airport.icao_code, 
             destination_airport.icao_code, 
             min_entries_per_section,
+            time_window,
         )
 
         if key not in Section.cache:
+            # section should be longitude based
+            longitude_based = Route.from_airports(
+                departure_airport, destination_airport).longitude_based
+
             with open_database_session() as session:
+                if archive.is_route_up_to_date(
+                    session, departure_airport, destination_airport, time_window):
+                    flight_locations = archive.load_route(
+                        departure_airport, destination_airport, time_window)
+                    Section.cache[key] = Section._sections_from_record_array(
+                        flight_locations, longitude_based, min_entries_per_section)
+                    return Section.cache[key]
+
+                if archive.has_route(departure_airport, destination_airport):
+                    logger.warning('Archive of %r-%r is out of date or does not cover %s, '
+                        'normalize flight locations from database (rebuild it with archive-routes)',
+                        departure_airport, destination_airport, time_window)
                 flight_locations = normalizer.normalize_from_airports(
-                    session, departure_airport, destination_airport)
-            
-            # section should be longitude based
-            longitude_based = Airport.should_be_longitude_based(
-                departure_airport, destination_airport)
+                    session, departure_airport, destination_airport, time_window)
 
             sections = []
             if not flight_locations:
@@ -74,6 +92,10 @@ class Section:
                     section_flight_locations = [curr_flight_location]
                 prev_flight_location = curr_flight_location
 
+            # last section
+            if len(section_flight_locations) >= min_entries_per_section:
+                sections.append(Section.from_flight_locations(section_flight_locations))
+
             Section.cache[key] = sections
 
         # return cached results
@@ -91,6 +113,23 @@ class Section:
             longitude_based=longitude_based,
             flight_locations=flight_locations)
 
+    @staticmethod
+    def coordinates_from_flight_locations(flight_locations):
+        '''Return (latitude, longitude, altitude) of flight locations, objects or record array, as 2-d array'''
+        if isinstance(flight_locations, np.recarray):
+            return np.column_stack((
+                flight_locations.latitude, flight_locations.longitude, flight_locations.altitude))
+        return np.array([(fl.latitude, fl.longitude, fl.altitude) for fl in flight_locations])
+
+    @staticmethod
+    def _sections_from_record_array(flight_locations, longitude_based, min_entries_per_section):
+        '''Return sections from SORTED record array of flight locations (each section is a view of it)'''
+        points = flight_locations.longitude if longitude_based else flight_locations.latitude
+        boundaries = np.flatnonzero(np.diff(points)) + 1
+        return [Section.from_flight_locations(section_flight_locations)
+            for section_flight_locations in np.split(flight_locations, boundaries)
+                if len(section_flight_locations) >= min_entries_per_section]
+
     @staticmethod
     def _flight_locations_are_part_of_the_same_section(this_fl, that_fl, longitude_based):
         return (this_fl.longitude == that_fl.longitude if longitude_based
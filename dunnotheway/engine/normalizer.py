@@ -1,40 +1,61 @@
-from common.log import logger
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy.orm import object_session
+
+from common.log import get_logger
+from common.utils import from_datetime_to_epoch
+from engine import loader
+from engine.models.normalized_point import NormalizedPoint
+from engine.models.route import Route
+from flight.models.flight import Flight
 from flight.models.flight_location import FlightLocation
-from flight.models.airport import Airport
-from flight.models.flight_plan import FlightPlan
-from common.utils import from_datetime_to_timestamp, from_timestamp_to_datetime
 from flight.opensky.settings import FLIGHT_PATH_PARTITION_INTERVAL_IN_DEGREES
 
+logger = get_logger(__name__)
+
 
 def normalize_from_airports(
-    session, departure_airport, destination_airport):
-    '''Return SORTED normalized flight locations from departure airport to destination airport'''
+    session, departure_airport, destination_airport, time_window=None):
+    '''Return SORTED normalized flight locations (see `NormalizedPoint`) from departure airport to
+    destination airport (within time window, pair of datetime objects, if given).
+    Flight locations of all flights are loaded with a single query (see `loader`).'''
+    route = Route.from_airports(departure_airport, destination_airport)
     normalized_flight_locations = [
         normalized_flight_location
-        for flight_plan in (FlightPlan.
-            flight_plans_from_airports(session, departure_airport, destination_airport))
-            for normalized_flight_location in (
-                normalize_from_flight_plan(flight_plan))]
+        for _, flight_locations in (loader.
+            flights_locations_from_airports(session, departure_airport, destination_airport, time_window))
+            for normalized_flight_location in _normalize_from_section_points(
+                flight_locations, route)]
 
     # sort flight locations
-    longitude_based = Airport.should_be_longitude_based(
-        departure_airport, destination_airport)
-    follow_ascending_order = Airport.follow_ascending_order(
-        departure_airport, destination_airport)
-    
-    normalized_flight_locations.sort(
-        key=(lambda fl: fl.longitude if longitude_based else fl.latitude),
-        reverse=(not follow_ascending_order))
-
+    route.sort(normalized_flight_locations)
     return normalized_flight_locations
 
 
-def normalize_from_flight_plan(flight_plan):
-    '''Return flight locations of flight plan'''
+def normalize_from_flight_plan(flight_plan, time_window=None):
+    '''Return flight locations of flight plan (within time window, pair of datetime objects, if given)'''
+    if time_window is None:
+        flights_locations = (flight.flight_locations for flight in flight_plan.flights)
+    else:
+        flights_locations = _flights_locations_within_time_window(flight_plan, time_window)
     return [normalized_flight_location 
-            for flight in flight_plan.flights 
+            for flight_locations in flights_locations
                 for normalized_flight_location in 
-                    normalize_from_flight_locations(flight.flight_locations)]
+                    normalize_from_flight_locations(flight_locations)]
+
+
+def _flights_locations_within_time_window(flight_plan, time_window):
+    '''Return flight locations of each flight of flight plan within time window.
+    Filtering on timestamp lets partitioned flight locations table skip other months.'''
+    start, end = time_window
+    flight_locations = (object_session(flight_plan).query(FlightLocation)
+        .join(Flight, FlightLocation.flight_id == Flight.id)
+        .filter(Flight.flight_plan_id == flight_plan.id)
+        .filter(FlightLocation.timestamp >= start, FlightLocation.timestamp < end)
+        .order_by(FlightLocation.flight_id, FlightLocation.timestamp))
+    for _, group in groupby(flight_locations, key=(lambda fl: fl.flight_id)):
+        yield list(group)
 
 
 def normalize_from_flight_locations(
@@ -48,114 +69,86 @@ def normalize_from_flight_locations(
     fl = flight_locations[0]
     flight_plan = fl.flight.flight_plan
 
-    section_points = Airport._section_points_from_airports(
-        flight_plan.departure_airport, flight_plan.destination_airport, 
-        partition_interval)
-    return _normalize_from_section_points(
-        flight_locations, section_points)
+    route = Route.from_airports(
+        flight_plan.departure_airport, flight_plan.destination_airport, partition_interval)
+    return _normalize_from_section_points(flight_locations, route)
 
 
-def _normalize_from_section_points(
-    flight_locations, section_points):
-    normalized_flight_locations = []
+def _normalize_from_section_points(flight_locations, route):
+    '''Return normalized flight locations of flight locations FROM SPECIFIC FLIGHT,
+    either ORM objects or rows with the same attributes and `epoch` (see `loader`)'''
     fl = flight_locations[0]
-    flight = fl.flight
-    flight_plan = flight.flight_plan
-
-    longitude_based = Airport.should_be_longitude_based(
-        flight_plan.departure_airport, flight_plan.destination_airport)
-    follow_ascending_order = Airport.follow_ascending_order(
-        flight_plan.departure_airport, flight_plan.destination_airport)
-
-    section_points_iterator = iter(section_points)
-    mid_point = next(section_points_iterator)
-
-    flight_locations.sort(
-        key=(lambda fl: fl.longitude if longitude_based else fl.latitude),
-        reverse=(not follow_ascending_order),
-    ) 
-    
-    for prev_location, curr_location in zip(flight_locations, flight_locations[1:]):
-        try:
-            while _check_mid_point_before_flight_location(
-                mid_point, prev_location, longitude_based, follow_ascending_order): 
-                mid_point = next(section_points_iterator)
-        except StopIteration:
-            logger.error('Invalid set of flight locations {0!r} and {1!r} of flight {2!r}'.
-                        format(prev_location, curr_location, flight))
-            break # leave the outer for loop
+    flight_id = fl.flight_id
+    if getattr(fl, 'epoch', None) is not None:
+        epochs = [fl.epoch for fl in flight_locations]
+    else:
+        epochs = [from_datetime_to_epoch(fl.timestamp) for fl in flight_locations]
     
-        if _check_mid_point_within_flight_locations(
-            mid_point, prev_location, curr_location, longitude_based):
-            normalized_flight_location = _normalize_flight_location(
-                mid_point, prev_location, curr_location, longitude_based)
-            normalized_flight_locations.append(normalized_flight_location)
+    latitudes, longitudes, altitudes, speeds, epochs = normalize_flight_arrays(
+        np.array([fl.latitude for fl in flight_locations], dtype=float),
+        np.array([fl.longitude for fl in flight_locations], dtype=float),
+        np.array([fl.altitude for fl in flight_locations], dtype=float),
+        np.array([fl.speed for fl in flight_locations], dtype=float),
+        np.array(epochs, dtype=float),
+        route, flight_id)
+
+    normalized_flight_locations = [
+        NormalizedPoint(*values, flight_id=flight_id)
+        for values in zip(
+            latitudes.tolist(), longitudes.tolist(), altitudes.tolist(), 
+            speeds.tolist(), epochs.tolist())]
     
-    logger.debug('Reduce {0} flight locations to {1} normalized flight locations'.
-                format(len(flight_locations), len(normalized_flight_locations)))
+    logger.debug('Reduce %d flight locations to %d normalized flight locations',
+                len(flight_locations), len(normalized_flight_locations))
     return normalized_flight_locations
 
 
-def _check_mid_point_before_flight_location(
-    mid_point, flight_location, longitude_based, follow_ascending_order):
-    '''Check if mid point comes before location.'''
-    if longitude_based:
-        base_point = float(flight_location.longitude)
-    else: # latitude based
-        base_point = float(flight_location.latitude)
-    # logger.debug('Check if mid_point {0} before location {1} following {2} order'.format(mid_point, base_point, ('decreasing', 'increasing')[follow_ascending_order]))
-    return mid_point < base_point if follow_ascending_order else mid_point > base_point
-
+def normalize_flight_arrays(
+    latitudes, longitudes, altitudes, speeds, epochs, route, flight_id=None):
+    '''Return arrays (latitudes, longitudes, altitudes, speeds, epochs) of normalized flight locations
+    of a SPECIFIC FLIGHT, SORTED along route (see `Route`), from arrays of its flight locations.
 
-def _check_mid_point_within_flight_locations(
-    mid_point, prev_location, curr_location, longitude_based):
-    '''Check if mid point is within two flight locations (`prev_location` and `curr_location`)
-    comparing either to the longitude or to the latitude of points.'''
-    if longitude_based:
-        start_interval, end_interval = sorted([
-            float(prev_location.longitude), float(curr_location.longitude)])
-    else: # latitude based
-        start_interval, end_interval = sorted([
-            float(prev_location.latitude), float(curr_location.latitude)])
+    Flight locations are sorted along route. For each pair of consecutive flight locations, the nearest
+    section point not before the first one is interpolated if it lies within the pair.'''
+    longitude_based, follow_ascending_order = route.longitude_based, route.follow_ascending_order
+    base_points = longitudes if longitude_based else latitudes
+    order = route.argsort(latitudes, longitudes)
+    latitudes, longitudes, altitudes, speeds, epochs, base_points = (
+        values[order] for values in (latitudes, longitudes, altitudes, speeds, epochs, base_points))
     
-    # logger.debug('Check if mid_point {0} within interval [{1}, {2}]'.
-    #             format(mid_point, start_interval, end_interval))
-    return start_interval <= mid_point < end_interval
-
+    section_points = route.ascending_section_points
+    if len(base_points) < 2 or not len(section_points):
+        empty = np.empty(0)
+        return empty, empty, empty, empty, empty
+
+    prev_points, curr_points = base_points[:-1], base_points[1:]
+    if follow_ascending_order:
+        # smallest section point not less than previous location
+        indices = np.searchsorted(section_points, prev_points, side='left')
+        has_mid_point = indices < len(section_points)
+        mid_points = section_points[np.minimum(indices, len(section_points) - 1)]
+        within = has_mid_point & (mid_points < curr_points)
+    else:
+        # largest section point not greater than previous location
+        indices = np.searchsorted(section_points, prev_points, side='right') - 1
+        has_mid_point = indices >= 0
+        mid_points = section_points[np.maximum(indices, 0)]
+        within = has_mid_point & (curr_points <= mid_points) & (mid_points < prev_points)
+    if not has_mid_point.all():
+        logger.error('Invalid set of flight locations of flight %s beyond section points from %s',
+                    flight_id, prev_points[~has_mid_point][0])
+
+    start = np.flatnonzero(within)
+    end = start + 1
+    mid_points = mid_points[start]
+    alpha = (mid_points - base_points[start]) / (base_points[end] - base_points[start]) # no zero division
+
+    def find_mid_values(values):
+        return values[start] + alpha * (values[end] - values[start])
 
-def _normalize_flight_location(
-    mid_point, prev_location, curr_location, longitude_based):
-    '''Return normalized flight location within two flight locations (`prev_location` and `curr_location`)
-    comparing either to the longitude or to the latitude of points.'''
-    
-    def find_mid_value(alpha, start, end):
-        return start + alpha * (end-start)
-    
     if longitude_based:
-        longitude = mid_point
-        start_interval, end_interval = float(prev_location.longitude), float(curr_location.longitude)
-        alpha = (longitude-start_interval)/(end_interval-start_interval) # DivisionByZeroError not possible 
-        latitude = find_mid_value(alpha, float(prev_location.latitude), float(curr_location.latitude))
+        longitudes, latitudes = mid_points, find_mid_values(latitudes)
     else: # latitude based
-        latitude = mid_point
-        start_interval, end_interval = float(prev_location.latitude), float(curr_location.latitude)
-        alpha = (latitude-start_interval)/(end_interval-start_interval) # DivisionByZeroError not possible 
-        longitude = find_mid_value(alpha, float(prev_location.longitude), float(curr_location.longitude))
-    
-    # altitude, speed and timestamp operations
-    altitude = find_mid_value(alpha, float(prev_location.altitude), float(curr_location.altitude))
-    speed = find_mid_value(alpha, float(prev_location.speed), float(curr_location.speed))
-    timestamp = from_timestamp_to_datetime( # as datetime object
-        find_mid_value(alpha, 
-            from_datetime_to_timestamp(prev_location.timestamp), 
-            from_datetime_to_timestamp(curr_location.timestamp)
-        )
-    )   
-
-    return FlightLocation(
-        timestamp=timestamp, 
-        longitude=longitude, 
-        latitude=latitude, 
-        altitude=altitude, 
-        speed=speed, 
-        flight=prev_location.flight)
\ No newline at end of file
+        latitudes, longitudes = mid_points, find_mid_values(longitudes)
+    return (latitudes, longitudes, 
+        find_mid_values(altitudes), find_mid_values(speeds), find_mid_values(epochs))
@@ -4,11 +4,14 @@ from datetime import datetime
 import itertools
 from collections import defaultdict
 
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 
 from common.db import open_database_session
+from common.utils import from_epoch_to_datetime
 from engine.models.section import Section
 from flight.models.airport import Airport
 
@@ -146,13 +149,19 @@ def plot_multiple_flight_locations_params(filepath, multiple_flight_locations):
     plt.savefig(filepath)
 
 def plot_flight_location_altitudes(flight_locations, axis, index=0):
-    timestamps = [flight_location.timestamp for flight_location in flight_locations]
+    timestamps = _timestamps_from_flight_locations(flight_locations)
     altitudes = [float(flight_location.altitude) for flight_location in flight_locations]
     axis.scatter(timestamps, altitudes, c=COLORS[index], alpha=ALPHAS[index])
     return min(timestamps), max(timestamps)
 
 def plot_flight_location_speeds(flight_locations, axis, index=0):
-    timestamps = [flight_location.timestamp for flight_location in flight_locations]
+    timestamps = _timestamps_from_flight_locations(flight_locations)
     speeds = [float(flight_location.speed) for flight_location in flight_locations]
     axis.scatter(timestamps, speeds, c=COLORS[index], alpha=ALPHAS[index])
-    return min(timestamps, default=datetime.max), max(timestamps, default=datetime.min)
\ No newline at end of file
+    return min(timestamps, default=datetime.max), max(timestamps, default=datetime.min)
+
+def _timestamps_from_flight_locations(flight_locations):
+    '''Return timestamps of flight locations, also from archived ones (record array with epochs)'''
+    if isinstance(flight_locations, np.recarray):
+        return [from_epoch_to_datetime(epoch) for epoch in flight_locations.epoch]
+    return [flight_location.timestamp for flight_location in flight_locations]
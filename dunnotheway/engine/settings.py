@@ -14,5 +14,7 @@ with open(CONFIG_PATH) as f:
 NUMBER_ENTRIES_PER_SECTION = config['NUMBER_ENTRIES_PER_SECTION'] # NUMBER OF POINTS PER SECTIONS 
 MIN_NUMBER_SAMPLES = config["MIN_NUMBER_SAMPLES"]
 MAXIMUM_DISTANCE_BETWEEN_SAMPLES = config["MAXIMUM_DISTANCE_BETWEEN_SAMPLES"]
+LOADER_BATCH_SIZE = config['LOADER_BATCH_SIZE'] # ROWS FETCHED PER ROUND TRIP FROM SERVER-SIDE CURSOR
+ARCHIVE_DIR = os.path.join(BASE_DIR, config['ARCHIVE']['DIR_NAME']) # NORMALIZED FLIGHT LOCATIONS PER ROUTE AND DAY
 # # NUMBER_SECTIONS = config['NUMBER_SECTIONS'] # NUMBER OF SECTIONS TO BUILD REPORT
 
@@ -10,7 +10,7 @@ import numpy as np
 import pandas as pd
 import requests
 
-from common.db import open_database_session
+from common.db import transaction
 from flight.models.airport import Airport
 
 
@@ -42,12 +42,11 @@ def download_airports_information():
     return StringIO(r.text)
 
 def insert_airports_in_database(airports_dataframe):
-    with open_database_session() as session:
+    with transaction() as session:
         for _, airport_data in airports_dataframe.iterrows():
             if check_valid_airport(airport_data):
                 airport = get_airport_from_airport_data(airport_data)
                 session.add(airport)
-        session.commit()
     
 def get_airport_from_airport_data(airport_data):
     return Airport(
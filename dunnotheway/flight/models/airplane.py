@@ -1,5 +1,5 @@
 from sqlalchemy import literal, Column, String, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from common.db import Base
 
 
@@ -9,7 +9,7 @@ class Airplane(Base):
     id = Column(Integer, primary_key=True)
     icao_code = Column(String(6), unique=True, nullable=False) # ICAO 24-bit identifier
     airline_id = Column(Integer, ForeignKey('airlines.id'))
-    airline = relationship('Airline', backref='airplanes')
+    airline = relationship('Airline', backref=backref('airplanes', cascade_backrefs=False))
     manufacturer = Column(String)
     model = Column(String)
 
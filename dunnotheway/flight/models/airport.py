@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Numeric, String, Integer
+from sqlalchemy import Column, Float, String, Integer
 from common.db import Base
 from flight.models.bounding_box import BoundingBox
 from flight.models.flight_plan import FlightPlan
@@ -12,9 +12,9 @@ class Airport(Base):
     icao_code = Column(String(4), unique=True, nullable=False) # ICAO airport code / location identifier
     iata_code = Column(String(3)) # IATA airport code / location identifier
     name = Column(String, nullable=False)
-    latitude = Column(Numeric, nullable=False)
-    longitude = Column(Numeric, nullable=False)
-    altitude = Column(Numeric)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    altitude = Column(Float)
     country = Column(String)
 
     def __init__(self, icao_code, name, latitude, longitude, altitude=None, iata_code=None, country='Brazil'):
@@ -75,10 +75,10 @@ class Airport(Base):
 
         if longitude_based:
             start_interval, end_interval = sorted([
-                float(departure_airport.longitude), float(destination_airport.longitude)])
+                departure_airport.longitude, destination_airport.longitude])
         else:
             start_interval, end_interval = sorted([
-                float(departure_airport.latitude), float(destination_airport.latitude)])
+                departure_airport.latitude, destination_airport.latitude])
 
         partitions = split_interval_in_section_partitions(
             start_interval, end_interval, partition_interval)
@@ -90,7 +90,7 @@ class Airport(Base):
         longitude_based = Airport.should_be_longitude_based(
             departure_airport, destination_airport)
 
-        return (float(departure_airport.longitude) < float(destination_airport.longitude) 
+        return (departure_airport.longitude < destination_airport.longitude
                 if longitude_based else 
-                float(departure_airport.latitude) < float(destination_airport.latitude))
+                departure_airport.latitude < destination_airport.latitude)
         
\ No newline at end of file
@@ -1,3 +1,4 @@
+import math
 from collections import namedtuple
 from flight.opensky.settings import (MAX_LATITUDE_BRAZILIAN_AIRSPACE,
                                       MAX_LONGITUDE_BRAZILIAN_AIRSPACE,
@@ -21,13 +22,47 @@ def bounding_box_related_to_airports(departure_airport, destination_airport):
     from departure airport to destination airport
     '''
     return BoundingBox(
-        float(min(departure_airport.latitude, destination_airport.latitude)), 
-        float(max(departure_airport.latitude, destination_airport.latitude)),
-        float(min(departure_airport.longitude, destination_airport.longitude)), 
-        float(max(departure_airport.longitude, destination_airport.longitude)))
+        min(departure_airport.latitude, destination_airport.latitude),
+        max(departure_airport.latitude, destination_airport.latitude),
+        min(departure_airport.longitude, destination_airport.longitude),
+        max(departure_airport.longitude, destination_airport.longitude))
 
 def is_coordinate_inside_bounding_box(coordinate, bbox):
     lat, lon = coordinate
     return (bbox.min_latitude <= lat <= bbox.max_latitude and 
             bbox.min_longitude <= lon <= bbox.max_longitude)
-            
\ No newline at end of file
+
+def union_of_bounding_boxes(bboxes):
+    '''Return smallest bounding box covering all bounding boxes'''
+    bboxes = list(bboxes)
+    return BoundingBox(
+        min(bbox.min_latitude for bbox in bboxes),
+        max(bbox.max_latitude for bbox in bboxes),
+        min(bbox.min_longitude for bbox in bboxes),
+        max(bbox.max_longitude for bbox in bboxes))
+
+def check_bounding_boxes_overlap(this_bbox, that_bbox):
+    return (this_bbox.min_latitude <= that_bbox.max_latitude and
+            that_bbox.min_latitude <= this_bbox.max_latitude and
+            this_bbox.min_longitude <= that_bbox.max_longitude and
+            that_bbox.min_longitude <= this_bbox.max_longitude)
+
+def tiles_of_bounding_box(bbox, tile_size_in_degrees):
+    '''Return tiles (bounding boxes) of a grid aligned to multiples of tile size that cover bounding box'''
+    def grid_range(min_value, max_value):
+        start = math.floor(min_value / tile_size_in_degrees)
+        stop = max(start + 1, math.ceil(max_value / tile_size_in_degrees))
+        return [index * tile_size_in_degrees for index in range(start, stop)]
+
+    return [
+        BoundingBox(latitude, latitude + tile_size_in_degrees,
+                    longitude, longitude + tile_size_in_degrees)
+        for latitude in grid_range(bbox.min_latitude, bbox.max_latitude)
+            for longitude in grid_range(bbox.min_longitude, bbox.max_longitude)]
+
+def tiles_overlapping_bounding_boxes(bbox, bboxes, tile_size_in_degrees):
+    '''Return tiles of bounding box that overlap any of `bboxes`'''
+    bboxes = list(bboxes)
+    return [
+        tile for tile in tiles_of_bounding_box(bbox, tile_size_in_degrees)
+        if any(check_bounding_boxes_overlap(tile, other_bbox) for other_bbox in bboxes)]
@@ -0,0 +1,127 @@
+import gzip
+import time
+
+from common.db import get_engine
+from common.log import get_logger
+from common.utils import time_window_from_dates
+from flight.models.partitions import ensure_partitions
+
+logger = get_logger(__name__)
+
+
+# flight locations rows of import/export files, with flights identified by natural keys
+EXPORT_QUERY = '''
+    SELECT f.id AS source_flight_id, f.created_date, a.icao_code AS airplane_icao_code,
+           fp.callsign, fl.timestamp, fl.longitude::DOUBLE PRECISION, fl.latitude::DOUBLE PRECISION,
+           fl.altitude::DOUBLE PRECISION, fl.speed::DOUBLE PRECISION
+    FROM flight_locations fl
+    JOIN flights f ON f.id = fl.flight_id
+    JOIN airplanes a ON a.id = f.airplane_id
+    LEFT JOIN flight_plans fp ON fp.id = f.flight_plan_id
+    {where}
+    ORDER BY f.id, fl.timestamp'''
+
+STAGING_TABLE_DDL = '''
+    CREATE TEMPORARY TABLE flight_locations_import (
+        source_flight_id INTEGER NOT NULL,
+        created_date TIMESTAMP WITHOUT TIME ZONE,
+        airplane_icao_code VARCHAR NOT NULL,
+        callsign VARCHAR,
+        timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        altitude DOUBLE PRECISION NOT NULL,
+        speed DOUBLE PRECISION NOT NULL
+    ) ON COMMIT DROP'''
+
+# foreign keys are resolved for all staged rows at once
+RESOLVE_FOREIGN_KEYS_STATEMENTS = [
+    # airplanes not seen before (airline from callsign designator)
+    '''INSERT INTO airplanes (icao_code, airline_id)
+       SELECT DISTINCT ON (s.airplane_icao_code) s.airplane_icao_code, al.id
+       FROM flight_locations_import s
+       LEFT JOIN airlines al ON al.icao_code = left(s.callsign, 3)
+       WHERE NOT EXISTS (SELECT 1 FROM airplanes a WHERE a.icao_code = s.airplane_icao_code)
+       ORDER BY s.airplane_icao_code''',
+    # new flight ids of imported flights
+    '''CREATE TEMPORARY TABLE flight_ids_import ON COMMIT DROP AS
+       SELECT source_flight_id, nextval(pg_get_serial_sequence('flights', 'id'))::INTEGER AS flight_id
+       FROM (SELECT DISTINCT source_flight_id FROM flight_locations_import) s''',
+    '''INSERT INTO flights (id, created_date, airplane_id, flight_plan_id)
+       SELECT DISTINCT ON (m.flight_id) m.flight_id, s.created_date, a.id, fp.id
+       FROM flight_locations_import s
+       JOIN flight_ids_import m ON m.source_flight_id = s.source_flight_id
+       JOIN airplanes a ON a.icao_code = s.airplane_icao_code
+       LEFT JOIN flight_plans fp ON fp.callsign = s.callsign
+       ORDER BY m.flight_id''',
+    '''INSERT INTO flight_locations (flight_id, timestamp, longitude, latitude, altitude, speed)
+       SELECT m.flight_id, s.timestamp, s.longitude, s.latitude, s.altitude, s.speed
+       FROM flight_locations_import s
+       JOIN flight_ids_import m ON m.source_flight_id = s.source_flight_id''',
+]
+
+COPY_FORMATS = ('csv', 'binary')
+
+
+def export_flights(path, format='csv', time_window=None):
+    '''Stream flights and flight locations (within time window, if given) to file with COPY,
+    compressed if path ends with `.gz`. `format` is either csv (with header) or binary.'''
+    where = ''
+    cursor_args = None
+    time_window = time_window_from_dates(time_window)
+    if time_window is not None:
+        where, cursor_args = 'WHERE fl.timestamp >= %s AND fl.timestamp < %s', time_window
+
+    connection = get_engine().raw_connection()
+    try:
+        cursor = connection.cursor()
+        query = cursor.mogrify(EXPORT_QUERY.format(where=where), cursor_args).decode()
+        start = time.time()
+        with _open(path, 'wb') as f:
+            cursor.copy_expert('COPY ({0}) TO STDOUT WITH {1}'.format(query, _copy_options(format)), f)
+        logger.info('Export %d flight locations to %s in %.1f secs',
+            cursor.rowcount, path, time.time() - start)
+        connection.commit()
+    finally:
+        connection.close()
+
+def import_flights(path, format='csv'):
+    '''Stream flights and flight locations from file written by `export_flights` with COPY.
+    Rows are staged in a temporary table and foreign keys to airplanes and flight plans are
+    resolved by callsign and ICAO24 address with set-based statements in the same transaction.'''
+    connection = get_engine().raw_connection()
+    try:
+        cursor = connection.cursor()
+        start = time.time()
+        cursor.execute(STAGING_TABLE_DDL)
+        with _open(path, 'rb') as f:
+            cursor.copy_expert('COPY flight_locations_import FROM STDIN WITH {0}'.format(
+                _copy_options(format)), f)
+        count_rows = cursor.rowcount
+
+        cursor.execute("SELECT DISTINCT date_trunc('month', timestamp) FROM flight_locations_import")
+        months = [month for month, in cursor.fetchall()]
+        ensure_partitions('flight_locations', months)
+
+        for statement in RESOLVE_FOREIGN_KEYS_STATEMENTS:
+            cursor.execute(statement)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    elapsed = time.time() - start
+    logger.info('Import %d flight locations from %s in %.1f secs (%.0f rows/sec)',
+        count_rows, path, elapsed, count_rows / elapsed if elapsed else 0)
+    return count_rows
+
+
+def _copy_options(format):
+    if format not in COPY_FORMATS:
+        raise ValueError('COPY format should be one of {0}'.format(COPY_FORMATS))
+    return '(FORMAT csv, HEADER true)' if format == 'csv' else '(FORMAT binary)'
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith('.gz') else open(path, mode)
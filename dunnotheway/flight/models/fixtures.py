@@ -1,46 +1,53 @@
 from datetime import date
 from sqlalchemy import inspect
 
-from common.db import Base, Session, engine
+from common.db import Base, get_engine, transaction
+from common.settings import PARTITIONED_TABLES
 from flight.models.airline import Airline
 from flight.models.airplane import Airplane
 from flight.models.airport import Airport
 from flight.models.flight import Flight
 from flight.models.flight_location import FlightLocation
 from flight.models.flight_plan import FlightPlan
+from flight.models.indexes import apply_indexes
+from flight.models.partitions import PARTITIONED_TABLES_DDL, create_partitioned_tables
 from weather.models.convection_cell import ConvectionCell
 
-from flight.crawlers._openflights.airports import fetch_airports_information
-from flight.crawlers._flightaware.flight_plans import fetch_flight_plans
 
+def init_db():
+    '''Create database tables and fetch airlines, airports and flight plans into an empty database'''
+    engine = get_engine()
+    # checked before tables are created, otherwise database never looks empty
+    is_empty = not inspect(engine).get_table_names()
+    if PARTITIONED_TABLES:
+        Base.metadata.create_all(engine, tables=[
+            table for table in Base.metadata.sorted_tables if table.name not in PARTITIONED_TABLES_DDL])
+        create_partitioned_tables()
+        apply_indexes()
+    Base.metadata.create_all(engine)
+
+    if is_empty:
+        setup_environment()
 
 def setup_environment():
     '''Setup database environment'''
+    # crawlers depend on heavy packages (pandas, scraping), so import them only when needed
+    from flight.crawlers._openflights.airports import fetch_airports_information
+    from flight.crawlers._flightaware.flight_plans import fetch_flight_plans
+
     fetch_airline_companies()
     fetch_airports_information()
     fetch_flight_plans()
 
 def fetch_airline_companies():
-    session = Session()
     # crete airlines
     gol_airline = Airline('GLO', 'Gol Transportes Aéreos', 'Brazil')
     avianca_airline = Airline('ONE', 'Avianca Brazil', 'Brazil')
     tam_airline = Airline('TAM', 'TAM', 'Brazil')
     azul_airline = Airline('AZU', 'Azul Linhas Aéreas Brasileiras', 'Brazil')
-    # persist data
-    session.add(gol_airline)
-    session.add(avianca_airline)
-    session.add(tam_airline)
-    session.add(azul_airline)
-    # commit and close session
-    session.commit()
-    session.close()
-
-
-# create database tables
-Base.metadata.create_all(engine)
-
-# TODO (notworking): check if table names exists via inspect
-ins = inspect(engine)
-if not ins.get_table_names():
-    setup_environment()
\ No newline at end of file
+    # persist data (commit and close session)
+    with transaction() as session:
+        session.add(gol_airline)
+        session.add(avianca_airline)
+        session.add(tam_airline)
+        session.add(azul_airline)
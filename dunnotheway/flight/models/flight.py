@@ -1,21 +1,31 @@
+import math
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+import numpy as np
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import backref, relationship
 from common.db import Base
+from common.utils import RADIUS_EARTH
 from .flight_location import FlightLocation
 from .flight_plan import FlightPlan
 from flight.opensky.models.state_vector import StateVector
+from flight.opensky.settings import (TRAJECTORY_MAX_ALTITUDE_IN_METERS,
+                                     TRAJECTORY_MAX_DISTANCE_IN_METERS)
 
 
 class Flight(Base):
     __tablename__ = 'flights'
+    __table_args__ = (
+        Index('ix_flights_flight_plan_id', 'flight_plan_id'),
+        Index('ix_flights_airplane_id', 'airplane_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     created_date = Column(DateTime)
     airplane_id = Column(Integer, ForeignKey('airplanes.id'))
-    airplane = relationship('Airplane', backref='flights')
+    # in-progress flights must not join the session of their airplane / flight plan
+    airplane = relationship('Airplane', backref=backref('flights', cascade_backrefs=False))
     flight_plan_id = Column(Integer, ForeignKey('flight_plans.id'))
-    flight_plan = relationship('FlightPlan', backref='flights')
+    flight_plan = relationship('FlightPlan', backref=backref('flights', cascade_backrefs=False))
     flight_locations = relationship('FlightLocation', back_populates='flight', cascade="all, delete-orphan")
 
     def __init__(self, airplane, flight_plan):
@@ -35,15 +45,48 @@ class Flight(Base):
         airplane = StateVector.airplane_from_state(session, state)
         return Flight(airplane=airplane, flight_plan=flight_plan)
         
-    def remove_duplicated_flight_locations(self):
-        '''Remove duplicated flight locations.'''
-        unique_flight_locations = []
-        prev = None
-        for curr in self.flight_locations:
-            if not FlightLocation.check_equal_flight_locations(prev, curr):
-                unique_flight_locations.append(curr)
-            prev = curr
-        self.flight_locations = unique_flight_locations
+    @staticmethod
+    def simplified_indices(timestamps, longitudes, latitudes, altitudes,
+                           max_distance=TRAJECTORY_MAX_DISTANCE_IN_METERS,
+                           max_altitude=TRAJECTORY_MAX_ALTITUDE_IN_METERS):
+        '''Return indices of flight locations kept by Douglas-Peucker simplification.
+        The error of a removed flight location is measured against its position interpolated
+        in time between the kept ones: up to `max_distance` meters horizontally and
+        `max_altitude` meters vertically. First and last flight locations are always kept.'''
+        count = len(timestamps)
+        if count <= 2:
+            return np.arange(count)
+
+        t = np.asarray(timestamps, dtype=float)
+        lat = np.asarray(latitudes, dtype=float)
+        alt = np.asarray(altitudes, dtype=float)
+        # equirectangular projection (in meters) is accurate enough at error bound scale
+        y = np.radians(lat) * RADIUS_EARTH
+        x = np.radians(np.asarray(longitudes, dtype=float)) * RADIUS_EARTH * math.cos(np.radians(lat.mean()))
+
+        keep = np.zeros(count, dtype=bool)
+        keep[0] = keep[-1] = True
+        segments = [(0, count-1)]
+        while segments:
+            first, last = segments.pop()
+            if last - first < 2:
+                continue
+            inner = slice(first+1, last)
+            duration = t[last] - t[first]
+            ratio = (t[inner] - t[first]) / duration if duration > 0 else np.zeros(last-first-1)
+
+            def interpolate(values):
+                return values[first] + ratio * (values[last] - values[first])
+
+            distances = np.hypot(x[inner] - interpolate(x), y[inner] - interpolate(y))
+            altitude_errors = np.abs(alt[inner] - interpolate(alt))
+            errors = np.maximum(distances / max_distance, altitude_errors / max_altitude)
+            index = int(np.argmax(errors))
+            if errors[index] > 1:
+                split = first + 1 + index
+                keep[split] = True
+                segments += [(first, split), (split, last)]
+        return np.flatnonzero(keep)
 
 
 FlightLocation.flight = relationship('Flight', back_populates='flight_locations')
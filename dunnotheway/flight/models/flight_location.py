@@ -1,5 +1,5 @@
 import math
-from sqlalchemy import Column, Numeric, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Float, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from common.db import Base
 from common.utils import from_timestamp_to_datetime
@@ -8,13 +8,17 @@ from common.utils import from_timestamp_to_datetime
 
 class FlightLocation(Base):
     __tablename__ = 'flight_locations'
+    __table_args__ = (
+        Index('ix_flight_locations_flight_id_timestamp', 'flight_id', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime)
-    longitude = Column(Numeric, nullable=False)
-    latitude = Column(Numeric, nullable=False)
-    altitude = Column(Numeric, nullable=False)
-    speed = Column(Numeric, nullable=False)
+    # DOUBLE PRECISION columns (see `migrations.migrate_coordinates_to_double_precision`)
+    longitude = Column(Float, nullable=False)
+    latitude = Column(Float, nullable=False)
+    altitude = Column(Float, nullable=False)
+    speed = Column(Float, nullable=False)
     flight_id = Column(Integer, ForeignKey('flights.id'), nullable=False)
     # flight = relationship('Flight', back_populates='flight_locations')
 
@@ -35,9 +39,9 @@ class FlightLocation(Base):
             flight=repr(self.flight))
 
     def __iter__(self):
-        yield float(self.latitude)
-        yield float(self.longitude)
-        yield float(self.altitude)
+        yield self.latitude
+        yield self.longitude
+        yield self.altitude
 
     @staticmethod
     def construct_flight_location_from_state_and_flight(state, flight):
@@ -55,7 +59,3 @@ class FlightLocation(Base):
     def coordinates(self):
         '''Transform flight location into raw tuple (latitude, longitude, altitude)'''
         return tuple(self)
-
-    @staticmethod
-    def check_equal_flight_locations(this, that):
-        return (this and that and tuple(this) == tuple(that))
\ No newline at end of file
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from common.db import Base
 
 
 class FlightPlan(Base):
     __tablename__ = 'flight_plans'
+    __table_args__ = (
+        Index('ix_flight_plans_departure_destination', 'departure_airport_id', 'destination_airport_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     callsign = Column(String, unique=True, nullable=False)
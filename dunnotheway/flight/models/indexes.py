@@ -0,0 +1,82 @@
+from sqlalchemy.dialects import postgresql
+
+from common.db import Base, get_engine, open_database_session
+from common.log import get_logger
+from flight.models.flight import Flight
+from flight.models.flight_location import FlightLocation
+from flight.models.flight_plan import FlightPlan
+from flight.models.partitions import get_partitioned_tables
+from weather.models.convection_cell import ConvectionCell
+
+logger = get_logger(__name__)
+
+
+def apply_indexes():
+    '''Create indexes declared in models (`__table_args__`) missing in database.
+    Indexes are built concurrently, except on partitioned tables, so tables are not locked for writes.
+    Indexes left invalid by a failed or interrupted concurrent build are dropped and built again
+    (`IF NOT EXISTS` would skip them, although the planner never uses them).'''
+    connection = get_engine().connect().execution_options(isolation_level='AUTOCOMMIT')
+    try:
+        partitioned_tables = get_partitioned_tables(connection)
+        invalid_indexes = _invalid_indexes(connection)
+        for table in Base.metadata.sorted_tables:
+            concurrently = '' if table.name in partitioned_tables else 'CONCURRENTLY'
+            for index in table.indexes:
+                if index.name in invalid_indexes:
+                    logger.warning('Rebuild invalid index %s on %s', index.name, table.name)
+                    connection.execute('DROP INDEX {0} IF EXISTS {1}'.format(concurrently, index.name))
+                connection.execute('CREATE INDEX {0} IF NOT EXISTS {1} ON {2} ({3})'.format(
+                    concurrently, index.name, table.name,
+                    ', '.join(column.name for column in index.columns)))
+                logger.info('Apply index %s on %s', index.name, table.name)
+    finally:
+        connection.close()
+
+def check_sequential_scans():
+    '''Return mapping from hot query to tables it scans sequentially (from its EXPLAIN plan).
+    Small tables may still be scanned sequentially, since that is cheaper than using an index.'''
+    with open_database_session() as session:
+        flight_plan = session.query(FlightPlan).first()
+        flight = session.query(Flight).first()
+        cell = session.query(ConvectionCell).first()
+        if not (flight_plan and flight and cell):
+            logger.warning('Not enough data to check sequential scans')
+            return {}
+
+        hot_queries = {
+            'flight_plans_from_airports': session.query(FlightPlan).filter(
+                FlightPlan.departure_airport_id == flight_plan.departure_airport_id,
+                FlightPlan.destination_airport_id == flight_plan.destination_airport_id),
+            'flights_from_flight_plan': session.query(Flight).filter(
+                Flight.flight_plan_id == flight_plan.id),
+            'flight_locations_from_flight': session.query(FlightLocation).filter(
+                FlightLocation.flight_id == flight.id).order_by(FlightLocation.timestamp),
+            'convection_cells_since': session.query(ConvectionCell).filter(
+                ConvectionCell.timestamp >= cell.timestamp),
+        }
+
+        query_to_tables = {}
+        for name, query in hot_queries.items():
+            statement = query.statement.compile(
+                dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+            plan, = session.execute('EXPLAIN (FORMAT JSON) {0}'.format(statement)).scalar()
+            query_to_tables[name] = sorted(_sequentially_scanned_tables(plan['Plan']))
+            if query_to_tables[name]:
+                logger.warning('Query %s scans %s sequentially', name, query_to_tables[name])
+    return query_to_tables
+
+
+def _invalid_indexes(connection):
+    '''Return names of indexes not valid for queries (`pg_index.indisvalid`)'''
+    rows = connection.execute(
+        'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid')
+    return {index_name for index_name, in rows}
+
+def _sequentially_scanned_tables(node):
+    tables = set()
+    if node['Node Type'] == 'Seq Scan':
+        tables.add(node['Relation Name'])
+    for child in node.get('Plans', []):
+        tables |= _sequentially_scanned_tables(child)
+    return tables
@@ -0,0 +1,73 @@
+from sqlalchemy import text
+
+from common.db import get_engine
+from common.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# columns converted from NUMERIC to DOUBLE PRECISION, as pairs of column name and nullable flag
+DOUBLE_PRECISION_COLUMNS = {
+    'flight_locations': [('longitude', False), ('latitude', False), ('altitude', False), ('speed', False)],
+    'airports': [('latitude', False), ('longitude', False), ('altitude', True)],
+}
+MIGRATION_BATCH_SIZE = 50000
+
+
+def migrate_coordinates_to_double_precision(batch_size=MIGRATION_BATCH_SIZE):
+    '''Convert NUMERIC coordinates of flight locations and airports into DOUBLE PRECISION.
+
+    Values are copied to new columns in batches of rows (one transaction per batch),
+    so the tables are only locked to copy rows inserted meanwhile and swap columns.
+    Columns already converted are skipped, so the migration can be run again if interrupted.'''
+    for table_name, columns in DOUBLE_PRECISION_COLUMNS.items():
+        _migrate_table_to_double_precision(table_name, columns, batch_size)
+
+
+def _migrate_table_to_double_precision(table_name, columns, batch_size):
+    with get_engine().begin() as connection:
+        numeric_columns = _numeric_columns(connection, table_name)
+    columns = [(name, nullable) for name, nullable in columns if name in numeric_columns]
+    if not columns:
+        logger.info('Columns of %s are already DOUBLE PRECISION', table_name)
+        return
+
+    assignments = ', '.join(
+        '{0}_double = {0}::DOUBLE PRECISION'.format(name) for name, _ in columns)
+    update_statement = text('UPDATE {0} SET {1} WHERE id >= :start AND id < :stop'.format(
+        table_name, assignments))
+
+    with get_engine().begin() as connection:
+        for name, _ in columns:
+            connection.execute('ALTER TABLE {0} ADD COLUMN IF NOT EXISTS {1}_double DOUBLE PRECISION'.format(
+                table_name, name))
+        min_id, max_id = connection.execute(
+            'SELECT min(id), max(id) FROM {0}'.format(table_name)).fetchone()
+
+    if max_id is not None:
+        for start in range(min_id, max_id + 1, batch_size):
+            with get_engine().begin() as connection:
+                connection.execute(update_statement, start=start, stop=start + batch_size)
+            logger.info('Migrate %s rows up to id %d of %d',
+                table_name, min(start + batch_size - 1, max_id), max_id)
+
+    with get_engine().begin() as connection:
+        connection.execute('LOCK TABLE {0} IN ACCESS EXCLUSIVE MODE'.format(table_name))
+        # rows inserted while batches were running
+        connection.execute(update_statement, start=(max_id or 0) + 1, stop=2**31)
+        for name, nullable in columns:
+            connection.execute('ALTER TABLE {0} DROP COLUMN {1}'.format(table_name, name))
+            connection.execute('ALTER TABLE {0} RENAME COLUMN {1}_double TO {1}'.format(table_name, name))
+            if not nullable:
+                connection.execute('ALTER TABLE {0} ALTER COLUMN {1} SET NOT NULL'.format(table_name, name))
+    logger.info('Migrate columns %s of %s to DOUBLE PRECISION',
+        [name for name, _ in columns], table_name)
+
+
+def _numeric_columns(connection, table_name):
+    '''Return names of NUMERIC columns of table'''
+    rows = connection.execute(
+        text('SELECT column_name FROM information_schema.columns '
+             'WHERE table_name = :table_name AND data_type = :data_type'),
+        table_name=table_name, data_type='numeric')
+    return {column_name for column_name, in rows}
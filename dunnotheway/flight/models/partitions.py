@@ -0,0 +1,144 @@
+import re
+import threading
+from datetime import date
+
+from sqlalchemy import text
+
+from common.db import get_engine
+from common.log import get_logger
+from common.settings import PARTITIONED_TABLES
+
+logger = get_logger(__name__)
+
+
+# tables partitioned by month of their timestamp column (DDL of `create_partitioned_tables`)
+PARTITIONED_TABLES_DDL = {
+    'flight_locations': '''
+        CREATE TABLE IF NOT EXISTS flight_locations (
+            id SERIAL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            latitude DOUBLE PRECISION NOT NULL,
+            altitude DOUBLE PRECISION NOT NULL,
+            speed DOUBLE PRECISION NOT NULL,
+            flight_id INTEGER NOT NULL REFERENCES flights (id),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)''',
+    'convection_cells': '''
+        CREATE TABLE IF NOT EXISTS convection_cells (
+            id SERIAL,
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+            radius DOUBLE PRECISION,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)''',
+}
+PARTITION_NAME_PATTERN = re.compile(r'^(?P<table_name>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$')
+MONTHS_AHEAD_TO_CREATE_PARTITIONS = 2
+
+# global variables
+partitioned_tables = None # names of tables partitioned in database
+existing_partitions = set() # pairs of table name and first day of month, once created partitions are committed
+partitions_lock = threading.Lock() # partitions are ensured by writer thread and tracker thread
+
+
+def create_partitioned_tables():
+    '''Create tables partitioned by month (PostgreSQL 11+) with partitions of the coming months.
+    Tables they reference must exist already.'''
+    global partitioned_tables
+
+    with get_engine().begin() as connection:
+        for table_name, ddl in PARTITIONED_TABLES_DDL.items():
+            connection.execute(ddl)
+            logger.info('Create table %s partitioned by month', table_name)
+    partitioned_tables = None # reload partitioned tables
+    ensure_partitions_ahead()
+
+def ensure_partitions_ahead(months=MONTHS_AHEAD_TO_CREATE_PARTITIONS):
+    '''Create partitions from the current month to `months` months ahead'''
+    first_day = date.today().replace(day=1)
+    timestamps = [_add_months(first_day, count) for count in range(months + 1)]
+    for table_name in PARTITIONED_TABLES_DDL:
+        ensure_partitions(table_name, timestamps)
+
+def ensure_partitions(table_name, timestamps):
+    '''Create monthly partitions of table covering timestamps, if table is partitioned.
+    Partitions are created in their own transaction, so call it BEFORE the transaction inserting rows
+    (creating a partition locks tables it references, which that transaction may have written to).
+    Partitions known to exist are cached once committed, so it is cheap to call it before every insert
+    (and it does not reach the database at all if `PARTITIONED_TABLES` is off).'''
+    if not PARTITIONED_TABLES:
+        return
+    months = {date(timestamp.year, timestamp.month, 1) for timestamp in timestamps}
+    with partitions_lock:
+        months -= {month for name, month in existing_partitions if name == table_name}
+    if not months:
+        return
+
+    with get_engine().begin() as connection:
+        if table_name not in get_partitioned_tables(connection):
+            return
+        for month in months:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS {0} PARTITION OF {1} FOR VALUES FROM (\'{2}\') TO (\'{3}\')'.format(
+                    _partition_name(table_name, month), table_name, month, _add_months(month, 1)))
+            logger.info('Ensure partition of %s for %s', table_name, month.strftime('%Y-%m'))
+    with partitions_lock: # only once committed, partitions rolled back are created again
+        existing_partitions.update((table_name, month) for month in months)
+
+def drop_old_partitions(months_to_keep=12):
+    '''Drop whole monthly partitions older than `months_to_keep` months (retention policy).
+    Flights whose flight locations are dropped are kept.'''
+    cutoff = _add_months(date.today().replace(day=1), -months_to_keep)
+    dropped_partitions = []
+    with get_engine().begin() as connection:
+        for table_name in get_partitioned_tables(connection):
+            for partition_name, month in _partitions(connection, table_name):
+                if _add_months(month, 1) <= cutoff:
+                    connection.execute('DROP TABLE {0}'.format(partition_name))
+                    dropped_partitions.append(partition_name)
+    with partitions_lock:
+        existing_partitions.difference_update(
+            [(table_name, month) for table_name, month in existing_partitions
+                if _add_months(month, 1) <= cutoff])
+    logger.info('Drop partitions older than %s: %s', cutoff, dropped_partitions)
+    return dropped_partitions
+
+
+def get_partitioned_tables(connection):
+    '''Return names of tables partitioned in database (none if `PARTITIONED_TABLES` is off).
+    Partitioned tables are looked up by kind of relation, which is never partitioned ('p')
+    before PostgreSQL 10, so the query works on older servers as well.'''
+    global partitioned_tables
+
+    if not PARTITIONED_TABLES:
+        return set()
+    with partitions_lock:
+        if partitioned_tables is None:
+            rows = connection.execute("SELECT relname FROM pg_class WHERE relkind = 'p'")
+            partitioned_tables = {table_name for table_name, in rows}
+        return partitioned_tables
+
+def _partitions(connection, table_name):
+    '''Return pairs of partition name and month of table partitions'''
+    rows = connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent '
+        'WHERE p.relname = :table_name'), table_name=table_name)
+    partitions = []
+    for partition_name, in rows:
+        match = PARTITION_NAME_PATTERN.match(partition_name)
+        if match and match.group('table_name') == table_name:
+            month = date(int(match.group('year')), int(match.group('month')), 1)
+            partitions.append((partition_name, month))
+    return partitions
+
+def _partition_name(table_name, month):
+    return '{0}_y{1:%Y}m{1:%m}'.format(table_name, month)
+
+def _add_months(month, count):
+    '''Return first day of month `count` months after `month`'''
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
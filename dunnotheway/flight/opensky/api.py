@@ -1,62 +1,273 @@
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from common.log import logger
-from flight.opensky.settings import (ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION,
-                                      OPEN_SKY_URL,
-                                      SLEEP_TIME_TO_RETRY_NEW_CONNECTION_IN_SECS)
+from common.log import get_logger
+from common.scheduler import TokenBucket
+from flight.opensky.settings import (ANONYMOUS_DAILY_CREDITS,
+                                     AUTHENTICATED_DAILY_CREDITS,
+                                     BACKOFF_BASE_TIME_IN_SECS,
+                                     BACKOFF_MAX_TIME_IN_SECS,
+                                     CONNECT_TIMEOUT_IN_SECS,
+                                     CONNECTION_POOL_SIZE,
+                                     ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION,
+                                     MAX_BURST_CREDITS, OPEN_SKY_PASSWORD,
+                                     OPEN_SKY_URL, OPEN_SKY_USERNAME,
+                                     READ_TIMEOUT_IN_SECS,
+                                     SLEEP_TIME_TO_GET_FLIGHT_IN_SECS,
+                                     TILED_POLLING_MAX_WORKERS)
 
-from .models.state_vector import StateVector
+from .models.state_vector_array import StateVectorArray
 
+logger = get_logger(__name__)
+
+
+class OpenSkyClient:
+    '''Class to communicate with OpenSky API
+
+    Requests share a pooled keep-alive connection and are bounded by connect/read timeouts.
+    A failed request does not block: it returns `None` and the next trial is postponed
+    by a jittered exponential backoff, so the caller keeps its own polling pace.
+    Requests spend OpenSky API credits from a token bucket refilled with the daily
+    credits (of an account, if `username` is given, otherwise of anonymous requests),
+    a request the budget cannot afford is not sent and returns `None` as well.
+    Pollers should not poll faster than `polling_period`, so that this barely happens.
+    Clients are thread-safe, so tiles of the airspace can be requested concurrently.'''
+
+    def __init__(self, url=OPEN_SKY_URL, username=OPEN_SKY_USERNAME, password=OPEN_SKY_PASSWORD):
+        self._url = url
+        daily_credits = AUTHENTICATED_DAILY_CREDITS if username else ANONYMOUS_DAILY_CREDITS
+        self.budget = TokenBucket(daily_credits / (24 * 60 * 60), min(MAX_BURST_CREDITS, daily_credits))
+        self._session = requests.Session()
+        if username:
+            self._session.auth = (username, password) # HTTP basic authentication
+        self._session.mount('https://', HTTPAdapter(
+            pool_connections=1, pool_maxsize=CONNECTION_POOL_SIZE))
+        self._timeout = (CONNECT_TIMEOUT_IN_SECS, READ_TIMEOUT_IN_SECS)
+        self._count_failures = 0
+        self._retry_at = 0 # timestamp
+        self._lock = threading.Lock() # guards failures and stats
+        # latency stats (in seconds)
+        self.last_latency = None
+        self.count_requests = 0
+        self.total_latency = 0.0
+
+    def __repr__(self):
+        return 'OpenSkyClient({url})'.format(url=repr(self._url))
+
+    @property
+    def mean_latency(self):
+        '''Return mean latency (in seconds) of requests sent so far'''
+        if not self.count_requests:
+            return None
+        return self.total_latency / self.count_requests
+
+    @property
+    def has_finished(self):
+        '''Check if there is no more traffic to request (live traffic never finishes)'''
+        return False
+
+    def polling_period(self, credits_per_iteration, min_period=SLEEP_TIME_TO_GET_FLIGHT_IN_SECS):
+        '''Return polling period (in seconds, at least `min_period`) at which the credit budget
+        affords requests spending `credits_per_iteration` in the long run'''
+        if self.budget is None:
+            return min_period
+        return max(min_period, credits_per_iteration / self.budget.rate)
+
+    @property
+    def is_available(self):
+        '''Check if client is not waiting for a backoff to finish'''
+        return time.time() >= self._retry_at
+
+    def request(self, payload=None, credits=None):
+        '''Return json response of OpenSky API with `payload` or `None` if the request failed,
+        the client is still backing off from previous failures or the credit budget is exhausted.
+        `credits` are taken from the budget (`request_credits(payload)` by default, 0 if already taken).
+        Raise the last exception after `ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION` failures in a row.'''
+        if not self.is_available:
+            logger.debug('OpenSky API backing off for %.1f secs', self._retry_at - time.time())
+            return None
+        if credits is None:
+            credits = request_credits(payload)
+        if not self.budget.try_acquire(credits):
+            logger.warning('OpenSky API credits exhausted, skip request %r', self.budget)
+            return None
+
+        start = time.time()
+        try:
+            r = self._session.get(
+                self._url, params=payload if payload else {}, timeout=self._timeout)
+            r.raise_for_status()
+            response = r.json()
+        except (requests.exceptions.RequestException, ValueError) as exception:
+            self._handle_request_exception(exception)
+            return None
+        finally:
+            self._record_latency(time.time() - start)
+
+        with self._lock:
+            self._count_failures = 0
+        return response
+
+    def _record_latency(self, latency):
+        with self._lock:
+            self.last_latency = latency
+            self.count_requests += 1
+            self.total_latency += latency
+        logger.debug('OpenSky API request took %.3f secs (mean %.3f secs)',
+            latency, self.mean_latency)
+
+    def _handle_request_exception(self, exception):
+        '''Schedule next trial with full jitter exponential backoff'''
+        with self._lock:
+            self._count_failures += 1
+            if self._count_failures >= ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION:
+                raise exception
+            backoff = min(
+                BACKOFF_MAX_TIME_IN_SECS,
+                BACKOFF_BASE_TIME_IN_SECS * 2 ** (self._count_failures - 1))
+            self._retry_at = time.time() + random.uniform(0, backoff)
+        logger.warning('OpenSky API request failed (%d in a row): %r',
+            self._count_failures, exception)
+
+
+# global variables
+client = None
+executor = None
+
+
+def default_client():
+    '''Return OpenSky client shared by the API functions'''
+    global client
+
+    if client is None:
+        client = OpenSkyClient()
+    return client
+
+def default_executor():
+    '''Return thread pool shared by concurrent requests of tiles'''
+    global executor
+
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=TILED_POLLING_MAX_WORKERS, thread_name_prefix='opensky')
+    return executor
+
+def request_credits(payload=None):
+    '''Return OpenSky API credits spent by a request with `payload` (based on the area of its bounding box)'''
+    if not payload or 'lamin' not in payload:
+        return 4
+    area = (payload['lamax'] - payload['lamin']) * (payload['lomax'] - payload['lomin'])
+    for max_area, credits in ((25, 1), (100, 2), (400, 3)): # in square degrees
+        if area <= max_area:
+            return credits
+    return 4
+
+def credits_from_bounding_boxes(bboxes):
+    '''Return OpenSky API credits spent by one request per bounding box'''
+    return sum(request_credits(_payload_from_bounding_box(bbox)) for bbox in bboxes)
+
+def credits_from_addresses(addresses=None):
+    '''Return OpenSky API credits spent by a request of state-vectors from addresses (as the whole world)'''
+    return request_credits(dict(icao24=addresses))
+
+def can_afford_bounding_boxes(bboxes):
+    '''Check if credit budget of the default client affords one request per bounding box'''
+    client = default_client()
+    if client.budget is None:
+        return True
+    return client.budget.tokens >= credits_from_bounding_boxes(bboxes)
 
 def get_flight_address_from_callsign(callsign):
     '''Return flight ICAO24 address from callsign'''
-    for state in get_states():
+    for state in get_states() or []:
         if state.callsign == callsign:
             return state.address
     return None
 
 def get_states():
-    '''Return current state-vectors'''
-    r = request_open_sky_api()
-    states = StateVector.build_from_dict(r.json())
-    valid_states = [state for state in states if state.check_valid_state()]
-    return valid_states
+    '''Return current state-vectors (`None` if OpenSky API is unavailable)'''
+    response = request_open_sky_api()
+    return _valid_states_from_response(response)
 
 def get_states_from_bounding_box(bbox):
-    '''Return current state-vectors within bounding box'''
-    lamin, lamax, lomin, lomax = bbox
-    payload = dict(lamin=lamin, lamax=lamax, lomin=lomin, lomax=lomax)
-    r = request_open_sky_api(payload)
-    states = StateVector.build_from_dict(r.json())
-    valid_states = [state for state in states if state.check_valid_state()]
-    return valid_states
+    '''Return current state-vectors within bounding box (`None` if OpenSky API is unavailable)'''
+    states = get_state_array_from_bounding_box(bbox)
+    return None if states is None else list(states)
+
+def get_state_array_from_bounding_box(bbox):
+    '''Return current state-vectors within bounding box as a columnar array
+    (`None` if OpenSky API is unavailable)'''
+    response = request_open_sky_api(_payload_from_bounding_box(bbox))
+    return _valid_state_array_from_response(response)
+
+def get_state_array_from_bounding_boxes(bboxes):
+    '''Return current state-vectors within bounding boxes (e.g. tiles of the airspace) as a columnar array.
+    Bounding boxes are requested concurrently and their state-vectors de-duplicated by ICAO24 address
+    (`None` if OpenSky API is unavailable for any of them, since the snapshot would be partial).
+
+    Credits of all requests are taken at once before any is sent, so a snapshot is never
+    paid for in part. Each small bounding box costs 1 credit or more, while a request of
+    any area costs 4 credits at most: tiles trade credits for concurrent, smaller requests.'''
+    if not bboxes:
+        return _valid_state_array_from_response({'time': int(time.time()), 'states': None})
+    if len(bboxes) == 1:
+        return get_state_array_from_bounding_box(bboxes[0])
+    budget = default_client().budget
+    credits = credits_from_bounding_boxes(bboxes)
+    if budget is not None and not budget.try_acquire(credits):
+        logger.warning('OpenSky API credits exhausted, skip %d requests (%d credits) %r',
+            len(bboxes), credits, budget)
+        return None
+    responses = list(default_executor().map(
+        lambda payload: request_open_sky_api(payload, credits=0),
+        map(_payload_from_bounding_box, bboxes)))
+    if any(response is None for response in responses):
+        return None
+    return _valid_state_array_from_response(_merge_responses(responses))
 
 def get_states_from_addresses(addresses):
-    '''Return state-vectors of flights flying from a list of addresses or a single address'''
+    '''Return state-vectors of flights flying from a list of addresses or a single address
+    (`None` if OpenSky API is unavailable)'''
     if not addresses: # empty list
         return []
     payload = dict(icao24=addresses)
-    r = request_open_sky_api(payload)
-    states = StateVector.build_from_dict(r.json())
-    valid_states = [state for state in states if state.check_valid_state()]
-    logger.debug('State-Vectors found from addresses {0}: {1}'.format(
-        addresses, valid_states))
+    response = request_open_sky_api(payload)
+    valid_states = _valid_states_from_response(response)
+    logger.debug('State-Vectors found from addresses %s: %s', addresses, valid_states)
     return valid_states
 
-def request_open_sky_api(payload=None, iterations=0):
-    '''Return request object of `OPEN_SKY_URL` with `payload`.
-    Try to establish connection `ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION` times
-    waiting `SLEEP_TIME_TO_RETRY_NEW_CONNECTION_IN_SECS` seconds between each trial.''' 
-    try:
-        return requests.get(OPEN_SKY_URL, params=payload if payload else {})
-    except requests.exceptions.RequestException as exception:
-        handle_request_exception(exception, iterations)
-        iterations += 1
-    return request_open_sky_api(payload, iterations) 
-    
-def handle_request_exception(exception, iterations):
-    time.sleep(SLEEP_TIME_TO_RETRY_NEW_CONNECTION_IN_SECS)
-    if iterations >= ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION:
-        raise exception
+def request_open_sky_api(payload=None, credits=None):
+    '''Return json response of `OPEN_SKY_URL` with `payload` through the default client
+    (see `OpenSkyClient.request`).'''
+    return default_client().request(payload, credits)
+
+def _payload_from_bounding_box(bbox):
+    lamin, lamax, lomin, lomax = bbox
+    return dict(lamin=lamin, lamax=lamax, lomin=lomin, lomax=lomax)
+
+def _merge_responses(responses):
+    '''Return single response with the most recent state-vector of each ICAO24 address'''
+    address_to_row = {}
+    for response in responses:
+        for row in response['states'] or []:
+            address, time_position = row[0], row[3] or 0
+            if address not in address_to_row or (address_to_row[address][3] or 0) < time_position:
+                address_to_row[address] = row
+    return {
+        'time': max(response['time'] for response in responses),
+        'states': list(address_to_row.values()) or None}
+
+def _valid_states_from_response(response):
+    if response is None:
+        return None
+    return list(_valid_state_array_from_response(response))
+
+def _valid_state_array_from_response(response):
+    if response is None:
+        return None
+    return StateVectorArray.build_from_dict(response).valid()
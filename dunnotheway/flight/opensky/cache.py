@@ -0,0 +1,112 @@
+from collections import OrderedDict
+
+from sqlalchemy.orm import joinedload
+
+from common.log import get_logger
+from flight.models.airline import Airline
+from flight.models.airplane import Airplane
+from flight.models.flight import Flight
+from flight.models.flight_plan import FlightPlan
+from flight.opensky.settings import IDENTITY_CACHE_MAX_SIZE
+
+logger = get_logger(__name__)
+
+
+class BoundedCache:
+    '''Least recently used mapping with bounded size and hit / miss counters'''
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return 'BoundedCache({0} items, {1} hits, {2} misses)'.format(
+            len(self), self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._max_size:
+            self._items.popitem(last=False) # least recently used
+
+    def get(self, key, load):
+        '''Return cached value of `key`, calling `load(key)` on a miss.
+        `None` values are not cached, so they are loaded again next time.'''
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.misses += 1
+        value = load(key)
+        if value is not None:
+            self[key] = value
+        return value
+
+
+class IdentityCache:
+    '''In-process cache of airplanes (by ICAO24 address), airlines (by ICAO code)
+    and flight plans (by callsign) used by the tracker to build new flights.
+
+    Caches are warm-loaded from the database and refreshed on misses, so creating a flight
+    for a known airplane and callsign does not reach the database.'''
+
+    def __init__(self, session, max_size=IDENTITY_CACHE_MAX_SIZE):
+        self._session = session
+        self._max_size = max_size
+        self.airplanes = BoundedCache(max_size)
+        self.airlines = BoundedCache(max_size)
+        self.flight_plans = BoundedCache(max_size)
+
+    def __repr__(self):
+        return 'IdentityCache(airplanes={0!r}, airlines={1!r}, flight_plans={2!r})'.format(
+            self.airplanes, self.airlines, self.flight_plans)
+
+    def warm_load(self):
+        '''Load airlines, flight plans and airplanes in a few queries'''
+        for airline in self._session.query(Airline).limit(self._max_size):
+            self.airlines[airline.icao_code] = airline
+        for flight_plan in self._session.query(FlightPlan).limit(self._max_size):
+            self.flight_plans[flight_plan.callsign] = flight_plan
+        for airplane in (self._session.query(Airplane)
+                            .options(joinedload(Airplane.airline))
+                            .order_by(Airplane.id.desc()) # most recent airplanes first
+                            .limit(self._max_size)):
+            self.airplanes[airplane.icao_code] = airplane
+        logger.info('Warm load %r', self)
+        return self
+
+    def flight_from_state(self, state):
+        '''Return flight object from state-vector (see `Flight.construct_flight_from_state`)'''
+        flight_plan = self.flight_plan_from_callsign(state.callsign)
+        airplane = self.airplane_from_state(state)
+        return Flight(airplane=airplane, flight_plan=flight_plan)
+
+    def flight_plan_from_callsign(self, callsign):
+        return self.flight_plans.get(
+            callsign, lambda callsign: FlightPlan.flight_plan_from_callsign(self._session, callsign))
+
+    def airline_from_callsign(self, callsign):
+        icao_code, _ = FlightPlan.split_callsign(callsign)
+        return self.airlines.get(
+            icao_code, lambda icao_code: self._session.query(Airline).filter(
+                Airline.icao_code == icao_code).first())
+
+    def airplane_from_state(self, state):
+        '''Return airplane object from state-vector (see `StateVector.airplane_from_state`)'''
+        icao_code = state.address
+        airplane = self.airplanes.get(
+            icao_code, lambda icao_code: Airplane.airplane_from_icao_code(self._session, icao_code))
+        if airplane is None: # create new airplane object, saved along with its first flight
+            airplane = Airplane(
+                icao_code=icao_code,
+                airline=self.airline_from_callsign(state.callsign))
+            self.airplanes[icao_code] = airplane
+        return airplane
@@ -0,0 +1,144 @@
+import os
+import struct
+from collections import namedtuple
+
+from common.log import get_logger
+from common.utils import from_timestamp_to_datetime
+from flight.opensky.settings import (JOURNALS_DIR, JOURNAL_FSYNC,
+                                     JOURNAL_MAX_SIZE_IN_BYTES)
+
+from .models.flight_track import FlightTrack
+
+logger = get_logger(__name__)
+
+
+# journaled flight location, with the same attributes as the state-vector it came from
+JournalEntry = namedtuple(
+    'JournalEntry', ['address', 'callsign', 'time_position', 'longitude', 'latitude', 'baro_altitude', 'velocity'])
+
+
+class FlightJournal:
+    '''Append-only journal of in-progress flight locations
+
+    Every flight location kept by the tracker is appended as a fixed-size binary record,
+    and a finish record is appended when the flight is saved or discarded.
+    Records are flushed once per iteration, so restoring the journal after a crash
+    or a redeploy rebuilds the flights that were in the air.
+
+    Finished flights are handed over to the flight writer, so flights of its last
+    batch (a few seconds) are lost if the process crashes before they are saved.'''
+
+    # kind, address, callsign, time position, longitude, latitude, altitude, speed
+    RECORD = struct.Struct('<c6s8s5d')
+    POSITION = b'P'
+    FINISH = b'F'
+
+    def __init__(self, name, journals_dir=JOURNALS_DIR):
+        self._path = os.path.join(journals_dir, name + '.journal')
+        self._file = None
+        if not os.path.exists(journals_dir):
+            os.makedirs(journals_dir)
+
+    def __repr__(self):
+        return 'FlightJournal({path})'.format(path=repr(self._path))
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        self._file = open(self._path, 'ab')
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    @property
+    def size(self):
+        '''Return journal size in bytes'''
+        return os.path.getsize(self._path)
+
+    @property
+    def should_compact(self):
+        return self.size > JOURNAL_MAX_SIZE_IN_BYTES
+
+    def append(self, state):
+        '''Append flight location from state-vector'''
+        self._file.write(FlightJournal.RECORD.pack(
+            FlightJournal.POSITION,
+            _encode(state.address), _encode(state.callsign),
+            state.time_position, state.longitude, state.latitude,
+            state.baro_altitude, state.velocity))
+
+    def finish(self, address):
+        '''Append end of flight of address'''
+        self._file.write(FlightJournal.RECORD.pack(
+            FlightJournal.FINISH, _encode(address), b'', 0, 0, 0, 0, 0))
+
+    def flush(self):
+        self._file.flush()
+        if JOURNAL_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def restore(self, cache):
+        '''Return mapping from address to flight track of flights in progress when journal was left.
+        Flight objects are built from `cache` (see `IdentityCache`).'''
+        address_to_entries = {}
+        for entry in self._read_entries():
+            if entry.callsign is None: # finish record
+                address_to_entries.pop(entry.address, None)
+            else:
+                address_to_entries.setdefault(entry.address, []).append(entry)
+
+        address_to_flight = {}
+        for address, entries in address_to_entries.items():
+            flight = cache.flight_from_state(entries[0])
+            if flight.flight_plan is None: # callsign not tracked anymore
+                continue
+            flight.created_date = from_timestamp_to_datetime(entries[0].time_position)
+            flight_track = FlightTrack(flight)
+            for entry in entries:
+                flight_track.append_state(entry)
+            address_to_flight[address] = flight_track
+
+        logger.info('Restore %d flights from %r', len(address_to_flight), self)
+        self.compact(address_to_flight.values())
+        return address_to_flight
+
+    def compact(self, flight_tracks):
+        '''Rewrite journal with flight locations of in-progress flight tracks only'''
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for flight_track in flight_tracks:
+                address, callsign = _encode(flight_track.address), _encode(flight_track.callsign)
+                for row in zip(flight_track.timestamps, flight_track.longitudes,
+                               flight_track.latitudes, flight_track.altitudes, flight_track.speeds):
+                    f.write(FlightJournal.RECORD.pack(
+                        FlightJournal.POSITION, address, callsign, *row))
+        self.close()
+        os.replace(tmp_path, self._path)
+        self.open()
+        logger.info('Compact %r to %d bytes', self, self.size)
+
+    def _read_entries(self):
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, 'rb') as f:
+            data = f.read()
+        # ignore last record if it was partially written
+        data = data[:len(data) - len(data) % FlightJournal.RECORD.size]
+        for kind, address, callsign, *values in FlightJournal.RECORD.iter_unpack(data):
+            if kind == FlightJournal.FINISH:
+                yield JournalEntry(_decode(address), None, *values)
+            else:
+                yield JournalEntry(_decode(address), _decode(callsign), *values)
+
+
+def _encode(value):
+    return value.encode('ascii', 'replace')
+
+def _decode(value):
+    return value.rstrip(b'\0').decode('ascii')
@@ -0,0 +1,70 @@
+from array import array
+
+from common.utils import from_timestamp_to_datetime
+from flight.models.flight import Flight
+from flight.opensky.settings import TRAJECTORY_COMPRESSION_ENABLED
+
+
+class FlightTrack:
+    '''In-progress flight kept by the tracker
+
+    Flight locations are stored column by column in compact typed arrays instead
+    of `FlightLocation` objects. Duplicated state-vectors (same time position or
+    same coordinates as the last flight location) are dropped as they arrive, and
+    the trajectory is simplified within error bounds when the flight is saved.'''
+
+    def __init__(self, flight):
+        self.flight = flight # flight object WITHOUT flight locations
+        self.timestamps = array('d') # time position as timestamp
+        self.longitudes = array('d')
+        self.latitudes = array('d')
+        self.altitudes = array('d')
+        self.speeds = array('d')
+        self.count_missing_snapshots = 0 # snapshots in a row without flight (snapshot mode)
+
+    def __repr__(self):
+        return 'FlightTrack({flight}, {length})'.format(
+            flight=repr(self.flight), length=len(self))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def address(self):
+        '''Return flight ICAO24 address'''
+        return self.flight.airplane.icao_code
+
+    @property
+    def callsign(self):
+        return self.flight.flight_plan.callsign
+
+    def append_state(self, state):
+        '''Append flight location from state-vector, unless it duplicates the last one.
+        Return whether flight location was appended.'''
+        if self._check_duplicated_state(state):
+            return False
+        self.timestamps.append(state.time_position)
+        self.longitudes.append(state.longitude)
+        self.latitudes.append(state.latitude)
+        self.altitudes.append(state.baro_altitude) # barometric altitude
+        self.speeds.append(state.velocity)
+        return True
+
+    def _check_duplicated_state(self, state):
+        if not self.timestamps:
+            return False
+        return (self.timestamps[-1] == state.time_position or
+                (self.latitudes[-1], self.longitudes[-1], self.altitudes[-1]) ==
+                (state.latitude, state.longitude, state.baro_altitude))
+
+    def flight_locations_rows(self):
+        '''Return flight locations to be persisted as raw tuples (timestamp, longitude, latitude, altitude, speed)'''
+        if TRAJECTORY_COMPRESSION_ENABLED:
+            indices = Flight.simplified_indices(
+                self.timestamps, self.longitudes, self.latitudes, self.altitudes)
+        else:
+            indices = range(len(self))
+        return [
+            (from_timestamp_to_datetime(self.timestamps[index]), self.longitudes[index],
+             self.latitudes[index], self.altitudes[index], self.speeds[index])
+            for index in indices]
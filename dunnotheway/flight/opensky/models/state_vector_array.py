@@ -0,0 +1,106 @@
+import numpy as np
+
+from .state_vector import StateVector
+
+
+class StateVectorArray:
+    '''Columnar representation of State-Vectors of OpenSky Network API
+
+    The `states` rows of a response are decoded once into NumPy columns, so that
+    validity, bounding box and callsign filters run as vectorized masks.
+    `StateVector` objects are only built for rows left after filtering.'''
+
+    # column positions follow `StateVector` arguments
+    ICAO24_INDEX = 0
+    CALLSIGN_INDEX = 1
+    TIME_POSITION_INDEX = 3
+    LONGITUDE_INDEX = 5
+    LATITUDE_INDEX = 6
+    VELOCITY_INDEX = 9
+    BARO_ALTITUDE_INDEX = 13
+
+    def __init__(self, rows, indices, columns):
+        '''Initialize State-Vector array (prefer `build_from_dict`)'''
+        self._rows = rows # raw rows of the response, shared between filtered arrays
+        self._indices = indices # positions of the rows left in `_rows`
+        self._columns = columns
+
+    def __repr__(self):
+        return 'StateVectorArray({0} states)'.format(len(self))
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __iter__(self):
+        '''Return State-Vector objects of remaining rows'''
+        for index in self._indices:
+            yield StateVector(*self._rows[index])
+
+    @staticmethod
+    def build_from_dict(response_dict):
+        rows = response_dict['states'] or []
+        columns = list(zip(*rows)) if rows else [()] * (StateVectorArray.BARO_ALTITUDE_INDEX + 1)
+
+        def as_float(index):
+            # missing values (None) become NaN
+            return np.array(columns[index], dtype=float)
+
+        def as_str(index):
+            return np.char.strip(np.array(
+                ['' if value is None else value for value in columns[index]], dtype=str))
+
+        return StateVectorArray(rows, np.arange(len(rows)), {
+            'icao24': as_str(StateVectorArray.ICAO24_INDEX),
+            'callsign': as_str(StateVectorArray.CALLSIGN_INDEX),
+            'time_position': as_float(StateVectorArray.TIME_POSITION_INDEX),
+            'longitude': as_float(StateVectorArray.LONGITUDE_INDEX),
+            'latitude': as_float(StateVectorArray.LATITUDE_INDEX),
+            'velocity': as_float(StateVectorArray.VELOCITY_INDEX),
+            'baro_altitude': as_float(StateVectorArray.BARO_ALTITUDE_INDEX),
+        })
+
+    @property
+    def addresses(self):
+        '''Return flight ICAO24 addresses'''
+        return self._columns['icao24']
+
+    @property
+    def callsigns(self):
+        return self._columns['callsign']
+
+    @property
+    def longitudes(self):
+        return self._columns['longitude']
+
+    @property
+    def latitudes(self):
+        return self._columns['latitude']
+
+    def filter(self, mask):
+        '''Return State-Vector array with rows selected by boolean `mask`'''
+        return StateVectorArray(
+            self._rows,
+            self._indices[mask],
+            {name: column[mask] for name, column in self._columns.items()})
+
+    def valid(self):
+        '''Return valid State-Vectors (same rule as `StateVector.check_valid_state`)'''
+        mask = np.ones(len(self), dtype=bool)
+        for name in ('time_position', 'longitude', 'latitude', 'velocity', 'baro_altitude'):
+            column = self._columns[name]
+            mask &= ~np.isnan(column) & (column != 0)
+        return self.filter(mask)
+
+    def within_bounding_box(self, bbox, addresses=()):
+        '''Return State-Vectors inside bounding box (or anywhere, if their address is in `addresses`)'''
+        mask = ((bbox.min_latitude <= self.latitudes) & (self.latitudes <= bbox.max_latitude) &
+                (bbox.min_longitude <= self.longitudes) & (self.longitudes <= bbox.max_longitude))
+        if len(addresses):
+            mask |= np.isin(self.addresses, np.array(list(addresses), dtype=str))
+        return self.filter(mask)
+
+    def with_callsigns(self, callsigns):
+        '''Return State-Vectors with callsign in `callsigns`'''
+        if not isinstance(callsigns, np.ndarray):
+            callsigns = np.array(list(callsigns), dtype=str)
+        return self.filter(np.isin(self.callsigns, callsigns))
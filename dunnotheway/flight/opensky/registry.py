@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from sqlalchemy.orm import aliased
+
+from common.log import get_logger
+from flight.models.airport import Airport
+from flight.models.flight_plan import FlightPlan
+from flight.opensky.settings import CALLSIGN_REGISTRY_IDS_TO_SCAN_AGAIN
+
+logger = get_logger(__name__)
+
+
+class CallsignRegistry:
+    '''In-process registry of flight plan callsigns and their routes
+    (pairs of departure and destination airport codes)
+
+    Flight plans are loaded with a column-only query and refreshed incrementally,
+    loading only flight plans with ids greater than the last one seen minus `ids_to_scan_again`
+    (ids of concurrent transactions may be committed out of order, so a lower id may show up later).
+    Flight plans changed or removed in place are seen after a `reload`.'''
+
+    def __init__(self, session, ids_to_scan_again=CALLSIGN_REGISTRY_IDS_TO_SCAN_AGAIN):
+        self._session = session
+        self._ids_to_scan_again = ids_to_scan_again
+        self._last_id = 0
+        self._callsign_to_route = {}
+        self._route_to_callsigns = defaultdict(set)
+
+    def __repr__(self):
+        return 'CallsignRegistry({0} callsigns)'.format(len(self))
+
+    def __len__(self):
+        return len(self._callsign_to_route)
+
+    def __contains__(self, callsign):
+        return callsign in self._callsign_to_route
+
+    @property
+    def callsigns(self):
+        '''Return view of all callsigns'''
+        return self._callsign_to_route.keys()
+
+    def route_from_callsign(self, callsign):
+        '''Return route of callsign (`None` if callsign is unknown)'''
+        return self._callsign_to_route.get(callsign)
+
+    def callsigns_from_route(self, route):
+        return self._route_to_callsigns.get(route, set())
+
+    def callsign_to_route(self, routes):
+        '''Return mapping from callsign to route of callsigns flying any of `routes`'''
+        return {
+            callsign: route
+            for route in routes
+                for callsign in self.callsigns_from_route(route)}
+
+    def refresh(self):
+        '''Load flight plans created since last refresh'''
+        departure_airport, destination_airport = aliased(Airport), aliased(Airport)
+        rows = (self._session.query(
+                    FlightPlan.id, FlightPlan.callsign,
+                    departure_airport.icao_code, destination_airport.icao_code)
+                .outerjoin(departure_airport, FlightPlan.departure_airport_id == departure_airport.id)
+                .outerjoin(destination_airport, FlightPlan.destination_airport_id == destination_airport.id)
+                .filter(FlightPlan.id > self._last_id - self._ids_to_scan_again)
+                .order_by(FlightPlan.id)
+                .all())
+        count_new_flight_plans = 0
+        for flight_plan_id, callsign, departure_airport_code, destination_airport_code in rows:
+            route = (departure_airport_code, destination_airport_code)
+            if self._callsign_to_route.get(callsign) != route:
+                self._add(callsign, route)
+                count_new_flight_plans += 1
+            self._last_id = max(self._last_id, flight_plan_id)
+        if count_new_flight_plans:
+            logger.info('Refresh %r with %d flight plans', self, count_new_flight_plans)
+        return self
+
+    def reload(self):
+        '''Load all flight plans again'''
+        self._last_id = 0
+        self._callsign_to_route.clear()
+        self._route_to_callsigns.clear()
+        return self.refresh()
+
+    def _add(self, callsign, route):
+        old_route = self._callsign_to_route.get(callsign)
+        if old_route is not None:
+            self._route_to_callsigns[old_route].discard(callsign)
+        self._callsign_to_route[callsign] = route
+        self._route_to_callsigns[route].add(callsign)
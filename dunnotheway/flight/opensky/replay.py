@@ -0,0 +1,268 @@
+import bisect
+import gzip
+import json
+import os
+import resource
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import aliased
+
+from common.db import open_database_session
+from common.log import get_logger, log_stats
+from common.scheduler import FixedRateScheduler
+from common.utils import from_datetime_to_timestamp
+from flight.models.airplane import Airplane
+from flight.models.airport import Airport
+from flight.models.bounding_box import BRAZILIAN_AIRSPACE_BBOX
+from flight.models.flight import Flight
+from flight.models.flight_location import FlightLocation
+from flight.models.flight_plan import FlightPlan
+from flight.opensky.settings import (RECORDINGS_DIR,
+                                     SLEEP_TIME_TO_GET_FLIGHT_IN_SECS,
+                                     TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS)
+
+from . import api
+from . import tracker
+from .api import OpenSkyClient
+
+logger = get_logger(__name__)
+
+
+class ReplayClient(ABC):
+    '''Base class of OpenSky clients that play traffic back on a virtual clock
+
+    The virtual clock starts at the first request and runs `speed` times faster
+    than the wall clock. Responses are filtered by the bounding box or addresses
+    of the request payload, as OpenSky API does. Replayed requests spend no credits.'''
+
+    budget = None
+
+    def __init__(self, start_time, speed=1):
+        self._start_time = start_time # virtual timestamp
+        self._start_wall_time = None
+        self.speed = speed
+        self._lock = threading.Lock() # tiles may be requested concurrently
+        # stats
+        self.count_requests = 0
+        self.count_states = 0
+
+    @property
+    def now(self):
+        '''Return current timestamp of the virtual clock'''
+        if self._start_wall_time is None:
+            return self._start_time
+        return self._start_time + (time.time() - self._start_wall_time) * self.speed
+
+    @property
+    @abstractmethod
+    def has_finished(self):
+        '''Check if there is no more traffic to play back'''
+
+    def polling_period(self, credits_per_iteration, min_period=SLEEP_TIME_TO_GET_FLIGHT_IN_SECS):
+        '''Return `min_period` (replayed requests spend no credits)'''
+        return min_period
+
+    def request(self, payload=None, credits=None):
+        '''Return json response (as OpenSky API) of traffic at the current virtual time'''
+        with self._lock:
+            if self._start_wall_time is None:
+                self._start_wall_time = time.time()
+            now = self.now
+            states = [row for row in self._rows_at(now) if _check_row_matches_payload(row, payload)]
+            self.count_requests += 1
+            self.count_states += len(states)
+        return {'time': int(now), 'states': states or None}
+
+    @abstractmethod
+    def _rows_at(self, now):
+        '''Return raw state-vector rows at timestamp `now`'''
+
+
+class RecordingReplayClient(ReplayClient):
+    '''Replay OpenSky API responses recorded by `record_open_sky_api`
+
+    The recording is streamed: only the response being played back is kept in memory.'''
+
+    def __init__(self, path, speed=1):
+        self._path = path
+        self._file = gzip.open(path, 'rt')
+        self._current = None
+        self._next = self._read_response()
+        if self._next is None:
+            raise ValueError('Empty recording {0}'.format(path))
+        super().__init__(self._next['time'], speed)
+
+    def __repr__(self):
+        return 'RecordingReplayClient({path}, {speed}x)'.format(
+            path=repr(self._path), speed=self.speed)
+
+    @property
+    def has_finished(self):
+        return self._next is None and self.now > self._current['time']
+
+    def _rows_at(self, now):
+        while self._next is not None and self._next['time'] <= now:
+            self._current, self._next = self._next, self._read_response()
+        return (self._current['states'] or []) if self._current else []
+
+    def _read_response(self):
+        line = self._file.readline()
+        if not line:
+            self._file.close()
+            return None
+        return json.loads(line)
+
+
+class SyntheticReplayClient(ReplayClient):
+    '''Replay flights saved in database as state-vectors
+
+    Each flight is visible from its first to its last flight location, at its last
+    flight location before the virtual time. With `align_flights`, all flights take off
+    at the same time (highest load), otherwise they keep their original timeline.'''
+
+    def __init__(self, flights, speed=1, align_flights=False):
+        '''`flights` are pairs of (address, callsign) and flight locations
+        (timestamp, longitude, latitude, altitude, speed) sorted by timestamp'''
+        self._flights = []
+        start_time = time.time()
+        if not align_flights:
+            start_time = min(locations[0][0] for _, locations in flights) if flights else start_time
+        for (address, callsign), locations in flights:
+            offset = (start_time - locations[0][0]) if align_flights else 0
+            timestamps = [location[0] + offset for location in locations]
+            self._flights.append((address, callsign, timestamps, locations))
+        self._end_time = max(
+            (timestamps[-1] for _, _, timestamps, _ in self._flights), default=start_time)
+        super().__init__(start_time, speed)
+
+    def __repr__(self):
+        return 'SyntheticReplayClient({count} flights, {speed}x)'.format(
+            count=len(self._flights), speed=self.speed)
+
+    @staticmethod
+    def build_from_database(session, airport_tracking_list=None, speed=1, align_flights=False):
+        '''Load flights (of routes in `airport_tracking_list`, if given) with a single query'''
+        departure_airport, destination_airport = aliased(Airport), aliased(Airport)
+        query = (session.query(
+                    Flight.id, Airplane.icao_code, FlightPlan.callsign,
+                    FlightLocation.timestamp, FlightLocation.longitude,
+                    FlightLocation.latitude, FlightLocation.altitude, FlightLocation.speed)
+                .join(Airplane, Flight.airplane_id == Airplane.id)
+                .join(FlightPlan, Flight.flight_plan_id == FlightPlan.id)
+                .join(FlightLocation, FlightLocation.flight_id == Flight.id))
+        if airport_tracking_list:
+            query = (query
+                .join(departure_airport, FlightPlan.departure_airport_id == departure_airport.id)
+                .join(destination_airport, FlightPlan.destination_airport_id == destination_airport.id)
+                .filter(tuple_(departure_airport.icao_code, destination_airport.icao_code)
+                    .in_([tuple(route) for route in airport_tracking_list])))
+
+        flight_id_to_flight = {}
+        for flight_id, address, callsign, timestamp, *values in query.order_by(
+            Flight.id, FlightLocation.timestamp):
+            _, locations = flight_id_to_flight.setdefault(flight_id, ((address, callsign), []))
+            locations.append((from_datetime_to_timestamp(timestamp), *values))
+        return SyntheticReplayClient(list(flight_id_to_flight.values()), speed, align_flights)
+
+    @property
+    def has_finished(self):
+        return self.now > self._end_time
+
+    def _rows_at(self, now):
+        rows = []
+        for address, callsign, timestamps, locations in self._flights:
+            if not timestamps[0] <= now <= timestamps[-1]:
+                continue
+            index = bisect.bisect_right(timestamps, now) - 1
+            _, longitude, latitude, altitude, speed = locations[index]
+            # same order of `StateVector` arguments
+            rows.append([
+                address, callsign, None, timestamps[index], timestamps[index],
+                longitude, latitude, altitude, False, speed, None,
+                None, None, altitude, None, False, 0])
+        return rows
+
+
+def record_open_sky_api(name, time_limit_in_secs=TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS, bbox=None):
+    '''Record raw OpenSky API responses within bounding box (Brazilian airspace by default)
+    for `time_limit_in_secs` to a compressed file in `RECORDINGS_DIR`, one json response per line.'''
+    if not os.path.exists(RECORDINGS_DIR):
+        os.makedirs(RECORDINGS_DIR)
+    path = os.path.join(RECORDINGS_DIR, name + '.jsonl.gz')
+    lamin, lamax, lomin, lomax = bbox or BRAZILIAN_AIRSPACE_BBOX
+    payload = dict(lamin=lamin, lamax=lamax, lomin=lomin, lomax=lomax)
+    client = OpenSkyClient()
+    scheduler = FixedRateScheduler(client.polling_period(api.request_credits(payload)))
+
+    logger.info('Record OpenSky API responses to %s every %.1f secs', path, scheduler.period)
+    count_responses = 0
+    with gzip.open(path, 'at') as f:
+        for _ in range(max(1, int(time_limit_in_secs // scheduler.period))):
+            scheduler.wait()
+            response = client.request(payload)
+            if response is None: # OpenSky API is unavailable or out of credits
+                continue
+            f.write(json.dumps(response) + '\n')
+            f.flush()
+            count_responses += 1
+    logger.info('Record %d OpenSky API responses to %s', count_responses, path)
+
+def replay_recording(name, speed=1, airport_tracking_list=None):
+    '''Track flights from responses recorded with `record_open_sky_api`
+    at `speed` times the real pace (all en-route flights by default)'''
+    path = os.path.join(RECORDINGS_DIR, name + '.jsonl.gz')
+    return _replay(RecordingReplayClient(path, speed), airport_tracking_list)
+
+def replay_database_flights(speed=1, airport_tracking_list=None, align_flights=False):
+    '''Track flights saved in database (of routes in `airport_tracking_list`, if given)
+    played back as state-vectors at `speed` times the real pace'''
+    with open_database_session() as session:
+        client = SyntheticReplayClient.build_from_database(
+            session, airport_tracking_list, speed, align_flights)
+    return _replay(client, airport_tracking_list)
+
+def _replay(client, airport_tracking_list):
+    '''Run tracker against replay client and return ingest, memory and database write stats.
+    Flights are saved in the database of DUNNO_POSTGRES_* variables, point them to a scratch database.'''
+    logger.info('Replay %r', client)
+    api.client = client
+    tracker.speedup = client.speed
+    tracker.journal_suffix = '-replay'
+
+    start = time.time()
+    if airport_tracking_list:
+        tracker.track_en_route_flights_by_routes(airport_tracking_list)
+    else:
+        tracker.track_en_route_flights()
+    elapsed = time.time() - start
+
+    stats = {
+        'elapsed_time_in_secs': elapsed,
+        'count_requests': client.count_requests,
+        'count_states': client.count_states,
+        'states_per_sec': client.count_states / elapsed,
+        'count_saved_flights': tracker.writer.count_saved_flights,
+        'count_failed_flights': tracker.writer.count_failed_flights,
+        'flight_locations_per_sec': tracker.writer.count_saved_flight_locations / elapsed,
+        'max_memory_in_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'count_log_records': log_stats(),
+    }
+    logger.info('Replay stats of %r: %s', client, stats)
+    return stats
+
+
+def _check_row_matches_payload(row, payload):
+    '''Check if raw state-vector row is selected by OpenSky API request payload'''
+    if not payload:
+        return True
+    if 'icao24' in payload:
+        addresses = payload['icao24']
+        return row[0] in ([addresses] if isinstance(addresses, str) else addresses)
+    longitude, latitude = row[5], row[6]
+    if longitude is None or latitude is None:
+        return False
+    return (payload['lamin'] <= latitude <= payload['lamax'] and
+            payload['lomin'] <= longitude <= payload['lomax'])
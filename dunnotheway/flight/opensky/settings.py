@@ -11,15 +11,69 @@ with open(CONFIG_PATH) as f:
 
 # config variables
 OPEN_SKY_URL = 'https://opensky-network.org/api/states/all'
+# OpenSky Network account (optional environment variables), anonymous requests get fewer credits
+OPEN_SKY_USERNAME = os.environ.get('DUNNO_OPENSKY_USERNAME')
+OPEN_SKY_PASSWORD = os.environ.get('DUNNO_OPENSKY_PASSWORD')
 SLEEP_TIME_TO_GET_FLIGHT_IN_SECS = config['FLIGHT_TRACKER']['SLEEP_TIME_TO_GET_FLIGHT_IN_SECS'] 
 SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS = config['FLIGHT_TRACKER']['SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS']
-ITERATIONS_LIMIT_TO_SEARCH_FLIGHTS = config['FLIGHT_TRACKER']['ITERATIONS_LIMIT_TO_SEARCH_FLIGHTS'] 
+TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS = config['FLIGHT_TRACKER']['TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS']
 FLIGHT_PATH_PARTITION_INTERVAL_IN_DEGREES = config['FLIGHT_TRACKER']['FLIGHT_PATH_PARTITION_INTERVAL_IN_DEGREES'] 
 CRUISING_VERTICAL_RATE_IN_MS = config['FLIGHT_TRACKER']['CRUISING_VERTICAL_RATE_IN_MS'] # METERS / SECOND
 MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS = config['FLIGHT_TRACKER']['MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS']
-SLEEP_TIME_TO_RETRY_NEW_CONNECTION_IN_SECS = config['FLIGHT_TRACKER']['SLEEP_TIME_TO_RETRY_NEW_CONNECTION_IN_SECS'] 
+# flights missing from snapshots for that long are finished (polling period varies with credits, see tracker)
+MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS = config['FLIGHT_TRACKER']['MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS']
+MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT = config['FLIGHT_TRACKER']['MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT'] # IN A ROW
 ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION = config['FLIGHT_TRACKER']['ITERATIONS_LIMIT_TO_RETRY_NEW_CONNECTION'] 
 
+# ADAPTIVE POLLING OF ROUTES
+SLOW_ROUTE_POLLING_PERIOD_IN_ITERATIONS = config['FLIGHT_TRACKER']['SLOW_ROUTE_POLLING_PERIOD_IN_ITERATIONS']
+BUSY_CORRIDOR_MIN_FLIGHTS = config['FLIGHT_TRACKER']['BUSY_CORRIDOR_MIN_FLIGHTS']
+CONVECTION_CELLS_MAX_AGE_IN_SECS = config['FLIGHT_TRACKER']['CONVECTION_CELLS_MAX_AGE_IN_SECS']
+
+# HTTP CLIENT OF OPENSKY API
+CONNECT_TIMEOUT_IN_SECS = config['OPENSKY']['CONNECT_TIMEOUT_IN_SECS']
+READ_TIMEOUT_IN_SECS = config['OPENSKY']['READ_TIMEOUT_IN_SECS']
+CONNECTION_POOL_SIZE = config['OPENSKY']['CONNECTION_POOL_SIZE']
+BACKOFF_BASE_TIME_IN_SECS = config['OPENSKY']['BACKOFF_BASE_TIME_IN_SECS']
+BACKOFF_MAX_TIME_IN_SECS = config['OPENSKY']['BACKOFF_MAX_TIME_IN_SECS']
+ANONYMOUS_DAILY_CREDITS = config['OPENSKY']['ANONYMOUS_DAILY_CREDITS']
+AUTHENTICATED_DAILY_CREDITS = config['OPENSKY']['AUTHENTICATED_DAILY_CREDITS']
+MAX_BURST_CREDITS = config['OPENSKY']['MAX_BURST_CREDITS']
+
+# CONCURRENT POLLING OF AIRSPACE TILES
+# each tile costs 1 credit (up to 25 square degrees) while a request of any area costs 4 credits at most,
+# so tiles trade credits (a longer polling period within the same budget) for smaller, concurrent requests
+TILED_POLLING_ENABLED = config['TILED_POLLING']['ENABLED']
+TILE_SIZE_IN_DEGREES = config['TILED_POLLING']['TILE_SIZE_IN_DEGREES']
+TILED_POLLING_MAX_WORKERS = config['TILED_POLLING']['MAX_WORKERS']
+
+# TRAJECTORY COMPRESSION OF FLIGHT LOCATIONS (ERROR BOUNDS)
+TRAJECTORY_COMPRESSION_ENABLED = config['TRAJECTORY_COMPRESSION']['ENABLED']
+TRAJECTORY_MAX_DISTANCE_IN_METERS = config['TRAJECTORY_COMPRESSION']['MAX_DISTANCE_IN_METERS']
+TRAJECTORY_MAX_ALTITUDE_IN_METERS = config['TRAJECTORY_COMPRESSION']['MAX_ALTITUDE_IN_METERS']
+
+# WRITE-BEHIND PERSISTENCE OF FINISHED FLIGHTS
+FLIGHT_WRITER_BATCH_SIZE = config['FLIGHT_WRITER']['BATCH_SIZE']
+FLIGHT_WRITER_FLUSH_INTERVAL_IN_SECS = config['FLIGHT_WRITER']['FLUSH_INTERVAL_IN_SECS']
+# flights queued before the tracker waits for the writer to catch up
+FLIGHT_WRITER_MAX_QUEUE_SIZE = config['FLIGHT_WRITER']['MAX_QUEUE_SIZE']
+FLIGHT_WRITER_DEAD_LETTERS_PATH = os.path.join(BASE_DIR, config['FLIGHT_WRITER']['DEAD_LETTERS_FILE_NAME'])
+
+# CACHE OF AIRPLANES, AIRLINES AND FLIGHT PLANS
+IDENTITY_CACHE_MAX_SIZE = config['IDENTITY_CACHE']['MAX_SIZE']
+
+# CALLSIGN REGISTRY OF FLIGHT PLANS
+# flight plan ids below the last one seen scanned again, since SERIAL ids may be committed out of order
+CALLSIGN_REGISTRY_IDS_TO_SCAN_AGAIN = config['CALLSIGN_REGISTRY']['IDS_TO_SCAN_AGAIN']
+
+# JOURNAL OF IN-PROGRESS FLIGHTS
+JOURNALS_DIR = os.path.join(BASE_DIR, config['FLIGHT_JOURNAL']['DIR_NAME'])
+JOURNAL_MAX_SIZE_IN_BYTES = config['FLIGHT_JOURNAL']['MAX_SIZE_IN_MB'] * 1024 * 1024
+JOURNAL_FSYNC = config['FLIGHT_JOURNAL']['FSYNC']
+
+# RECORDINGS OF OPENSKY API RESPONSES
+RECORDINGS_DIR = os.path.join(BASE_DIR, config['REPLAY']['DIR_NAME'])
+
 # BASED ON THE COVER AREA OF STSC (SISTEMA DE TEMPO SEVERO CONVECTIVO)
 MIN_LATITUDE_BRAZILIAN_AIRSPACE = config['BRAZILIAN_AIRSPACE']['MIN_LATITUDE_BRAZILIAN_AIRSPACE'] 
 MAX_LATITUDE_BRAZILIAN_AIRSPACE = config['BRAZILIAN_AIRSPACE']['MAX_LATITUDE_BRAZILIAN_AIRSPACE'] 
@@ -1,149 +1,487 @@
-import time
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
-from common.db import open_database_session
-from common.log import logger
+from sqlalchemy.orm import aliased
+
+from common.db import ScopedSession, open_scoped_session
+from common.log import get_logger
+from common.scheduler import FixedRateScheduler
 
 from flight.models.airport import Airport
-from flight.models.bounding_box import (bounding_box_related_to_airports,
-                                        BRAZILIAN_AIRSPACE_BBOX)
-from flight.models.flight import Flight
-from flight.models.flight_location import FlightLocation
+from flight.models.bounding_box import (BRAZILIAN_AIRSPACE_BBOX, BoundingBox,
+                                        bounding_box_related_to_airports,
+                                        is_coordinate_inside_bounding_box,
+                                        tiles_overlapping_bounding_boxes,
+                                        union_of_bounding_boxes)
 from flight.models.flight_plan import FlightPlan
-from flight.opensky.settings import (ITERATIONS_LIMIT_TO_SEARCH_FLIGHTS,
+from flight.opensky.settings import (BUSY_CORRIDOR_MIN_FLIGHTS,
+                                     CONVECTION_CELLS_MAX_AGE_IN_SECS,
+                                     MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT,
                                      MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS,
+                                     MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS,
                                      SLEEP_TIME_TO_GET_FLIGHT_IN_SECS,
-                                     SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS)
+                                     SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS,
+                                     SLOW_ROUTE_POLLING_PERIOD_IN_ITERATIONS,
+                                     TILE_SIZE_IN_DEGREES,
+                                     TILED_POLLING_ENABLED,
+                                     TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS)
+from weather.models.convection_cell import ConvectionCell
+
+from .api import (can_afford_bounding_boxes, credits_from_addresses,
+                  credits_from_bounding_boxes, default_client,
+                  get_state_array_from_bounding_boxes, get_states_from_addresses,
+                  get_states_from_bounding_box)
+from .cache import IdentityCache
+from .journal import FlightJournal
+from .models.flight_track import FlightTrack
+from .registry import CallsignRegistry
+from .writer import FlightWriter
 
-from .api import get_states_from_addresses, get_states_from_bounding_box
+logger = get_logger(__name__)
 
 # global variables
-session = None
+writer = None
+cache = None
+journal = None
+registry = None
 
+# playback speed and journal name suffix of replayed traffic (see `flight.opensky.replay`)
+speedup = 1
+journal_suffix = ''
 
-def track_en_route_flights():
-    '''Keep track of ALL en-route flights'''
-    global session 
+# route of flights tracked within the whole airspace
+AIRSPACE_ROUTE = None
+
+
+def track_en_route_flights(snapshot_mode=True):
+    '''Keep track of ALL en-route flights.
+    In `snapshot_mode`, a single bounding box snapshot per iteration feeds flight
+    discovery and flight locations, otherwise addresses are discovered from time to time
+    and their state-vectors are requested in every iteration.'''
+    global registry
+
+    with _open_tracker('airspace'):
+        if snapshot_mode:
+            _track_flights_from_snapshots(
+                get_callsign_to_route=(lambda: dict.fromkeys(
+                    registry.refresh().callsigns, AIRSPACE_ROUTE)),
+                route_to_bbox={AIRSPACE_ROUTE: BRAZILIAN_AIRSPACE_BBOX},
+                get_route_to_coverage=(lambda: {
+                    AIRSPACE_ROUTE: _get_flight_plans_bounding_boxes()}))
+        else:
+            _track_flights_from_addresses(
+                get_addresses=_get_addresses_within_brazilian_airspace,
+                discovery_bboxes=_get_airspace_discovery_bounding_boxes())
 
-    address_to_flight = {}
-    count_iterations = 0
-    
-    with open_database_session() as session:
-        while count_iterations < ITERATIONS_LIMIT_TO_SEARCH_FLIGHTS:
-            time.sleep(SLEEP_TIME_TO_GET_FLIGHT_IN_SECS)
-            if _should_update_flight_addresses(count_iterations):
-                addresses = _get_addresses_within_brazilian_airspace()
-            _update_flights(address_to_flight, addresses)
-            count_iterations += 1
-            
 
 def track_en_route_flights_by_airports(
-    departure_airport_code, destination_airport_code, round_trip_mode=False):
+    departure_airport_code, destination_airport_code, round_trip_mode=False, snapshot_mode=True):
     '''Keep track of current flights information from departure airport to destination airport.'''
-    global session 
+    if snapshot_mode:
+        track_en_route_flights_by_routes(
+            [(departure_airport_code, destination_airport_code)], round_trip_mode)
+        return
+
+    logger.info('Track flight addresses from %s to %s in %s mode',
+        departure_airport_code, destination_airport_code, 'round trip' if round_trip_mode else 'one way')
+
+    journal_name = '{0}-{1}{2}'.format(
+        departure_airport_code, destination_airport_code, '-round-trip' if round_trip_mode else '')
+    with _open_tracker(journal_name) as session:
+        departure_airport = Airport.airport_from_icao_code(session, departure_airport_code)
+        destination_airport = Airport.airport_from_icao_code(session, destination_airport_code)
+        bbox = bounding_box_related_to_airports(departure_airport, destination_airport)
+        _track_flights_from_addresses(
+            get_addresses=(lambda: _update_flight_addresses(
+                departure_airport, destination_airport, round_trip_mode)),
+            discovery_bboxes=[bbox, bbox] if round_trip_mode else [bbox])
+
+
+def track_en_route_flights_by_routes(airport_tracking_list, round_trip_mode=False):
+    '''Keep track of current flights of many routes, given as pairs of departure and destination airport codes.
+    The bounding box covering all routes is requested once per iteration and state-vectors
+    are routed to the flights of each route by their callsigns.'''
+    logger.info('Track flights of routes %s in %s mode',
+        airport_tracking_list, 'round trip' if round_trip_mode else 'one way')
+
+    with _open_tracker(_journal_name_from_routes(airport_tracking_list, round_trip_mode)):
+        route_to_airports = _routes_from_airport_codes(airport_tracking_list, round_trip_mode)
+        route_to_bbox = {
+            route: bounding_box_related_to_airports(*airports)
+            for route, airports in route_to_airports.items()}
+        _track_flights_from_snapshots(
+            get_callsign_to_route=(lambda: _get_callsign_to_route(route_to_airports)),
+            route_to_bbox=route_to_bbox)
 
-    logger.info('Track flight addresses from {0} to {1} in {2} mode'.format(
-        departure_airport_code, destination_airport_code, 'round trip' if round_trip_mode else 'one way'))
-    
-    address_to_flight = {}
+
+@contextmanager
+def _open_tracker(journal_name):
+    '''Context manager to handle database session, flight writer, identity cache,
+    callsign registry and journal of the tracker'''
+    global writer, cache, journal, registry
+
+    # objects of identity cache are kept along the run, so they are not expired by `_end_read_transaction`
+    with open_scoped_session(expire_on_commit=False) as session, FlightWriter() as writer, \
+         FlightJournal(journal_name + journal_suffix) as journal:
+        cache = IdentityCache(session).warm_load()
+        registry = CallsignRegistry(session)
+        yield session
+
+def _journal_name_from_routes(airport_tracking_list, round_trip_mode):
+    routes = sorted('{0}-{1}'.format(*route) for route in airport_tracking_list)
+    return '_'.join(routes) + ('-round-trip' if round_trip_mode else '')
+
+def _track_flights_from_snapshots(get_callsign_to_route, route_to_bbox, get_route_to_coverage=None):
+    '''Keep track of flights from ONE bounding box request per iteration.
+    `get_callsign_to_route()` maps the callsigns to track to their routes and
+    `route_to_bbox` maps each route to the bounding box its flights should be in.
+    Iterations run at the shortest period whose requests of all routes are afforded by the
+    credit budget of OpenSky API (see `_get_polling_period`). Routes near convection cells
+    or busy are polled in every iteration, other routes less often (see `_get_routes_to_poll`).
+    Flights are finished once missing from polls of their route in a row for
+    `MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS` (see `_update_flights_from_states`).
+    Tracking stops after `TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS` of polling, whatever the period.
+    In tiled polling mode, tiles of the airspace overlapping `get_route_to_coverage()`
+    (bounding boxes flown by flights of each route, route bounding box by default)
+    are requested concurrently instead, which spends more credits and thus polls less often.'''
+    if get_route_to_coverage is None:
+        get_route_to_coverage = lambda: {route: [bbox] for route, bbox in route_to_bbox.items()}
+    route_to_address_to_flight = {route: {} for route in route_to_bbox}
+    route_to_next_iteration = dict.fromkeys(route_to_bbox, 0) # next iteration to poll route
+    route_to_tiles = {}
+    callsign_to_route = {}
+    hot_routes = set()
+    period = SLEEP_TIME_TO_GET_FLIGHT_IN_SECS
+    scheduler = FixedRateScheduler(period / speedup)
+    count_iterations = 0
+    tracking_time = 0 # seconds of polling, at the (virtual) pace of OpenSky API
+
+    while _should_keep_tracking(tracking_time):
+        scheduler.wait()
+        if _should_update_flight_addresses(count_iterations, period):
+            callsign_to_route = get_callsign_to_route()
+            if count_iterations == 0:
+                _restore_flights_to_routes(route_to_address_to_flight, callsign_to_route)
+            else:
+                _compact_journal(route_to_address_to_flight.values())
+            hot_routes = _get_hot_routes(route_to_bbox, route_to_address_to_flight)
+            if TILED_POLLING_ENABLED:
+                route_to_tiles = _get_route_to_tiles(route_to_bbox, get_route_to_coverage())
+            period = _get_polling_period(credits_from_bounding_boxes(
+                _get_bounding_boxes_to_request(route_to_bbox, route_to_bbox, route_to_tiles)))
+            scheduler.period = period / speedup
+        routes, bboxes = _get_routes_to_poll(
+            count_iterations, route_to_next_iteration, hot_routes, route_to_bbox, route_to_tiles)
+        route_to_states = _get_route_to_states_inside_bounding_boxes(
+            callsign_to_route, {route: route_to_bbox[route] for route in routes}, bboxes,
+            route_to_address_to_flight) if routes else None
+        if route_to_states is not None: # skip iteration if OpenSky API is unavailable
+            for route, states in route_to_states.items():
+                iterations_to_next_poll = (
+                    1 if route in hot_routes else SLOW_ROUTE_POLLING_PERIOD_IN_ITERATIONS)
+                _update_flights_from_states(
+                    route_to_address_to_flight[route], states, period * iterations_to_next_poll)
+                route_to_next_iteration[route] = count_iterations + iterations_to_next_poll
+        journal.flush()
+        _end_read_transaction()
+        count_iterations += 1
+        tracking_time += period
+
+def _track_flights_from_addresses(get_addresses, discovery_bboxes):
+    '''Keep track of flights with addresses in `get_addresses()` requesting their state-vectors in every iteration.
+    `discovery_bboxes` are the bounding boxes requested by `get_addresses()`, to keep within the credit budget.'''
+    address_to_flight = journal.restore(cache)
+    # restored flights are kept until addresses are updated
+    addresses, addresses_outdated = list(address_to_flight), True
+    period = _get_polling_period(
+        credits_from_addresses(), credits_from_bounding_boxes(discovery_bboxes))
+    scheduler = FixedRateScheduler(period / speedup)
     count_iterations = 0
-    
-    with open_database_session() as session:
+
+    while _should_keep_tracking(count_iterations * period):
+        scheduler.wait()
+        if addresses_outdated or _should_update_flight_addresses(count_iterations, period):
+            new_addresses = get_addresses()
+            # retry in the next iteration if OpenSky API is unavailable
+            addresses_outdated = (new_addresses is None)
+            addresses = addresses if addresses_outdated else new_addresses
+            _compact_journal([address_to_flight])
+        _update_flights(address_to_flight, addresses)
+        journal.flush()
+        _end_read_transaction()
+        count_iterations += 1
+
+def _restore_flights_to_routes(route_to_address_to_flight, callsign_to_route):
+    '''Restore flights from journal to the routes of their callsigns'''
+    for address, flight_track in journal.restore(cache).items():
+        route = callsign_to_route.get(flight_track.callsign, AIRSPACE_ROUTE)
+        if route in route_to_address_to_flight:
+            route_to_address_to_flight[route][address] = flight_track
+
+def _compact_journal(address_to_flight_mappings):
+    if journal.should_compact:
+        journal.compact([
+            flight_track
+            for address_to_flight in address_to_flight_mappings
+                for flight_track in address_to_flight.values()])
+
+def _end_read_transaction():
+    '''End transaction of tracker session, so it neither holds locks on the tables it reads (blocking
+    `drop_old_partitions` or migrations) nor keeps autovacuum from cleaning rows while waiting.
+    Nothing is written by it (flights are saved by `FlightWriter`), so committing just releases the connection.'''
+    ScopedSession().commit()
+
+def _should_keep_tracking(tracking_time):
+    return (tracking_time < TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS and
+            not default_client().has_finished)
+
+def _should_update_flight_addresses(count_iterations, period):
+    return count_iterations % _count_iterations_to_update_flight_addresses(period) == 0
+
+def _count_iterations_to_update_flight_addresses(period):
+    return max(1, int(SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS // period))
+
+def _get_polling_period(credits_per_iteration, credits_per_update=0):
+    '''Return shortest polling period (in seconds, at least `SLEEP_TIME_TO_GET_FLIGHT_IN_SECS`) at which
+    the credit budget of OpenSky API affords `credits_per_iteration` in every iteration and
+    `credits_per_update` whenever flight addresses are updated'''
+    client = default_client()
+
+    def credits(period):
+        return credits_per_iteration + credits_per_update / _count_iterations_to_update_flight_addresses(period)
+
+    period = SLEEP_TIME_TO_GET_FLIGHT_IN_SECS
+    while client.polling_period(credits(period), period) > period:
+        period *= 1.05
+    logger.info('Poll every %.1f secs (%.2f credits per iteration)', period, credits(period))
+    return period
+
+def _get_hot_routes(route_to_bbox, route_to_address_to_flight):
+    '''Return routes with recent convection cells inside their bounding boxes or busy corridors'''
+    cells = ConvectionCell.convection_cells_since(
+        ScopedSession(), datetime.now() - timedelta(seconds=CONVECTION_CELLS_MAX_AGE_IN_SECS))
+    hot_routes = set()
+    for route, bbox in route_to_bbox.items():
+        if (len(route_to_address_to_flight[route]) >= BUSY_CORRIDOR_MIN_FLIGHTS or
+            any(is_coordinate_inside_bounding_box((cell.latitude, cell.longitude), bbox) for cell in cells)):
+            hot_routes.add(route)
+    logger.debug('Hot routes (near convection cells or busy): %s', hot_routes)
+    return hot_routes
+
+def _get_routes_to_poll(count_iterations, route_to_next_iteration, hot_routes, route_to_bbox, route_to_tiles):
+    '''Return routes due in this iteration, whose requests fit in the credit budget, and
+    the bounding boxes to request. When credits are short, routes other than hot routes are postponed first.'''
+    due_routes = [
+        route for route, next_iteration in route_to_next_iteration.items()
+        if next_iteration <= count_iterations]
+    due_hot_routes = [route for route in due_routes if route in hot_routes]
+    for routes in (due_routes, due_hot_routes):
+        if not routes:
+            continue
+        bboxes = _get_bounding_boxes_to_request(routes, route_to_bbox, route_to_tiles)
+        if can_afford_bounding_boxes(bboxes):
+            return routes, bboxes
+    if due_routes:
+        logger.debug('Postpone routes %s until credits are refilled', due_routes)
+    return [], []
+
+def _get_bounding_boxes_to_request(routes, route_to_bbox, route_to_tiles):
+    '''Return tiles overlapping routes in tiled polling mode, otherwise the bounding box covering routes'''
+    if TILED_POLLING_ENABLED:
+        return sorted(set().union(*(route_to_tiles[route] for route in routes)))
+    return [union_of_bounding_boxes(route_to_bbox[route] for route in routes)]
+
+def _get_route_to_tiles(route_to_bbox, route_to_coverage):
+    '''Return mapping from route to tiles of its bounding box overlapping its coverage'''
+    route_to_tiles = {
+        route: tiles_overlapping_bounding_boxes(bbox, route_to_coverage[route], TILE_SIZE_IN_DEGREES)
+        for route, bbox in route_to_bbox.items()}
+    tiles = set().union(*route_to_tiles.values())
+    logger.info('Poll %d tiles of %s degrees (%d credits, %d as a single request)',
+        len(tiles), TILE_SIZE_IN_DEGREES, credits_from_bounding_boxes(tiles),
+        credits_from_bounding_boxes([union_of_bounding_boxes(route_to_bbox.values())]))
+    return route_to_tiles
+
+def _get_flight_plans_bounding_boxes():
+    '''Return bounding boxes from departure airport to destination airport of flight plans'''
+    departure_airport, destination_airport = aliased(Airport), aliased(Airport)
+    rows = (ScopedSession().query(
+                departure_airport.latitude, departure_airport.longitude,
+                destination_airport.latitude, destination_airport.longitude)
+            .select_from(FlightPlan)
+            .join(departure_airport, FlightPlan.departure_airport_id == departure_airport.id)
+            .join(destination_airport, FlightPlan.destination_airport_id == destination_airport.id)
+            .distinct())
+    return [
+        BoundingBox(min(lat1, lat2), max(lat1, lat2), min(lon1, lon2), max(lon1, lon2))
+        for lat1, lon1, lat2, lon2 in rows]
+
+def _routes_from_airport_codes(airport_tracking_list, round_trip_mode):
+    '''Return mapping from route (departure and destination airport codes) to airports'''
+    session = ScopedSession()
+    route_to_airports = {}
+    for departure_airport_code, destination_airport_code in airport_tracking_list:
         departure_airport = Airport.airport_from_icao_code(session, departure_airport_code)
         destination_airport = Airport.airport_from_icao_code(session, destination_airport_code)
-        
-        while count_iterations < ITERATIONS_LIMIT_TO_SEARCH_FLIGHTS:
-            time.sleep(SLEEP_TIME_TO_GET_FLIGHT_IN_SECS)
-            if _should_update_flight_addresses(count_iterations):
-                addresses = _update_flight_addresses(
-                    departure_airport, destination_airport, round_trip_mode)
-            _update_flights(address_to_flight, addresses)
-            count_iterations += 1
+        route_to_airports[departure_airport_code, destination_airport_code] = (
+            departure_airport, destination_airport)
+        if round_trip_mode:
+            route_to_airports[destination_airport_code, departure_airport_code] = (
+                destination_airport, departure_airport)
+    return route_to_airports
 
+def _get_callsign_to_route(route_to_airports):
+    '''Return mapping from callsign to route of its flight plan'''
+    global registry
 
-def _should_update_flight_addresses(count_iterations):
-    times = SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS//SLEEP_TIME_TO_GET_FLIGHT_IN_SECS
-    return count_iterations % times == 0
+    return registry.refresh().callsign_to_route(route_to_airports.keys())
 
 def _update_flight_addresses(departure_airport, destination_airport, round_trip_mode):
     '''Update pool of flight addresses from time to time'''
-    logger.info('Update flight addresses from {0!r} to {1!r} in {2} mode'.format(
-        departure_airport, destination_airport, 'round trip' if round_trip_mode else 'one way'))
+    logger.info('Update flight addresses from %r to %r in %s mode',
+        departure_airport, destination_airport, 'round trip' if round_trip_mode else 'one way')
 
     addresses = _get_flight_addresses_from_airports(departure_airport, destination_airport)
-    if round_trip_mode:
-        addresses += _get_flight_addresses_from_airports(destination_airport, departure_airport)
+    if addresses is not None and round_trip_mode:
+        return_addresses = _get_flight_addresses_from_airports(destination_airport, departure_airport)
+        addresses = None if return_addresses is None else addresses + return_addresses
     return addresses
 
 def _get_flight_addresses_from_airports(departure_airport, destination_airport):
     '''Return flight ICAO24 addresses from departure airport to destination airport'''
-    global session
+    global registry
 
-    callsigns = Airport.callsigns_from_airports(
-        session, departure_airport, destination_airport)
+    callsigns = registry.refresh().callsigns_from_route(
+        (departure_airport.icao_code, destination_airport.icao_code))
     bbox = bounding_box_related_to_airports(
         departure_airport, destination_airport)
-    addresses = _get_addresses_from_callsigns_inside_bounding_box(callsigns, bbox)    
-    logger.debug('Flight addresses found from {0!r} to {1!r}: {2}'.format(
-        departure_airport, destination_airport, addresses))
+    addresses = _get_addresses_from_callsigns_inside_bounding_box(callsigns, bbox)
+    logger.debug('Flight addresses found from %r to %r: %s',
+        departure_airport, destination_airport, addresses)
     return addresses
 
 def _get_addresses_within_brazilian_airspace():
-    global session
+    '''Return addresses of flights within Brazilian airspace (`None` if OpenSky API is unavailable)'''
+    global registry
 
-    bbox = BRAZILIAN_AIRSPACE_BBOX
-    callsigns = FlightPlan.all_callsigns(session)
-    addresses = _get_addresses_from_callsigns_inside_bounding_box(callsigns, bbox)
-    return addresses
+    callsigns = registry.refresh().callsigns
+    states = get_state_array_from_bounding_boxes(_get_airspace_discovery_bounding_boxes())
+    if states is None:
+        return None
+    return list(states.with_callsigns(callsigns).within_bounding_box(BRAZILIAN_AIRSPACE_BBOX).addresses)
+
+def _get_airspace_discovery_bounding_boxes():
+    '''Return bounding boxes requested to discover flights within Brazilian airspace
+    (tiles overlapping bounding boxes of flight plans in tiled polling mode)'''
+    if TILED_POLLING_ENABLED:
+        return tiles_overlapping_bounding_boxes(
+            BRAZILIAN_AIRSPACE_BBOX, _get_flight_plans_bounding_boxes(), TILE_SIZE_IN_DEGREES)
+    return [BRAZILIAN_AIRSPACE_BBOX]
 
 def _get_addresses_from_callsigns_inside_bounding_box(callsigns, bbox):
-    addresses = []
+    '''Return addresses of flights inside bounding box (`None` if OpenSky API is unavailable)'''
+    states = _get_states_from_callsigns_inside_bounding_box(callsigns, bbox)
+    if states is None:
+        return None
+    return [state.address for state in states]
+
+def _get_states_from_callsigns_inside_bounding_box(callsigns, bbox):
+    '''Return state-vectors of flights inside bounding box (`None` if OpenSky API is unavailable)'''
     states = get_states_from_bounding_box(bbox)
-    for state in states:
-        if state.callsign in callsigns:
-            addresses.append(state.address)
-    return addresses 
+    if states is None:
+        return None
+    return [state for state in states if state.callsign in callsigns]
+
+def _get_route_to_states_inside_bounding_boxes(
+    callsign_to_route, route_to_bbox, bboxes, route_to_address_to_flight):
+    '''Return mapping from route to state-vectors of its flights requested from bounding boxes
+    (`None` if OpenSky API is unavailable). New flights are only found inside the bounding box
+    of their route, flights already tracked are kept wherever they are.'''
+    states = get_state_array_from_bounding_boxes(bboxes)
+    if states is None:
+        return None
+
+    route_to_callsigns = defaultdict(list)
+    for callsign, route in callsign_to_route.items():
+        route_to_callsigns[route].append(callsign)
+
+    states = states.with_callsigns(callsign_to_route.keys())
+    return {
+        route: list(states
+            .with_callsigns(route_to_callsigns[route])
+            .within_bounding_box(route_bbox, route_to_address_to_flight[route].keys()))
+        for route, route_bbox in route_to_bbox.items()}
 
 def _update_flights(address_to_flight, addresses):
-    '''Update address to flight mapping, which maps identifiers to flight objects and keeps track of current state-vector information'''
+    '''Update address to flight mapping, which maps identifiers to flight tracks and keeps track of current state-vector information'''
     _update_finished_flights(address_to_flight, addresses)
     _update_current_flights(address_to_flight, addresses)
 
+def _update_flights_from_states(address_to_flight, states, poll_period=SLEEP_TIME_TO_GET_FLIGHT_IN_SECS):
+    '''Update address to flight mapping from state-vectors of the current snapshot, taken every `poll_period`.
+    A flight is only finished when missing from snapshots in a row for `MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS`
+    (and at least `MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT`), so that a single invalid state-vector
+    does not split it in many flights.'''
+    missing_snapshots_to_finish_flight = _count_missing_snapshots_to_finish_flight(poll_period)
+    addresses = {state.address for state in states}
+    for address, flight_track in address_to_flight.items():
+        if address in addresses:
+            flight_track.count_missing_snapshots = 0
+        else:
+            flight_track.count_missing_snapshots += 1
+    _update_finished_flights(address_to_flight, [
+        address for address, flight_track in address_to_flight.items()
+            if flight_track.count_missing_snapshots < missing_snapshots_to_finish_flight])
+    _update_current_flights_from_states(address_to_flight, states)
+
+def _count_missing_snapshots_to_finish_flight(poll_period):
+    return max(MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT,
+               math.ceil(MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS / poll_period))
+
 def _update_finished_flights(address_to_flight, addresses):
     '''Update finished flights in address to flight mappig'''
     old_addresses = address_to_flight.keys() - addresses
-    logger.info('Update finished flights (addresses): {0}'.format(old_addresses))
+    logger.info('Update finished flights (addresses): %s', old_addresses)
 
-    def _has_enough_flight_locations(flight):
-        return len(flight.flight_locations) >= MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS
+    def _has_enough_flight_locations(flight_track):
+        # duplicated flight locations were already dropped
+        return len(flight_track) >= MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS
 
     for address in old_addresses:
-        flight = address_to_flight[address]
-        flight.remove_duplicated_flight_locations()
+        flight_track = address_to_flight[address]
         # save objects in database
-        if _has_enough_flight_locations(flight):
-            _save_flight(flight) 
+        if _has_enough_flight_locations(flight_track):
+            _save_flight(flight_track)
         del address_to_flight[address]
+        journal.finish(address)
 
 def _update_current_flights(address_to_flight, addresses):
     '''Update address to flight mapping with current values of addresses'''
-    global session
-    
-    logger.info('Update current flights: {0}'.format(addresses))
+    logger.info('Update %d current flights', len(addresses))
+    logger.debug('Current flights (addresses): %s', addresses)
+
+    states = get_states_from_addresses(addresses)
+    if states is None: # keep flights as they are until next iteration
+        return
+    _update_current_flights_from_states(address_to_flight, states)
+
+def _update_current_flights_from_states(address_to_flight, states):
+    '''Update address to flight mapping with current state-vectors'''
+    global cache, journal
 
-    for state in get_states_from_addresses(addresses):
+    for state in states:
         address = state.address
         if address not in address_to_flight:
-            new_flight = Flight.construct_flight_from_state(session, state)
-            address_to_flight[address] = new_flight
-        flight = address_to_flight[address]
-        (FlightLocation
-            .construct_flight_location_from_state_and_flight(state, flight))
-
-def _save_flight(flight):
-    '''Save flight information in database (flight locations included)'''
-    global session
-
-    logger.info('Save flight {0!r}'.format(flight))
-    session.add(flight)
-    session.commit()
-        
+            new_flight = cache.flight_from_state(state)
+            address_to_flight[address] = FlightTrack(new_flight)
+        if address_to_flight[address].append_state(state):
+            journal.append(state)
+
+def _save_flight(flight_track):
+    '''Save flight information in database (flight locations included) in background'''
+    global writer
+
+    logger.info('Save flight %r', flight_track)
+    writer.save(flight_track)
@@ -0,0 +1,271 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from common.db import get_engine
+from common.log import get_logger
+from common.utils import from_datetime_to_epoch, from_epoch_to_datetime
+from flight.models.airplane import Airplane
+from flight.models.flight import Flight
+from flight.models.flight_location import FlightLocation
+from flight.models.partitions import ensure_partitions
+from flight.opensky.settings import (FLIGHT_WRITER_BATCH_SIZE,
+                                     FLIGHT_WRITER_DEAD_LETTERS_PATH,
+                                     FLIGHT_WRITER_FLUSH_INTERVAL_IN_SECS,
+                                     FLIGHT_WRITER_MAX_QUEUE_SIZE)
+
+logger = get_logger(__name__)
+
+
+# plain copy of a finished flight, safe to hand over to the writer thread
+FlightRecord = namedtuple(
+    'FlightRecord', ['created_date', 'airplane_icao_code', 'airline_id', 'flight_plan_id', 'flight_locations'])
+
+# stop sentinel of the writer thread
+_STOP = None
+
+
+class FlightWriter:
+    '''Write-behind persistence of finished flights
+
+    Flights are queued by the tracker and saved by a background thread in batches,
+    using its own connection: flights are inserted one by one (to get their ids) and
+    flight locations of the whole batch are inserted at once with `executemany`.
+    The tracker only waits on the database if `max_queue_size` flights are queued,
+    and its session only reads.
+
+    If a batch fails, whatever the error, its flights are saved one by one, and flights failing
+    on their own are appended to the dead-letter file (see `save_dead_letters`), so they are not lost.
+    Flights are not queued anymore if the writer thread died anyway.'''
+
+    def __init__(self, batch_size=FLIGHT_WRITER_BATCH_SIZE,
+                 flush_interval=FLIGHT_WRITER_FLUSH_INTERVAL_IN_SECS,
+                 dead_letters_path=FLIGHT_WRITER_DEAD_LETTERS_PATH,
+                 max_queue_size=FLIGHT_WRITER_MAX_QUEUE_SIZE):
+        self._queue = queue.Queue(max_queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._dead_letters_path = dead_letters_path
+        self._thread = threading.Thread(target=self._run, name='flight-writer', daemon=True)
+        # stats
+        self.count_saved_flights = 0
+        self.count_saved_flight_locations = 0
+        self.count_failed_flights = 0 # written to dead-letter file
+
+    def __repr__(self):
+        return 'FlightWriter({0} queued, {1} saved, {2} failed)'.format(
+            self._queue.qsize(), self.count_saved_flights, self.count_failed_flights)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        '''Save flights still queued and stop writer thread'''
+        if self.is_alive:
+            self._queue.put(_STOP)
+            self._thread.join()
+        logger.info('Stop %r', self)
+
+    @property
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def save(self, flight_track):
+        '''Queue flight track (flight locations included) to be saved in database.
+        Raise `RuntimeError` if the writer thread is not running, instead of queueing flights never saved.'''
+        if not self.is_alive:
+            raise RuntimeError('{0!r} is not running'.format(self))
+        self._queue.put(FlightWriter.record_from_flight_track(flight_track))
+
+    @staticmethod
+    def record_from_flight_track(flight_track):
+        '''Return flight record from flight track'''
+        flight = flight_track.flight
+        airplane = flight.airplane
+        if airplane.airline_id is not None or airplane.airline is None:
+            airline_id = airplane.airline_id
+        else: # airplane not saved yet
+            airline_id = airplane.airline.id
+        flight_plan_id = flight.flight_plan.id if flight.flight_plan else None
+        return FlightRecord(
+            flight.created_date, airplane.icao_code, airline_id, flight_plan_id,
+            flight_track.flight_locations_rows())
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            records, stopped = self._next_records()
+            if records:
+                try:
+                    self._write_records(records)
+                except Exception: # e.g. dead-letter file not writable, keep saving next flights
+                    logger.exception('Failed to save %d flights', len(records))
+
+    def _next_records(self):
+        '''Return records queued within flush interval (up to batch size) and whether writer was stopped'''
+        records = []
+        deadline = None
+        while len(records) < self._batch_size:
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return records, True
+            records.append(record)
+            if deadline is None:
+                deadline = time.time() + self._flush_interval
+        return records, False
+
+    def _write_records(self, records):
+        try:
+            count_flight_locations = FlightWriter._insert_records(records)
+        except Exception:
+            logger.warning('Failed to save %d flights at once, save them one by one',
+                len(records), exc_info=True)
+            self._write_records_one_by_one(records)
+            return
+
+        self.count_saved_flights += len(records)
+        self.count_saved_flight_locations += count_flight_locations
+        logger.info('Save %d flights (%d flight locations)',
+            len(records), count_flight_locations)
+
+    def _write_records_one_by_one(self, records):
+        '''Save records in their own transactions, writing failed ones to dead-letter file'''
+        count_failed_flights = 0
+        for record in records:
+            try:
+                count_flight_locations = FlightWriter._insert_records([record])
+            except Exception:
+                logger.exception('Failed to save flight of %s, write it to %s',
+                    record.airplane_icao_code, self._dead_letters_path)
+                try:
+                    write_dead_letters(self._dead_letters_path, [record])
+                except Exception:
+                    logger.exception('Failed to write flight of %s to %s, it is lost',
+                        record.airplane_icao_code, self._dead_letters_path)
+                count_failed_flights += 1
+                continue
+            self.count_saved_flights += 1
+            self.count_saved_flight_locations += count_flight_locations
+        self.count_failed_flights += count_failed_flights
+        logger.info('Save %d flights one by one (%d failed)',
+            len(records) - count_failed_flights, count_failed_flights)
+
+    @staticmethod
+    def _insert_records(records):
+        '''Insert records in a single transaction (after creating partitions they need in their own)
+        and return number of flight locations inserted'''
+        flights_table = Flight.__table__
+        flight_locations_table = FlightLocation.__table__
+
+        ensure_partitions(flight_locations_table.name, [
+            timestamp for record in records if record.flight_locations
+                for timestamp in (record.flight_locations[0][0], record.flight_locations[-1][0])])
+        with get_engine().begin() as connection:
+            airplane_ids = FlightWriter._airplane_ids_from_records(connection, records)
+            flight_locations = []
+            for record in records:
+                flight_id = connection.execute(
+                    flights_table.insert().returning(flights_table.c.id),
+                    created_date=record.created_date,
+                    airplane_id=airplane_ids[record.airplane_icao_code],
+                    flight_plan_id=record.flight_plan_id).scalar()
+                flight_locations += [
+                    dict(flight_id=flight_id, timestamp=timestamp, longitude=longitude,
+                         latitude=latitude, altitude=altitude, speed=speed)
+                    for timestamp, longitude, latitude, altitude, speed in record.flight_locations]
+            if flight_locations:
+                connection.execute(flight_locations_table.insert(), flight_locations)
+        return len(flight_locations)
+
+    @staticmethod
+    def _airplane_ids_from_records(connection, records):
+        '''Return mapping from ICAO24 address to airplane id, inserting unknown airplanes.
+        Airplanes inserted meanwhile by another process are kept (`ON CONFLICT DO NOTHING`).'''
+        airplanes_table = Airplane.__table__
+
+        def select_airplane_ids(icao_codes):
+            return dict(connection.execute(
+                airplanes_table.select()
+                    .with_only_columns([airplanes_table.c.icao_code, airplanes_table.c.id])
+                    .where(airplanes_table.c.icao_code.in_(icao_codes))).fetchall())
+
+        icao_code_to_airline_id = {
+            record.airplane_icao_code: record.airline_id for record in records}
+        airplane_ids = select_airplane_ids(icao_code_to_airline_id)
+        new_airplanes = [
+            dict(icao_code=icao_code, airline_id=airline_id)
+            for icao_code, airline_id in icao_code_to_airline_id.items()
+                if icao_code not in airplane_ids]
+        if new_airplanes:
+            connection.execute(
+                insert(airplanes_table).on_conflict_do_nothing(
+                    index_elements=[airplanes_table.c.icao_code]),
+                new_airplanes)
+            airplane_ids.update(select_airplane_ids(
+                [airplane['icao_code'] for airplane in new_airplanes]))
+        return airplane_ids
+
+
+def save_dead_letters(path=FLIGHT_WRITER_DEAD_LETTERS_PATH):
+    '''Save flights written to dead-letter file by the flight writer.
+    Flights failing again are written back to it. Return number of flights saved.'''
+    if not os.path.exists(path):
+        return 0
+    retry_path = path + '.retry'
+    os.replace(path, retry_path) # flights failing again go to a new file
+    records = read_dead_letters(retry_path)
+
+    writer = FlightWriter(dead_letters_path=path)
+    for start in range(0, len(records), writer._batch_size):
+        writer._write_records(records[start:start + writer._batch_size])
+    os.remove(retry_path)
+    logger.info('Save %d flights of %d from dead-letter file %s',
+        writer.count_saved_flights, len(records), path)
+    return writer.count_saved_flights
+
+def write_dead_letters(path, records):
+    '''Append flight records to dead-letter file, one JSON object per line'''
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(_dict_from_record(record)) + '\n')
+
+def read_dead_letters(path):
+    '''Return flight records of dead-letter file'''
+    with open(path) as f:
+        return [_record_from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def _dict_from_record(record):
+    # datetime objects as seconds since epoch
+    return dict(
+        record._asdict(),
+        created_date=(None if record.created_date is None
+            else from_datetime_to_epoch(record.created_date)),
+        flight_locations=[
+            [from_datetime_to_epoch(timestamp)] + list(values)
+            for timestamp, *values in record.flight_locations])
+
+def _record_from_dict(d):
+    return FlightRecord(**dict(
+        d,
+        created_date=(None if d['created_date'] is None
+            else from_epoch_to_datetime(d['created_date'])),
+        flight_locations=[
+            (from_epoch_to_datetime(epoch),) + tuple(values)
+            for epoch, *values in d['flight_locations']]))
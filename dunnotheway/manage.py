@@ -1,22 +1,51 @@
+import importlib
+import sys
+
 import fire 
-import flight.models.fixtures
-import flight.opensky.tracker as flight_tracker
-import weather.stsc.tracker as weather_tracker
-from engine import detector
+
+from common.log import setup_logging
+
+
+# commands as pairs of module and function names, imported only when command is run
+COMMANDS = {
+    # offline methods
+    'init-db': ('flight.models.fixtures', 'init_db'),
+    'track-en-route-flights': ('flight.opensky.tracker', 'track_en_route_flights'),
+    'track-airports': ('flight.opensky.tracker', 'track_en_route_flights_by_airports'),
+    'track-routes': ('flight.opensky.tracker', 'track_en_route_flights_by_routes'),
+    'track-convection-cells': ('weather.stsc.tracker', 'track_convection_cells'),
+    'migrate-coordinates': ('flight.models.migrations', 'migrate_coordinates_to_double_precision'),
+    'ensure-partitions': ('flight.models.partitions', 'ensure_partitions_ahead'),
+    'drop-old-partitions': ('flight.models.partitions', 'drop_old_partitions'),
+    'apply-indexes': ('flight.models.indexes', 'apply_indexes'),
+    'check-indexes': ('flight.models.indexes', 'check_sequential_scans'),
+    'export-flights': ('flight.models.bulk', 'export_flights'),
+    'import-flights': ('flight.models.bulk', 'import_flights'),
+    'save-dead-letters': ('flight.opensky.writer', 'save_dead_letters'),
+    'archive-routes': ('engine.archive', 'archive_routes'),
+    'record-open-sky-api': ('flight.opensky.replay', 'record_open_sky_api'),
+    'replay-recording': ('flight.opensky.replay', 'replay_recording'),
+    'replay-database-flights': ('flight.opensky.replay', 'replay_database_flights'),
+    
+    # online methods
+    'search-intersections-convection-cells': ('engine.detector', 'search_intersections_convection_cells'),
+    # 'search-flight-deviations': ('flight.opensky.tracker', 'search_flight_deviations'),
+}
+
+
+def load_command(name):
+    '''Return function of command, importing its module'''
+    module_name, function_name = COMMANDS[name]
+    return getattr(importlib.import_module(module_name), function_name)
 
 
 if __name__ == '__main__':
-    fire.Fire({
-        # offline methods
-        'track-en-route-flights': flight_tracker.track_en_route_flights,
-        'track-airports': flight_tracker.track_en_route_flights_by_airports,
-        'track-convection-cells': weather_tracker.track_convection_cells,
-        
-        # online methods
-        'search-intersections-convection-cells': detector.search_intersections_convection_cells,
-        # 'search-flight-deviations': flight_tracker.search_flight_deviations,
-    })
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in COMMANDS:
+        print('Usage: manage.py COMMAND [ARGS]\n\nCommands:\n  {0}'.format('\n  '.join(COMMANDS)))
+        sys.exit(0 if command in (None, '-h', '--help') else 2)
+    setup_logging()
+    fire.Fire({command: load_command(command)})
 
     # flight_tracker.track_en_route_flights_by_airports('SBBR', 'SBGR', 
     #     round_trip_mode=True, tracking_mode=True)
-    
\ No newline at end of file
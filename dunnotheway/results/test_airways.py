@@ -14,7 +14,7 @@ from common.db import open_database_session
 from common.settings import BASE_DIR
 from common.utils import (distance_three_dimensions_coordinates,
                           distance_two_dimensions_coordinates)
-from engine.detector import (ALGORITHM_MAP,
+from engine.detector import (get_algorithm,
                              search_intersections_convection_cells)
 from engine.models.section import Section
 from engine.normalizer import normalize_from_flight_locations
@@ -278,7 +278,7 @@ def plot_airways(
     # if os.path.exists(filepath_airways):
     #     return None, None
         
-    algorithm = ALGORITHM_MAP[algorithm_name]
+    algorithm = get_algorithm(algorithm_name)
 
     wrapper_sections = algorithm.sections_from_airports(
         departure_airport, 
@@ -13,7 +13,7 @@ from common.db import open_database_session
 from common.settings import BASE_DIR
 from common.utils import (distance_three_dimensions_coordinates,
                           distance_two_dimensions_coordinates)
-from engine.detector import (ALGORITHM_MAP,
+from engine.detector import (get_algorithm,
                              search_intersections_convection_cells)
 from engine.models.section import Section
 from engine.plot import plot_sections
@@ -185,7 +185,7 @@ def get_delimitation_results(
     min_number_samples, 
     max_distance_between_samples
 ):
-    algorithm = ALGORITHM_MAP[algorithm_name]
+    algorithm = get_algorithm(algorithm_name)
 
     for departure_airport, destination_airport in manager:
         
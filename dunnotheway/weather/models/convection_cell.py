@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 
 from common.db import Base
@@ -10,6 +10,9 @@ from flight.models.bounding_box import (bounding_box_related_to_airports,
 
 class ConvectionCell(Base):
     __tablename__ = 'convection_cells'
+    __table_args__ = (
+        Index('ix_convection_cells_timestamp', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     latitude = Column(Float)
@@ -47,6 +50,19 @@ class ConvectionCell(Base):
     def all_convection_cells(session):
         return session.query(ConvectionCell).all()
 
+    @staticmethod
+    def convection_cells_since(session, timestamp):
+        '''Return convection cells tracked from timestamp (datetime object) on'''
+        return session.query(ConvectionCell).filter(
+            ConvectionCell.timestamp >= timestamp).all()
+
+    @staticmethod
+    def convection_cells_within_time_window(session, time_window):
+        '''Return convection cells tracked within time window (pair of datetime objects, end excluded)'''
+        start, end = time_window
+        return session.query(ConvectionCell).filter(
+            ConvectionCell.timestamp >= start, ConvectionCell.timestamp < end).all()
+
     def is_convection_cells_between_airports(self, departure_airport, destination_airport):
         bbox = bounding_box_related_to_airports(departure_airport, destination_airport)
         return is_coordinate_inside_bounding_box(
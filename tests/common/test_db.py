@@ -0,0 +1,34 @@
+import threading
+import time
+
+from sqlalchemy import create_engine
+from .. import context
+from common import db
+
+
+def test_engine_is_created_once_by_racing_threads(monkeypatch):
+    engines = []
+
+    def create_db_engine():
+        time.sleep(0.05) # let other threads reach the check
+        engines.append(create_engine('sqlite://'))
+        return engines[-1]
+
+    monkeypatch.setattr(db, 'engine', None)
+    monkeypatch.setattr(db, 'create_db_engine', create_db_engine)
+    threads = [threading.Thread(target=db.get_engine) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(engines) == 1
+    assert db.get_engine() is engines[0]
+
+def test_scoped_session_is_removed_after_use(monkeypatch):
+    monkeypatch.setattr(db, 'engine', create_engine('sqlite://'))
+
+    with db.open_scoped_session() as session:
+        assert db.ScopedSession() is session
+    assert db.ScopedSession() is not session
+    db.ScopedSession.remove()
@@ -0,0 +1,18 @@
+from .. import context
+from common import log
+
+
+def test_logging_is_set_up_once(monkeypatch):
+    listeners = []
+    monkeypatch.setattr(log, 'listener', None)
+    monkeypatch.setattr(log, '_start_listener', lambda: listeners.append(object()) or listeners[-1])
+
+    log.setup_logging()
+    log.setup_logging()
+
+    assert len(listeners) == 1
+    assert log.listener is listeners[0]
+
+def test_parse_log_levels():
+    assert log._parse_log_levels('info, sqlalchemy.engine=warning,') == {
+        None: 'INFO', 'sqlalchemy.engine': 'WARNING'}
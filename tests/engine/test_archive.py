@@ -0,0 +1,64 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from .. import context
+from common.utils import from_datetime_to_epoch
+from engine import archive
+
+DEPARTURE_AIRPORT = SimpleNamespace(id=1, icao_code='SBBR')
+DESTINATION_AIRPORT = SimpleNamespace(id=2, icao_code='SBSP')
+
+
+def flight_location(timestamp, flight_id=1):
+    return SimpleNamespace(
+        flight_id=flight_id, timestamp=timestamp, epoch=from_datetime_to_epoch(timestamp),
+        latitude=-15.0, longitude=-47.0, altitude=10000.0, speed=230.0)
+
+
+@pytest.fixture
+def route(monkeypatch, tmpdir):
+    '''Route whose flight locations and latest flight id are set by tests'''
+    route = SimpleNamespace(max_flight_id=1, flight_locations=[])
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmpdir))
+    monkeypatch.setattr(archive, '_max_flight_id', lambda *args: route.max_flight_id)
+    monkeypatch.setattr(archive.normalizer, 'normalize_from_airports',
+        lambda session, *args: route.flight_locations)
+    return route
+
+def archive_route(time_window=None):
+    return archive.archive_route(None, DEPARTURE_AIRPORT, DESTINATION_AIRPORT, time_window)
+
+def is_route_up_to_date(time_window=None):
+    return archive.is_route_up_to_date(None, DEPARTURE_AIRPORT, DESTINATION_AIRPORT, time_window)
+
+
+def test_route_is_out_of_date_after_new_flights(route):
+    assert not is_route_up_to_date() # not archived
+    route.flight_locations = [flight_location(datetime(2018, 7, 1, 12))]
+    archive_route()
+    assert is_route_up_to_date()
+    assert is_route_up_to_date((datetime(2018, 7, 1), datetime(2018, 7, 2)))
+
+    route.max_flight_id = 2
+    assert not is_route_up_to_date()
+
+def test_route_archived_within_time_window_does_not_cover_other_days(route):
+    time_window = (datetime(2018, 7, 1), datetime(2018, 7, 3))
+    route.flight_locations = [flight_location(datetime(2018, 7, 1, 12))]
+    archive_route(time_window)
+
+    assert is_route_up_to_date(time_window)
+    assert is_route_up_to_date((datetime(2018, 7, 2), datetime(2018, 7, 3)))
+    assert not is_route_up_to_date((datetime(2018, 6, 30), datetime(2018, 7, 3)))
+    assert not is_route_up_to_date()
+
+def test_full_rebuild_drops_days_without_flight_locations(route):
+    route.flight_locations = [
+        flight_location(datetime(2018, 7, 1, 12)), flight_location(datetime(2018, 7, 2, 12), flight_id=2)]
+    archive_route()
+    route.flight_locations = route.flight_locations[1:] # first flight deleted
+    archive_route()
+
+    flight_locations = archive.load_route(DEPARTURE_AIRPORT, DESTINATION_AIRPORT)
+    assert list(flight_locations.flight_id) == [2]
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from .. import context
+from engine.models.route import Route
+from engine.normalizer import normalize_flight_arrays
+
+
+def airport(icao_code, latitude, longitude):
+    return SimpleNamespace(icao_code=icao_code, latitude=latitude, longitude=longitude)
+
+ROUTES = [ # longitude and latitude based routes in both directions
+    (airport('SBBR', -15.87, -47.92), airport('SBGL', -22.81, -43.25)),
+    (airport('SBGL', -22.81, -43.25), airport('SBBR', -15.87, -47.92)),
+    (airport('SBBR', -15.87, -47.92), airport('SBBE', -1.38, -48.48)),
+    (airport('SBBE', -1.38, -48.48), airport('SBBR', -15.87, -47.92)),
+]
+
+
+def normalize_flight_locations_loop(flight_locations, route):
+    '''Normalization of flight locations (latitude, longitude, altitude, speed, epoch) one pair at a time,
+    as it was done before `normalize_flight_arrays`'''
+    index = 1 if route.longitude_based else 0
+    flight_locations = sorted(
+        flight_locations, key=(lambda fl: fl[index]), reverse=(not route.follow_ascending_order))
+    section_points = iter(route.section_points.tolist())
+    mid_point = next(section_points)
+
+    normalized_flight_locations = []
+    for prev_location, curr_location in zip(flight_locations, flight_locations[1:]):
+        try:
+            while route.is_before(mid_point, prev_location[index]):
+                mid_point = next(section_points)
+        except StopIteration:
+            break
+
+        start_interval, end_interval = sorted([prev_location[index], curr_location[index]])
+        if start_interval <= mid_point < end_interval:
+            alpha = (mid_point - prev_location[index]) / (curr_location[index] - prev_location[index])
+            normalized_flight_location = [
+                prev + alpha * (curr - prev) for prev, curr in zip(prev_location, curr_location)]
+            normalized_flight_location[index] = mid_point
+            normalized_flight_locations.append(tuple(normalized_flight_location))
+    return normalized_flight_locations
+
+def flight_locations_along(route, random, count):
+    '''Noisy flight locations from departure airport to (and a bit beyond) destination airport'''
+    departure_airport, destination_airport = route
+    ratios = np.sort(random.uniform(-0.05, 1.05, count))
+    latitudes = departure_airport.latitude + ratios * (destination_airport.latitude - departure_airport.latitude)
+    longitudes = departure_airport.longitude + ratios * (destination_airport.longitude - departure_airport.longitude)
+    return list(zip(
+        np.round(latitudes + random.normal(0, 0.05, count), 2).tolist(), # ties with section points
+        np.round(longitudes + random.normal(0, 0.05, count), 2).tolist(),
+        (10000.0 + random.normal(0, 100, count)).tolist(),
+        (230.0 + random.normal(0, 10, count)).tolist(),
+        (1530000000.0 + np.arange(count) * 10.0).tolist()))
+
+
+@pytest.mark.parametrize('airports', ROUTES)
+def test_normalize_flight_arrays_as_loop(airports):
+    route = Route.from_airports(*airports)
+    random = np.random.RandomState(7)
+
+    for count in (0, 1, 2, 50, 500):
+        flight_locations = flight_locations_along(airports, random, count)
+        expected = normalize_flight_locations_loop(flight_locations, route)
+
+        latitudes, longitudes, altitudes, speeds, epochs = np.array(
+            flight_locations, dtype=float).reshape(-1, 5).T.copy()
+        normalized = normalize_flight_arrays(latitudes, longitudes, altitudes, speeds, epochs, route)
+
+        assert len(normalized[0]) == len(expected)
+        if expected:
+            assert np.allclose(np.column_stack(normalized), np.array(expected))
@@ -0,0 +1,16 @@
+from sqlalchemy import create_engine
+from .. import context
+from flight.models import fixtures
+
+
+def test_init_db_sets_up_empty_database_only(monkeypatch):
+    engine = create_engine('sqlite://')
+    setups = []
+    monkeypatch.setattr(fixtures, 'get_engine', lambda: engine)
+    monkeypatch.setattr(fixtures, 'PARTITIONED_TABLES', False)
+    monkeypatch.setattr(fixtures, 'setup_environment', lambda: setups.append(True))
+
+    fixtures.init_db()
+    fixtures.init_db()
+
+    assert setups == [True]
@@ -0,0 +1,44 @@
+from .. import context
+from flight.models import indexes
+
+
+class FakeConnection:
+    '''Connection to a database with `invalid_indexes`, recording statements'''
+
+    def __init__(self, invalid_indexes=()):
+        self.invalid_indexes = invalid_indexes
+        self.statements = []
+
+    def execution_options(self, **kwargs):
+        return self
+
+    def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement))
+        if 'indisvalid' in str(statement):
+            return [(index_name,) for index_name in self.invalid_indexes]
+        return []
+
+    def close(self):
+        pass
+
+
+def apply_indexes(monkeypatch, connection):
+    engine = type('FakeEngine', (), {'connect': lambda self: connection})()
+    monkeypatch.setattr(indexes, 'get_engine', lambda: engine)
+    monkeypatch.setattr(indexes, 'get_partitioned_tables', lambda connection: set())
+    indexes.apply_indexes()
+    return [statement for statement in connection.statements if 'INDEX' in statement]
+
+
+def test_invalid_indexes_are_rebuilt(monkeypatch):
+    statements = apply_indexes(monkeypatch, FakeConnection(['ix_convection_cells_timestamp']))
+
+    index = statements.index('DROP INDEX CONCURRENTLY IF EXISTS ix_convection_cells_timestamp')
+    assert statements[index + 1] == (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_convection_cells_timestamp ON convection_cells (timestamp)')
+
+def test_valid_indexes_are_kept(monkeypatch):
+    statements = apply_indexes(monkeypatch, FakeConnection())
+
+    assert statements
+    assert not [statement for statement in statements if statement.startswith('DROP')]
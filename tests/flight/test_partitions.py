@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from .. import context
+from flight.models import partitions
+
+
+class FakeConnection:
+    '''Connection to a database with `partitioned_tables`, recording statements'''
+
+    def __init__(self, partitioned_tables=()):
+        self.partitioned_tables = partitioned_tables
+        self.statements = []
+
+    def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement))
+        if 'pg_class' in str(statement):
+            return [(table_name,) for table_name in self.partitioned_tables]
+        return []
+
+
+class FakeEngine:
+    '''Engine of a single connection, whose transactions fail while `failing` is set'''
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.failing = False
+
+    @contextmanager
+    def begin(self):
+        yield self.connection
+        if self.failing:
+            raise RuntimeError('transaction rolled back')
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    monkeypatch.setattr(partitions, 'partitioned_tables', None)
+    monkeypatch.setattr(partitions, 'existing_partitions', set())
+    monkeypatch.setattr(partitions, 'PARTITIONED_TABLES', True)
+
+def use_connection(monkeypatch, connection):
+    engine = FakeEngine(connection)
+    monkeypatch.setattr(partitions, 'get_engine', lambda: engine)
+    return engine
+
+def created_statements(connection):
+    return sorted(statement for statement in connection.statements if 'CREATE TABLE' in statement)
+
+
+def test_ensure_partitions_without_partitioned_tables_setting(partitioned, monkeypatch):
+    monkeypatch.setattr(partitions, 'PARTITIONED_TABLES', False)
+    connection = FakeConnection(['flight_locations'])
+    use_connection(monkeypatch, connection)
+
+    partitions.ensure_partitions('flight_locations', [datetime(2018, 7, 1)])
+
+    assert connection.statements == [] # database not reached (e.g. PostgreSQL < 10)
+    assert partitions.get_partitioned_tables(connection) == set()
+
+def test_ensure_partitions_looks_up_tables_by_relation_kind(partitioned, monkeypatch):
+    connection = FakeConnection()
+    use_connection(monkeypatch, connection)
+
+    partitions.ensure_partitions('flight_locations', [datetime(2018, 7, 1)])
+
+    assert len(connection.statements) == 1
+    assert "relkind = 'p'" in connection.statements[0]
+    assert 'pg_partitioned_table' not in connection.statements[0] # PostgreSQL 10+ only
+
+def test_ensure_partitions_once_per_month(partitioned, monkeypatch):
+    connection = FakeConnection(['flight_locations'])
+    use_connection(monkeypatch, connection)
+    timestamps = [datetime(2018, 7, 1), datetime(2018, 7, 31, 23, 59), datetime(2018, 8, 1)]
+
+    partitions.ensure_partitions('flight_locations', timestamps)
+    partitions.ensure_partitions('flight_locations', timestamps)
+    partitions.ensure_partitions('convection_cells', timestamps) # not partitioned
+
+    assert created_statements(connection) == [
+        "CREATE TABLE IF NOT EXISTS flight_locations_y2018m07 PARTITION OF flight_locations "
+            "FOR VALUES FROM ('2018-07-01') TO ('2018-08-01')",
+        "CREATE TABLE IF NOT EXISTS flight_locations_y2018m08 PARTITION OF flight_locations "
+            "FOR VALUES FROM ('2018-08-01') TO ('2018-09-01')",
+    ]
+
+def test_partitions_rolled_back_are_created_again(partitioned, monkeypatch):
+    connection = FakeConnection(['flight_locations'])
+    engine = use_connection(monkeypatch, connection)
+    engine.failing = True
+
+    with pytest.raises(RuntimeError):
+        partitions.ensure_partitions('flight_locations', [datetime(2018, 7, 1)])
+    assert partitions.existing_partitions == set()
+
+    engine.failing = False
+    partitions.ensure_partitions('flight_locations', [datetime(2018, 7, 1)])
+    assert len(created_statements(connection)) == 2
+    assert partitions.existing_partitions == {('flight_locations', datetime(2018, 7, 1).date())}
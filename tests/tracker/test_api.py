@@ -0,0 +1,93 @@
+import pytest
+from .. import context
+from flight.models.bounding_box import BRAZILIAN_AIRSPACE_BBOX, BoundingBox
+from flight.opensky import api, tracker
+from flight.opensky.api import OpenSkyClient
+from flight.opensky.settings import (ANONYMOUS_DAILY_CREDITS,
+                                     AUTHENTICATED_DAILY_CREDITS,
+                                     SLEEP_TIME_TO_GET_FLIGHT_IN_SECS,
+                                     SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS)
+
+SECS_PER_DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def client(monkeypatch):
+    '''Default client of anonymous requests'''
+    client = OpenSkyClient(username=None)
+    monkeypatch.setattr(api, 'client', client)
+    return client
+
+
+def test_request_credits_by_area():
+    assert api.request_credits() == 4
+    assert api.credits_from_addresses(['abc123']) == 4
+    assert api.credits_from_bounding_boxes([BRAZILIAN_AIRSPACE_BBOX]) == 4
+    assert api.credits_from_bounding_boxes([
+        BoundingBox(0, 5, 0, 5), BoundingBox(0, 10, 0, 10), BoundingBox(0, 20, 0, 20)]) == 1 + 2 + 3
+
+def test_daily_credits_of_anonymous_and_authenticated_clients():
+    anonymous = OpenSkyClient(username=None)
+    authenticated = OpenSkyClient(username='user', password='secret')
+
+    assert anonymous.budget.rate * SECS_PER_DAY == pytest.approx(ANONYMOUS_DAILY_CREDITS)
+    assert authenticated.budget.rate * SECS_PER_DAY == pytest.approx(AUTHENTICATED_DAILY_CREDITS)
+    assert anonymous._session.auth is None
+    assert authenticated._session.auth == ('user', 'secret')
+
+def test_request_out_of_credits_is_not_sent(client, monkeypatch):
+    def get(*args, **kwargs):
+        raise AssertionError('request should not be sent')
+
+    monkeypatch.setattr(client._session, 'get', get)
+    while client.budget.try_acquire(4):
+        pass
+
+    assert client.request() is None
+
+def test_polling_period_fits_daily_credits(client):
+    period = client.polling_period(4)
+
+    assert period == pytest.approx(4 * SECS_PER_DAY / ANONYMOUS_DAILY_CREDITS)
+    assert client.polling_period(0) == SLEEP_TIME_TO_GET_FLIGHT_IN_SECS
+
+def test_tracker_polling_period_spends_at_most_daily_credits(client):
+    credits_per_iteration, credits_per_update = 1, 4
+    period = tracker._get_polling_period(credits_per_iteration, credits_per_update)
+    iterations_per_update = tracker._count_iterations_to_update_flight_addresses(period)
+    iterations_per_day = SECS_PER_DAY / period
+
+    assert period >= SLEEP_TIME_TO_GET_FLIGHT_IN_SECS
+    assert iterations_per_update == max(1, SLEEP_TIME_TO_SEARCH_NEW_FLIGHTS_IN_SECS // period)
+    assert iterations_per_day * (
+        credits_per_iteration + credits_per_update / iterations_per_update) <= ANONYMOUS_DAILY_CREDITS
+    # about 10% faster would not
+    period /= 1.1
+    assert SECS_PER_DAY / period * (credits_per_iteration + credits_per_update /
+        tracker._count_iterations_to_update_flight_addresses(period)) > ANONYMOUS_DAILY_CREDITS
+
+def test_tiles_are_charged_at_once(client, monkeypatch):
+    tiles = [BoundingBox(0, 5, 0, 5), BoundingBox(0, 5, 5, 10), BoundingBox(5, 10, 0, 5)]
+    requests = []
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'time': 0, 'states': None}
+
+    def get(url, params, timeout):
+        requests.append(params)
+        return Response()
+
+    monkeypatch.setattr(client._session, 'get', get)
+    tokens = client.budget.tokens
+    assert api.get_state_array_from_bounding_boxes(tiles) is not None
+    assert len(requests) == 3
+    assert tokens - client.budget.tokens == pytest.approx(3, abs=0.01)
+
+    while client.budget.try_acquire(1):
+        pass
+    assert api.get_state_array_from_bounding_boxes(tiles) is None
+    assert len(requests) == 3 # none sent without credits for all tiles
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import numpy as np
+from .. import context
+from common.utils import distance_two_dimensions_coordinates, from_timestamp_to_datetime
+from flight.models.flight import Flight
+from flight.opensky.models import flight_track as flight_track_module
+from flight.opensky.models.flight_track import FlightTrack
+
+
+def state(time_position, latitude, longitude=-47.0, baro_altitude=10000.0, velocity=230.0):
+    return SimpleNamespace(
+        time_position=time_position, latitude=latitude, longitude=longitude,
+        baro_altitude=baro_altitude, velocity=velocity)
+
+def flight():
+    return SimpleNamespace(
+        airplane=SimpleNamespace(icao_code='abc123'),
+        flight_plan=SimpleNamespace(callsign='TAM3000'))
+
+
+def test_duplicated_states_are_dropped():
+    flight_track = FlightTrack(flight())
+
+    assert flight_track.append_state(state(1, -15.0))
+    assert not flight_track.append_state(state(1, -14.9)) # same time position
+    assert not flight_track.append_state(state(2, -15.0)) # same coordinates
+    assert flight_track.append_state(state(3, -14.9))
+    assert len(flight_track) == 2
+    assert (flight_track.address, flight_track.callsign) == ('abc123', 'TAM3000')
+
+def test_flight_locations_rows_without_compression(monkeypatch):
+    monkeypatch.setattr(flight_track_module, 'TRAJECTORY_COMPRESSION_ENABLED', False)
+    flight_track = FlightTrack(flight())
+    for time_position in range(1, 4):
+        flight_track.append_state(state(time_position, -15.0 + time_position, velocity=200.0 + time_position))
+
+    assert flight_track.flight_locations_rows() == [
+        (from_timestamp_to_datetime(time_position), -47.0, -15.0 + time_position, 10000.0, 200.0 + time_position)
+        for time_position in range(1, 4)]
+
+
+def test_simplified_indices_of_straight_flight():
+    timestamps = list(range(0, 100, 10))
+    longitudes = [-47.0 + 0.01 * index for index in range(10)]
+
+    indices = Flight.simplified_indices(timestamps, longitudes, [-15.0] * 10, [10000.0] * 10)
+
+    assert list(indices) == [0, 9]
+    assert list(Flight.simplified_indices([1, 2], [-47.0, -46.0], [-15.0] * 2, [10000.0] * 2)) == [0, 1]
+
+def test_simplified_indices_within_error_bounds():
+    random = np.random.RandomState(42)
+    count = 200
+    timestamps = np.cumsum(random.uniform(5, 15, count))
+    longitudes = -47.0 + np.cumsum(random.normal(0.01, 0.002, count))
+    latitudes = -15.0 + np.cumsum(random.normal(0.0, 0.002, count))
+    altitudes = 10000.0 + np.cumsum(random.normal(0, 20, count))
+    max_distance, max_altitude = 100, 30
+
+    indices = Flight.simplified_indices(
+        timestamps, longitudes, latitudes, altitudes, max_distance, max_altitude)
+
+    assert indices[0] == 0 and indices[-1] == count - 1
+    assert 2 < len(indices) < count
+    # removed flight locations are interpolated in time between kept ones within error bounds
+    for first, last in zip(indices, indices[1:]):
+        for index in range(first + 1, last):
+            ratio = (timestamps[index] - timestamps[first]) / (timestamps[last] - timestamps[first])
+
+            def interpolate(values):
+                return values[first] + ratio * (values[last] - values[first])
+
+            distance = distance_two_dimensions_coordinates(
+                (latitudes[index], longitudes[index]), (interpolate(latitudes), interpolate(longitudes)))
+            assert distance <= max_distance * 1.01 # equirectangular projection error
+            assert abs(altitudes[index] - interpolate(altitudes)) <= max_altitude
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from .. import context
+from flight.opensky.journal import FlightJournal
+
+
+def state(address, time_position, callsign='TAM3000'):
+    return SimpleNamespace(
+        address=address, callsign=callsign, time_position=time_position,
+        longitude=-47.0, latitude=-15.0 + time_position, baro_altitude=10000.0, velocity=230.0)
+
+
+class FakeCache:
+    '''Flights of callsigns other than "UNKNOWN" have flight plans'''
+
+    def flight_from_state(self, state):
+        flight_plan = None if state.callsign == 'UNKNOWN' else SimpleNamespace(callsign=state.callsign)
+        return SimpleNamespace(
+            airplane=SimpleNamespace(icao_code=state.address), flight_plan=flight_plan)
+
+
+def test_restore_flights_in_progress(tmpdir):
+    with FlightJournal('test', journals_dir=str(tmpdir)) as journal:
+        for time_position in range(1, 4):
+            journal.append(state('aaaaaa', time_position))
+            journal.append(state('bbbbbb', time_position))
+        journal.append(state('cccccc', 1, callsign='UNKNOWN'))
+        journal.finish('bbbbbb')
+        journal.append(state('bbbbbb', 10)) # next flight of same airplane
+    with open(str(tmpdir.join('test.journal')), 'ab') as f:
+        f.write(b'P\0\0') # record partially written before crash
+
+    with FlightJournal('test', journals_dir=str(tmpdir)) as journal:
+        address_to_flight = journal.restore(FakeCache())
+
+        assert sorted(address_to_flight) == ['aaaaaa', 'bbbbbb']
+        assert list(address_to_flight['aaaaaa'].timestamps) == [1, 2, 3]
+        assert list(address_to_flight['aaaaaa'].latitudes) == [-14.0, -13.0, -12.0]
+        assert list(address_to_flight['bbbbbb'].timestamps) == [10]
+        assert journal.size == 4 * FlightJournal.RECORD.size # compacted
+
+    with FlightJournal('test', journals_dir=str(tmpdir)) as journal:
+        assert sorted(journal.restore(FakeCache())) == ['aaaaaa', 'bbbbbb']
+
+def test_restore_without_journal(tmpdir):
+    with FlightJournal('test', journals_dir=str(tmpdir)) as journal:
+        assert journal.restore(FakeCache()) == {}
@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from .. import context
+from flight.models.airport import Airport
+from flight.models.flight_plan import FlightPlan
+from flight.opensky.registry import CallsignRegistry
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    for table in (Airport.__table__, FlightPlan.__table__):
+        table.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def add_flight_plan(session, flight_plan_id, callsign):
+    airport = session.query(Airport).first() or Airport('SBBR', 'Brasilia', -15.87, -47.92)
+    flight_plan = FlightPlan(callsign, airport, None)
+    flight_plan.id = flight_plan_id
+    session.add(flight_plan)
+    session.commit()
+
+
+def test_flight_plans_committed_out_of_order_are_seen(session):
+    registry = CallsignRegistry(session, ids_to_scan_again=10)
+    add_flight_plan(session, 3, 'TAM3003')
+    assert list(registry.refresh().callsigns) == ['TAM3003']
+
+    add_flight_plan(session, 2, 'TAM3002') # lower id committed after higher one was seen
+    assert sorted(registry.refresh().callsigns) == ['TAM3002', 'TAM3003']
+    assert registry.route_from_callsign('TAM3002') == ('SBBR', None)
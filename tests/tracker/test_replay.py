@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from .. import context
+from common.db import Base
+from flight.models.airplane import Airplane
+from flight.models.airport import Airport
+from flight.models.flight import Flight
+from flight.models.flight_location import FlightLocation
+from flight.models.flight_plan import FlightPlan
+from flight.opensky.replay import ReplayClient, SyntheticReplayClient
+
+
+@pytest.fixture
+def session():
+    '''In-memory database with flights of routes A-B, C-D and A-D'''
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    airports = {code: Airport(code, code, -15.0, -47.0) for code in 'ABCD'}
+    for index, (departure, destination) in enumerate(['AB', 'CD', 'AD']):
+        flight = Flight(Airplane('abc12' + str(index), None),
+                        FlightPlan('TAM300' + str(index), airports[departure], airports[destination]))
+        session.add(flight)
+        session.add(FlightLocation(datetime(2018, 7, 1, 12), -47.0, -15.0, 10000.0, 230.0, flight))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_replay_client_is_abstract():
+    with pytest.raises(TypeError):
+        ReplayClient(0)
+
+def test_flights_of_tracked_routes_only_are_replayed(session):
+    client = SyntheticReplayClient.build_from_database(session, [('A', 'B'), ('C', 'D')])
+
+    assert sorted(callsign for _, callsign, _, _ in client._flights) == ['TAM3000', 'TAM3001']
+    assert len(SyntheticReplayClient.build_from_database(session)._flights) == 3
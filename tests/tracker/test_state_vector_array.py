@@ -0,0 +1,44 @@
+from .. import context
+from flight.models.bounding_box import BoundingBox
+from flight.opensky.models.state_vector import StateVector
+from flight.opensky.models.state_vector_array import StateVectorArray
+
+
+def row(icao24, callsign='TAM3000 ', time_position=1, longitude=-47.0, latitude=-15.0,
+        velocity=230.0, baro_altitude=10000.0):
+    return [icao24, callsign, 'Brazil', time_position, time_position,
+            longitude, latitude, 10000.0, False, velocity, 90.0, 0.0, None, baro_altitude, None, False, 0]
+
+ROWS = [
+    row('valid'),
+    row('no-time', time_position=None),
+    row('zero-longitude', longitude=0),
+    row('no-latitude', latitude=None),
+    row('no-velocity', velocity=None),
+    row('zero-altitude', baro_altitude=0.0),
+    row('no-callsign', callsign=None),
+]
+
+
+def test_valid_follows_state_vector_rule():
+    array = StateVectorArray.build_from_dict({'time': 0, 'states': ROWS})
+    expected = [args[0] for args in ROWS if StateVector(*args).check_valid_state()]
+
+    assert [state.address for state in array.valid()] == expected
+    assert list(array.valid().addresses) == expected
+
+def test_valid_of_empty_response():
+    array = StateVectorArray.build_from_dict({'time': 0, 'states': None})
+
+    assert len(array.valid()) == 0
+    assert list(array.valid()) == []
+
+def test_filters_are_chained_on_remaining_rows():
+    array = StateVectorArray.build_from_dict({'time': 0, 'states': [
+        row('a', latitude=-15.0), row('b', latitude=-5.0), row('c', callsign='GLO1000', latitude=-15.0)]})
+    states = (array.valid()
+        .with_callsigns(['TAM3000'])
+        .within_bounding_box(BoundingBox(-20, -10, -50, -40)))
+
+    assert [state.address for state in states] == ['a']
+    assert [state.callsign for state in states] == ['TAM3000'] # callsigns are stripped
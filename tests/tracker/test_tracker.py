@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from .. import context
+from common import db
+from flight.models.airline import Airline
+from flight.models.bounding_box import BoundingBox
+from flight.opensky import tracker
+from flight.opensky.models.state_vector_array import StateVectorArray
+from flight.opensky.settings import (MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT,
+                                     MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS,
+                                     MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS,
+                                     SLEEP_TIME_TO_GET_FLIGHT_IN_SECS)
+
+
+def row(icao24, time_position, latitude=None, longitude=-47.0, callsign='TAM3000'):
+    if latitude is None: # flying north
+        latitude = -15.0 + 0.01 * time_position
+    return [icao24, callsign, 'Brazil', time_position, time_position,
+            longitude, latitude, 10000.0, False, 230.0, 90.0, 0.0, None, 10000.0, None, False, 0]
+
+def states(*rows):
+    return list(StateVectorArray.build_from_dict({'time': 0, 'states': list(rows)}).valid())
+
+
+class FakeCache:
+    def flight_from_state(self, state):
+        return SimpleNamespace(
+            airplane=SimpleNamespace(icao_code=state.address),
+            flight_plan=SimpleNamespace(callsign=state.callsign))
+
+class FakeJournal:
+    def __init__(self):
+        self.finished = []
+
+    def append(self, state):
+        pass
+
+    def finish(self, address):
+        self.finished.append(address)
+
+class FakeWriter:
+    def __init__(self):
+        self.saved = []
+
+    def save(self, flight_track):
+        self.saved.append(flight_track)
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    monkeypatch.setattr(tracker, 'cache', FakeCache())
+    monkeypatch.setattr(tracker, 'journal', FakeJournal())
+    monkeypatch.setattr(tracker, 'writer', FakeWriter())
+    return tracker
+
+
+def test_flight_missing_from_one_snapshot_is_not_finished(fakes):
+    address_to_flight = {}
+    for time_position in range(1, MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS + 1):
+        tracker._update_flights_from_states(address_to_flight, states(row('abc123', time_position)))
+    tracker._update_flights_from_states(address_to_flight, []) # e.g. invalid state-vector
+    tracker._update_flights_from_states(
+        address_to_flight, states(row('abc123', MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS + 1)))
+
+    assert list(address_to_flight) == ['abc123']
+    assert len(address_to_flight['abc123']) == MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS + 1
+    assert address_to_flight['abc123'].count_missing_snapshots == 0
+    assert fakes.writer.saved == [] and fakes.journal.finished == []
+
+@pytest.mark.parametrize('poll_period', [SLEEP_TIME_TO_GET_FLIGHT_IN_SECS, 864])
+def test_flight_missing_for_a_while_is_finished(fakes, poll_period):
+    address_to_flight = {}
+    for time_position in range(1, MIN_NUMBER_TO_SAVE_FLIGHT_LOCATIONS + 1):
+        tracker._update_flights_from_states(
+            address_to_flight, states(row('abc123', time_position)), poll_period)
+    flight_track = address_to_flight['abc123']
+    missing_snapshots = tracker._count_missing_snapshots_to_finish_flight(poll_period)
+    for _ in range(missing_snapshots - 1):
+        tracker._update_flights_from_states(address_to_flight, [], poll_period)
+    assert 'abc123' in address_to_flight
+
+    tracker._update_flights_from_states(address_to_flight, [], poll_period)
+    assert address_to_flight == {}
+    assert fakes.writer.saved == [flight_track]
+    assert fakes.journal.finished == ['abc123']
+
+def test_missing_snapshots_to_finish_flight_from_polling_period():
+    assert tracker._count_missing_snapshots_to_finish_flight(
+        MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS / 6) == max(6, MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT)
+    # a single missing snapshot of a long polling period does not finish flight
+    assert tracker._count_missing_snapshots_to_finish_flight(
+        MISSING_TIME_TO_FINISH_FLIGHT_IN_SECS * 10) == MIN_MISSING_SNAPSHOTS_TO_FINISH_FLIGHT
+
+def test_tracking_time_limit_does_not_depend_on_polling_period(monkeypatch):
+    monkeypatch.setattr(tracker, 'default_client', lambda: SimpleNamespace(has_finished=False))
+    monkeypatch.setattr(tracker, 'TIME_LIMIT_TO_SEARCH_FLIGHTS_IN_SECS', 3600)
+
+    assert tracker._should_keep_tracking(3599)
+    assert not tracker._should_keep_tracking(3600)
+
+def test_tracked_flights_are_kept_outside_route_bounding_box():
+    route_bbox = BoundingBox(-20, -10, -50, -40)
+    array = StateVectorArray.build_from_dict({'time': 0, 'states': [
+        row('inside', 1, latitude=-15, longitude=-45),
+        row('tracked', 1, latitude=-5, longitude=-45),
+        row('outside', 1, latitude=-5, longitude=-45),
+    ]})
+
+    assert list(array.within_bounding_box(route_bbox).addresses) == ['inside']
+    assert list(array.within_bounding_box(route_bbox, {'tracked': None}.keys()).addresses) == ['inside', 'tracked']
+
+
+def test_read_transaction_ends_every_iteration(monkeypatch, tmpdir):
+    engine = create_engine('sqlite:///' + str(tmpdir.join('tracker.db')), poolclass=QueuePool)
+    Airline.__table__.create(engine)
+    engine.execute(Airline.__table__.insert(), icao_code='TAM', name='TAM', country='Brazil')
+    monkeypatch.setattr(db, 'engine', engine)
+    db.Session.configure(bind=engine)
+
+    try:
+        with db.open_scoped_session(expire_on_commit=False) as session:
+            airline = session.query(Airline).one()
+            assert engine.pool.checkedout() == 1 # idle in transaction
+            tracker._end_read_transaction()
+
+            assert engine.pool.checkedout() == 0
+            assert 'icao_code' in airline.__dict__ # cached objects are not expired
+    finally:
+        db.Session.configure(bind=None)
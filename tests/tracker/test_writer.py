@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+from .. import context
+from flight.opensky import writer as writer_module
+from flight.opensky.writer import FlightRecord, FlightWriter
+
+
+def record(icao_code, count_flight_locations=2):
+    return FlightRecord(
+        datetime(2018, 7, 1, 12, 0, 0, 500), icao_code, 1, 2, [
+            (datetime(2018, 7, 1, 12, 0, index), -47.0 + index, -15.0, 10000.0, 230.0)
+            for index in range(count_flight_locations)])
+
+
+@pytest.fixture
+def inserted(monkeypatch):
+    '''Records inserted by flight writers, failing for batches or airplanes named "bad"'''
+    inserted = []
+
+    def insert_records(records):
+        if len(records) > 1 or records[0].airplane_icao_code == 'bad':
+            raise SQLAlchemyError('duplicate key value violates unique constraint')
+        inserted.extend(records)
+        return sum(len(record.flight_locations) for record in records)
+
+    monkeypatch.setattr(FlightWriter, '_insert_records', staticmethod(insert_records))
+    return inserted
+
+
+def test_failed_batch_is_saved_one_by_one_and_dead_lettered(inserted, tmpdir):
+    path = str(tmpdir.join('dead_letters.jsonl'))
+    writer = FlightWriter(dead_letters_path=path)
+    records = [record('a'), record('bad'), record('c')]
+    writer._write_records(records)
+
+    assert inserted == [records[0], records[2]]
+    assert (writer.count_saved_flights, writer.count_failed_flights) == (2, 1)
+    assert writer.count_saved_flight_locations == 4
+    assert writer_module.read_dead_letters(path) == [records[1]]
+
+def test_dead_letters_are_saved_again(inserted, tmpdir):
+    path = str(tmpdir.join('dead_letters.jsonl'))
+    records = [record('a', count_flight_locations=3), record('bad')]
+    writer_module.write_dead_letters(path, records)
+
+    assert writer_module.save_dead_letters(path) == 1
+    assert inserted == [records[0]]
+    assert writer_module.read_dead_letters(path) == [records[1]] # failed again
+
+def test_save_dead_letters_without_file(tmpdir):
+    assert writer_module.save_dead_letters(str(tmpdir.join('dead_letters.jsonl'))) == 0
+
+def test_new_airplanes_are_inserted_idempotently():
+    statements = []
+
+    class FakeConnection:
+        def execute(self, statement, *args):
+            statements.append(str(statement.compile(dialect=postgresql.dialect())))
+            return self
+
+        def fetchall(self):
+            return []
+
+    FlightWriter._airplane_ids_from_records(FakeConnection(), [record('a'), record('a')])
+
+    assert len(statements) == 3 # select, insert and select again
+    assert statements[1].endswith('ON CONFLICT (icao_code) DO NOTHING')
+
+def test_any_error_of_batch_is_dead_lettered(monkeypatch, tmpdir):
+    def insert_records(records):
+        raise KeyError(records[0].airplane_icao_code)
+
+    monkeypatch.setattr(FlightWriter, '_insert_records', staticmethod(insert_records))
+    path = str(tmpdir.join('dead_letters.jsonl'))
+    records = [record('a'), record('b')]
+    FlightWriter(dead_letters_path=path)._write_records(records)
+
+    assert writer_module.read_dead_letters(path) == records
+
+def test_writer_keeps_running_if_dead_letters_cannot_be_written(monkeypatch, tmpdir):
+    def insert_records(records):
+        raise SQLAlchemyError('could not connect to server')
+
+    monkeypatch.setattr(FlightWriter, '_insert_records', staticmethod(insert_records))
+    monkeypatch.setattr(writer_module, 'write_dead_letters', lambda path, records: 1 / 0)
+    writer = FlightWriter(flush_interval=0, dead_letters_path=str(tmpdir.join('dead_letters.jsonl')))
+    with writer:
+        writer._queue.put(record('a'))
+        writer._queue.put(record('b'))
+    assert writer.count_failed_flights == 2
+
+def test_flights_are_not_queued_without_writer_thread(inserted):
+    writer = FlightWriter()
+
+    with pytest.raises(RuntimeError):
+        writer.save(None)
+    writer.stop() # not started
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from .. import context
+from common import db
+from flight.models import partitions
+from weather.models.convection_cell import ConvectionCell
+from weather.stsc import tracker
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    '''In-memory database with convection cells table'''
+    engine = create_engine('sqlite://')
+    ConvectionCell.__table__.create(engine)
+    monkeypatch.setattr(db, 'engine', None)
+    monkeypatch.setattr(db, 'create_db_engine', lambda: engine)
+    monkeypatch.setattr(partitions, 'PARTITIONED_TABLES', False)
+    yield engine
+    db.Session.configure(bind=None)
+
+
+def test_saved_cells_are_compared_with_next_poll(engine):
+    prev_cells = {ConvectionCell(-15.0, -47.0, 10.0, datetime(2018, 7, 1, 12))}
+    tracker.save_convection_cells(new_cells=prev_cells)
+
+    curr_cells = {ConvectionCell(-15.0, -47.0, 10.0, datetime(2018, 7, 1, 12, 10)),
+                  ConvectionCell(-16.0, -48.0, 5.0, datetime(2018, 7, 1, 12, 10))}
+    new_cells = curr_cells - prev_cells
+
+    assert [tuple(cell) for cell in new_cells] == [(-16.0, -48.0, 5.0)]
+    tracker.save_convection_cells(new_cells=new_cells)
+    assert engine.execute('SELECT COUNT(*) FROM convection_cells').scalar() == 2